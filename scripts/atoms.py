@@ -0,0 +1,295 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    atoms.py
+
+Usage:
+    python atoms.py --kpp_dir ../configs/kpp --kpp_name small_strato
+    python kpp_to_micm.py --check
+    python atoms.py --help
+
+Description:
+    atoms.py checks the mass balance of a translated mechanism
+    (mechanism.Mechanism) from the atom composition of its species
+    (#DEFVAR and #DEFFIX definitions, e.g. NO2 = N + 2O,
+    or MOZART formulas) and emits its conservation laws.
+
+    The composition is an atoms x species matrix A, with one column
+    per name of Mechanism.names; species defined IGNORE, not parsed,
+    or not declared have no composition. With the net stoichiometric
+    matrix N (see stoichiometry.py), the atom balance of every reaction
+    is the single sparse product A N, atoms x reactions.
+    A reaction changing a species without composition is unchecked;
+    a checked reaction with a nonzero balance in an atom is unbalanced.
+    The atoms checked are those of #CHECK, all atoms with #CHECKALL,
+    and all atoms of the compositions otherwise.
+
+    An atom is conserved by the solver if A_v N_v = 0, restricted
+    to the variable species (constant species have no tendency),
+    and no reaction changes a variable species without composition.
+    The rows of A_v of the conserved atoms are the conservation laws,
+    sum_j A_aj c_j constant in time: a solver can enforce them,
+    or eliminate one species per independent law.
+    Those species, chosen by Gaussian elimination with the largest pivot,
+    are listed as 'redundant'.
+
+    composition.npz (A) and conservation.npz (the laws, over the
+    variable species) are written next to species.json and reactions.json,
+    in the CSR layout of stoichiometry.py, with the 'atoms'
+    and 'species' names.
+
+    Requires NumPy.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+import numpy as np
+
+from stoichiometry import coo_to_csr, stoichiometric_matrices, csr_to_coo
+
+logger = logging.getLogger(__name__)
+
+
+def composition_matrix(mechanism, atoms=None):
+    """
+    Atoms x species composition matrix
+
+    Parameters
+        (Mechanism) mechanism: compact mechanism with compositions
+        (list of str) atoms: rows, default all atoms of the compositions
+
+    Returns
+        (list of str, ndarray, ndarray): atoms, dense composition
+            (atoms, names) and known composition (names,) bool
+    """
+
+    if atoms is None:
+        atoms = sorted(set(atom for value in mechanism.composition.values()
+            if value is not None for atom in value))
+    row = dict((atom, k) for k, atom in enumerate(atoms))
+
+    matrix = np.zeros((len(atoms), len(mechanism.names)))
+    known = np.zeros(len(mechanism.names), dtype=bool)
+    for name, value in mechanism.composition.items():
+        n = mechanism.index.get(name)
+        if n is None or value is None:
+            continue
+        known[n] = True
+        for atom, count in value.items():
+            if atom in row:
+                matrix[row[atom], n] = count
+
+    return list(atoms), matrix, known
+
+
+def _column_sums(matrix, rows, cols, values, n_columns):
+    """
+    Product of a dense matrix and a sparse COO matrix,
+    one weighted bincount over the columns per row of the dense matrix
+    """
+    return np.array([np.bincount(cols, weights=row[rows] * values,
+        minlength=n_columns) for row in matrix]).reshape(len(matrix),
+        n_columns)
+
+
+def mass_balance(mechanism, atoms=None, tolerance=1.0e-6):
+    """
+    Atom balance of every reaction, as one sparse product
+
+    Parameters
+        (Mechanism) mechanism: compact mechanism with compositions
+        (list of str) atoms: atoms checked,
+            default mechanism.checks or all atoms
+        (float) tolerance: largest absolute balance taken as zero
+
+    Returns
+        (dict): 'atoms', 'balance' (atoms, reactions) array,
+            'checked' (reactions,) bool, 'unbalanced' list of
+            (reaction index, label, atom -> balance), 'unchecked' indices
+    """
+
+    if atoms is None:
+        atoms = mechanism.checks
+    atoms, matrix, known = composition_matrix(mechanism, atoms)
+
+    net = stoichiometric_matrices(mechanism)['net']
+    rows, cols, values = csr_to_coo(net)
+    n_reactions = len(mechanism.reactions)
+
+    # A N: each nonzero N_sr adds A_as N_sr to column r
+    balance = _column_sums(matrix, rows, cols, values, n_reactions)
+
+    unknown = np.bincount(cols, weights=~known[rows], minlength=n_reactions)
+    checked = unknown == 0
+
+    bad = checked & (np.abs(balance) > tolerance).any(axis=0)
+    unbalanced = list()
+    for r in np.flatnonzero(bad).tolist():
+        unbalanced.append((r, mechanism.reactions[r].label,
+            dict((atom, float(balance[a, r])) for a, atom in enumerate(atoms)
+                if abs(balance[a, r]) > tolerance)))
+
+    return {'atoms': atoms, 'balance': balance, 'checked': checked,
+        'unbalanced': unbalanced,
+        'unchecked': np.flatnonzero(~checked).tolist()}
+
+
+def _independent(laws, tolerance=1.0e-9):
+    """
+    Pivot columns of independent rows, by Gaussian elimination
+    with the largest pivot of each row
+    """
+    work = np.array(laws, dtype=np.float64)
+    pivots = list()
+    for k in range(work.shape[0]):
+        j = int(np.argmax(np.abs(work[k])))
+        if abs(work[k, j]) <= tolerance:
+            continue
+        pivots.append(j)
+        factors = work[k + 1:, j] / work[k, j]
+        work[k + 1:] -= np.outer(factors, work[k])
+    return pivots
+
+
+def conservation_laws(mechanism, atoms=None, tolerance=1.0e-6):
+    """
+    Conservation laws of the variable species
+
+    Parameters
+        (Mechanism) mechanism: compact mechanism with compositions
+        (list of str) atoms: candidate atoms, default all atoms
+        (float) tolerance: largest absolute balance taken as zero
+
+    Returns
+        (dict): 'atoms' conserved, 'species' variable species names,
+            'laws' (atoms, species) array, 'redundant' species names,
+            one per independent law
+    """
+
+    atoms, matrix, known = composition_matrix(mechanism, atoms)
+
+    variable = np.zeros(len(mechanism.names), dtype=bool)
+    variable[[n for n, constant in zip(mechanism.species, mechanism.constant)
+        if not constant]] = True
+
+    net = stoichiometric_matrices(mechanism)['net']
+    rows, cols, values = csr_to_coo(net)
+    mask = variable[rows]
+    rows, cols, values = rows[mask], cols[mask], values[mask]
+
+    balance = _column_sums(matrix, rows, cols, values,
+        len(mechanism.reactions))
+
+    exact = not (~known[rows]).any()
+    columns = np.flatnonzero(variable)
+    conserved = [a for a in range(len(atoms)) if exact
+        and not (np.abs(balance[a]) > tolerance).any()
+        and matrix[a, columns].any()]
+
+    laws = matrix[conserved][:, columns]
+    species = [mechanism.names[n] for n in columns.tolist()]
+
+    return {'atoms': [atoms[a] for a in conserved], 'species': species,
+        'laws': laws,
+        'redundant': [species[j] for j in _independent(laws)]}
+
+
+def write_conservation(mechanism, micm_mechanism_dir, tolerance=1.0e-6):
+    """
+    Check the mass balance and write composition.npz and conservation.npz
+
+    Parameters
+        (Mechanism) mechanism: compact mechanism with compositions
+        (str) micm_mechanism_dir: output directory
+        (float) tolerance: largest absolute balance taken as zero
+
+    Returns
+        (list of str, dict): files written, mass_balance result
+    """
+
+    balance = mass_balance(mechanism, tolerance=tolerance)
+    for r, label, atoms in balance['unbalanced']:
+        logger.warning('reaction %d %s unbalanced: %s', r, label or '',
+            ', '.join('%s %+g' % item for item in sorted(atoms.items())))
+    logger.info('%s: %d reactions checked in %s, %d unbalanced, '
+        '%d unchecked', mechanism.name, int(balance['checked'].sum()),
+        ' '.join(balance['atoms']), len(balance['unbalanced']),
+        len(balance['unchecked']))
+
+    atoms, matrix, known = composition_matrix(mechanism)
+    laws = conservation_laws(mechanism, tolerance=tolerance)
+    logger.info('%s: conserved %s, redundant species %s', mechanism.name,
+        ' '.join(laws['atoms']) or 'none', ' '.join(laws['redundant']) or 'none')
+
+    files = [os.path.join(micm_mechanism_dir, 'composition.npz'),
+             os.path.join(micm_mechanism_dir, 'conservation.npz')]
+
+    rows, cols = np.nonzero(matrix)
+    np.savez(files[0], atoms=np.array(atoms, dtype=str),
+        species=np.array(mechanism.names, dtype=str), known=known,
+        **coo_to_csr(rows, cols, matrix[rows, cols], matrix.shape))
+
+    rows, cols = np.nonzero(laws['laws'])
+    np.savez(files[1], atoms=np.array(laws['atoms'], dtype=str),
+        species=np.array(laws['species'], dtype=str),
+        redundant=np.array(laws['redundant'], dtype=str),
+        **coo_to_csr(rows, cols, laws['laws'][rows, cols],
+            laws['laws'].shape))
+
+    return files, balance
+
+
+if __name__ == '__main__':
+
+    from kpp_to_micm import kpp_config_files
+    from kpp_translate import translate
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--kpp_dir', type=str,
+        default=os.path.join('..', 'configs', 'kpp'),
+        help='KPP config directory')
+    parser.add_argument('--kpp_name', type=str,
+        default='small_strato',
+        help='KPP config name')
+    parser.add_argument('--tolerance', type=float,
+        default=1.0e-6,
+        help='largest absolute atom balance taken as zero')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    """
+    Check the mass balance
+    """
+    mechanism = translate(kpp_config_files(args.kpp_dir, args.kpp_name),
+        name=args.kpp_name)
+    balance = mass_balance(mechanism, tolerance=args.tolerance)
+    for r, label, atoms in balance['unbalanced']:
+        logging.info('reaction %d %s unbalanced: %s' % (r, label or '',
+            ', '.join('%s %+g' % item for item in sorted(atoms.items()))))
+    logging.info('%d reactions checked in %s, %d unbalanced, %d unchecked'
+        % (int(balance['checked'].sum()), ' '.join(balance['atoms']),
+           len(balance['unbalanced']), len(balance['unchecked'])))
+
+    laws = conservation_laws(mechanism, tolerance=args.tolerance)
+    logging.info('conserved %s, redundant species %s'
+        % (' '.join(laws['atoms']) or 'none',
+           ' '.join(laws['redundant']) or 'none'))
@@ -0,0 +1,294 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+(Software Package Data Exchange)
+
+File:
+    batch_kpp_to_micm.py
+
+Usage:
+    python batch_kpp_to_micm.py --manifest mechanisms.json
+    python batch_kpp_to_micm.py --glob '../configs/kpp/*.eqn'
+    python batch_kpp_to_micm.py --glob '../configs/kpp/*.eqn' --cache_dir cache
+    python batch_kpp_to_micm.py --glob '../configs/kpp/*.eqn' --metrics --report report.json
+    python batch_kpp_to_micm.py --help
+
+Description:
+    batch_kpp_to_micm.py translates many KPP mechanisms to MICM JSON
+    concurrently with a process pool, one mechanism per task.
+    Each mechanism gets its own result and error report,
+    and a summary of wall time per mechanism is printed at the end.
+
+    The manifest is a JSON list of mechanisms,
+    with paths relative to the manifest file:
+
+    [{"kpp_dir": "../racm_esrl_vcp/kpp", "kpp_name": "racm_soa_vbs",
+      "micm_dir": "../racm_esrl_vcp/micm", "mechanism": "RACM_SOA_VBS"},
+     ...]
+
+    micm_dir defaults to --micm_dir, used as given (relative to the
+    current directory), and mechanism defaults to kpp_name.
+    With --glob, each matching file is one mechanism named after its stem.
+    Config files included by several mechanisms, e.g. atoms.kpp,
+    are tokenized once per worker process (see kpp_include.py).
+    With --metrics, each result holds the stage timings and counters
+    of its translation (see kpp_metrics.py).
+"""
+
+import os
+import sys
+import argparse
+import logging
+import json
+import time
+import traceback
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+
+from kpp_to_micm import make_micm_dir, kpp_config_files, \
+    kpp_dependency_files, iter_kpp_config_tokens, stream_tokens_to_micm, \
+    cached_kpp_to_micm
+from kpp_cache import TranslationCache, DEFAULT_MAX_BYTES
+from kpp_metrics import TranslationMetrics
+
+
+def read_manifest(manifest_file, micm_dir):
+    """
+    Read a batch manifest
+
+    Parameters
+        (str) manifest_file: JSON manifest file
+        (str) micm_dir: default MICM output directory, used as given
+
+    Returns
+        (list of dict): kpp_dir, kpp_name, micm_dir, mechanism for each entry
+    """
+
+    with open(manifest_file, 'r') as f:
+        entries = json.load(f)
+
+    root = os.path.dirname(os.path.abspath(manifest_file))
+
+    jobs = list()
+    for entry in entries:
+        jobs.append({
+            'kpp_dir': os.path.join(root, entry['kpp_dir']),
+            'kpp_name': entry['kpp_name'],
+            'micm_dir': os.path.join(root, entry['micm_dir'])
+                if 'micm_dir' in entry else micm_dir,
+            'mechanism': entry.get('mechanism', entry['kpp_name'])})
+
+    return jobs
+
+
+def glob_mechanisms(pattern, micm_dir):
+    """
+    Find mechanisms from a glob of KPP config files
+
+    Parameters
+        (str) pattern: glob pattern, e.g. '../configs/kpp/*.eqn'
+        (str) micm_dir: MICM output directory
+
+    Returns
+        (list of dict): kpp_dir, kpp_name, micm_dir, mechanism for each match
+    """
+
+    jobs = list()
+    seen = set()
+    for filename in sorted(glob(pattern)):
+        kpp_dir = os.path.dirname(filename)
+        kpp_name = os.path.splitext(os.path.basename(filename))[0]
+        if (kpp_dir, kpp_name) in seen:
+            continue
+        seen.add((kpp_dir, kpp_name))
+        jobs.append({'kpp_dir': kpp_dir, 'kpp_name': kpp_name,
+            'micm_dir': micm_dir, 'mechanism': kpp_name})
+
+    return jobs
+
+
+def translate_mechanism(job, logging_level=logging.WARNING,
+    cache_dir=None, cache_bytes=DEFAULT_MAX_BYTES, metrics=False):
+    """
+    Translate a single KPP mechanism, capturing any error
+
+    Parameters
+        (dict) job: kpp_dir, kpp_name, micm_dir, mechanism
+        (int) logging_level: logging level in the worker process
+        (str) cache_dir: translation cache directory, None to disable
+        (int) cache_bytes: translation cache size limit
+        (bool) metrics: collect stage timings and counters
+
+    Returns
+        (dict): job entries with status ('ok', 'cached' or 'error'),
+            species, reactions, wall time [s],
+            error traceback (None on success)
+            and metrics report (None unless collected)
+    """
+
+    logging.getLogger().setLevel(logging_level)
+
+    result = dict(job)
+    result.update({'status': 'ok', 'species': 0, 'reactions': 0,
+        'seconds': 0.0, 'error': None, 'metrics': None})
+    translation_metrics = TranslationMetrics() if metrics else None
+
+    start = time.perf_counter()
+    try:
+        if not kpp_config_files(job['kpp_dir'], job['kpp_name']):
+            raise FileNotFoundError('no KPP config files %s in %s'
+                % (job['kpp_name'], job['kpp_dir']))
+        micm_mechanism_dir = make_micm_dir(job['micm_dir'], job['mechanism'])
+        if cache_dir is None:
+            if translation_metrics is not None:
+                translation_metrics.count_bytes('bytes_read',
+                    kpp_dependency_files(job['kpp_dir'], job['kpp_name']))
+            result['species'], result['reactions'] = stream_tokens_to_micm(
+                iter_kpp_config_tokens(job['kpp_dir'], job['kpp_name']),
+                micm_mechanism_dir, job['mechanism'],
+                metrics=translation_metrics)
+        else:
+            cache = TranslationCache(cache_dir, max_bytes=cache_bytes)
+            result['species'], result['reactions'], skipped \
+                = cached_kpp_to_micm(job['kpp_dir'], job['kpp_name'],
+                    micm_mechanism_dir, job['mechanism'], cache,
+                    metrics=translation_metrics)
+            if skipped:
+                result['status'] = 'cached'
+    except Exception:
+        result['status'] = 'error'
+        result['error'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - start
+    if translation_metrics is not None:
+        result['metrics'] = translation_metrics.report()
+
+    return result
+
+
+def batch_kpp_to_micm(jobs, max_workers=None, logging_level=logging.WARNING,
+    cache_dir=None, cache_bytes=DEFAULT_MAX_BYTES, metrics=False):
+    """
+    Translate KPP mechanisms concurrently
+
+    Parameters
+        (list of dict) jobs: kpp_dir, kpp_name, micm_dir, mechanism
+        (int) max_workers: number of worker processes (default CPU count)
+        (int) logging_level: logging level in the worker processes
+        (str) cache_dir: translation cache directory, None to disable
+        (int) cache_bytes: translation cache size limit
+        (bool) metrics: collect stage timings and counters
+
+    Returns
+        (list of dict): one result per job, in job order
+    """
+
+    n_jobs = len(jobs)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(translate_mechanism, jobs,
+            [logging_level] * n_jobs, [cache_dir] * n_jobs,
+            [cache_bytes] * n_jobs, [metrics] * n_jobs))
+
+    return results
+
+
+def summary(results, wall_time):
+    """
+    Format a wall time summary of batch results
+
+    Parameters
+        (list of dict) results: results from batch_kpp_to_micm
+        (float) wall_time: total wall time [s]
+
+    Returns
+        (str): summary table
+    """
+
+    lines = ['%-24s %-6s %8s %10s %10s'
+        % ('mechanism', 'status', 'species', 'reactions', 'time [s]')]
+    for result in results:
+        lines.append('%-24s %-6s %8d %10d %10.3f'
+            % (result['mechanism'], result['status'], result['species'],
+               result['reactions'], result['seconds']))
+    n_errors = sum(result['status'] == 'error' for result in results)
+    lines.append('%d mechanisms, %d errors, total wall time %.3f s'
+        % (len(results), n_errors, wall_time))
+
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--manifest', type=str,
+        default=None,
+        help='JSON manifest of mechanisms')
+    parser.add_argument('--glob', type=str,
+        default=None,
+        help='glob of KPP config files, one mechanism per file stem')
+    parser.add_argument('--micm_dir', type=str,
+        default=os.path.join('..', 'configs', 'micm'),
+        help='MICM output directory')
+    parser.add_argument('--jobs', type=int,
+        default=None,
+        help='number of worker processes (default CPU count)')
+    parser.add_argument('--cache_dir', type=str,
+        default=None,
+        help='translation cache directory, skip unchanged mechanisms')
+    parser.add_argument('--cache_size', type=float,
+        default=256.0,
+        help='translation cache size limit [MB]')
+    parser.add_argument('--report', type=str,
+        default=None,
+        help='JSON report file with per mechanism results')
+    parser.add_argument('--metrics', action='store_true',
+        help='collect stage timings and counters of each mechanism')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    """
+    Collect mechanisms
+    """
+    jobs = list()
+    if args.manifest is not None:
+        jobs.extend(read_manifest(args.manifest, args.micm_dir))
+    if args.glob is not None:
+        jobs.extend(glob_mechanisms(args.glob, args.micm_dir))
+    if not jobs:
+        parser.error('no mechanisms, specify --manifest or --glob')
+
+    """
+    Translate mechanisms concurrently
+    """
+    start = time.perf_counter()
+    results = batch_kpp_to_micm(jobs, max_workers=args.jobs,
+        logging_level=logging.DEBUG if args.debug else logging.WARNING,
+        cache_dir=args.cache_dir,
+        cache_bytes=int(args.cache_size * 1024 * 1024),
+        metrics=args.metrics)
+    wall_time = time.perf_counter() - start
+
+    for result in results:
+        if result['error'] is not None:
+            logging.error('____ %s ____\n%s'
+                % (result['mechanism'], result['error']))
+    logging.info('\n' + summary(results, wall_time))
+
+    if args.report is not None:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    sys.exit(1 if any(result['error'] for result in results) else 0)
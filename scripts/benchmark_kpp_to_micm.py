@@ -0,0 +1,642 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    benchmark_kpp_to_micm.py
+
+Usage:
+    python benchmark_kpp_to_micm.py
+    python benchmark_kpp_to_micm.py --sizes 1000 10000 --repeat 5
+    python benchmark_kpp_to_micm.py --mix arrhenius=1 troe=1
+    python benchmark_kpp_to_micm.py --save_baseline baseline.json
+    python benchmark_kpp_to_micm.py --baseline baseline.json
+    python benchmark_kpp_to_micm.py --sizes --output
+    python benchmark_kpp_to_micm.py --partition
+    python benchmark_kpp_to_micm.py --help
+
+Description:
+    benchmark_kpp_to_micm.py measures the throughput of the translator
+    stages of kpp_to_micm.py:
+
+        read        read_kpp_config
+        split       split_by_section
+        species     micm_species_json of #DEFFIX and #DEFVAR
+        equations   micm_equation_json
+        serialize   species.json and reactions.json, as kpp_to_micm.py
+                    writes them, to os.devnull
+
+    Workloads are synthetic KPP mechanisms of 1k, 10k and 100k reactions
+    (see synthetic_mechanism), with a controllable mix of rate types,
+    and the fixed inputs RACM_SOA_VBS, AM4 and MCM from this repository.
+    AM4 is in MOZART syntax and is timed through the MOZART front-end
+    (mozart_to_micm.py): read reads am4.spc and am4.eqn,
+    split is split_mozart_by_section and equations iter_mozart_equations.
+
+    With --output, the output modes of kpp_to_micm.py are compared
+    by time and peak memory (tracemalloc) of writing species.json
+    and reactions.json:
+
+        pretty_twice  json.dumps(indent=4) of both documents for logging,
+                      then json.dump(indent=4), as kpp_to_micm.py v1.05 did
+        streamed      each document serialized once, streamed to disk
+        compact       streamed without indentation (--compact)
+
+    With --partition, the species-reaction graph analysis of partition.py
+    (strongly connected components and block ordering) is timed
+    on the translated reactions of each workload.
+
+    Each stage is run --repeat times and the fastest time is kept.
+    Results can be saved as a baseline file (--save_baseline)
+    and compared against one (--baseline), reporting stages slower than
+    the baseline by more than --threshold (and --min_seconds).
+"""
+
+import os
+import sys
+import argparse
+import logging
+import json
+import time
+import random
+import tempfile
+import platform
+import tracemalloc
+
+from kpp_to_micm import read_kpp_config, split_by_section, \
+    micm_species_json, micm_equation_json, write_micm_reactions_json
+from partition import partition
+from mozart_to_micm import mozart_config_files, split_mozart_by_section, \
+    iter_mozart_equations
+
+STAGES = ['read', 'split', 'species', 'equations', 'serialize']
+
+FRONT_ENDS = ['kpp', 'mozart']
+
+OUTPUT_MODES = ['pretty_twice', 'streamed', 'compact']
+
+RATE_TYPES = ['photolysis', 'arrhenius', 'troe', 'troee',
+    'k45', 'k57', 'constant']
+
+# roughly the mix of RACM_SOA_VBS, other expressions counted as constant
+DEFAULT_MIX = {'photolysis': 0.1, 'arrhenius': 0.55, 'troe': 0.04,
+    'troee': 0.02, 'k45': 0.005, 'k57': 0.005, 'constant': 0.28}
+
+_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# name, input directory, config name, front-end
+FIXED_WORKLOADS = [
+    ('RACM_SOA_VBS', os.path.join(_root, 'racm_esrl_vcp', 'kpp'),
+        'racm_soa_vbs', 'kpp'),
+    ('AM4', os.path.join(_root, 'am4', 'mozart'), 'am4', 'mozart'),
+    ('MCM', os.path.join(_root, 'configs', 'kpp'), 'mcm_export', 'kpp')]
+
+
+def _fortran_real(x):
+    """
+    Fortran double precision literal, e.g. 1.23D-12
+    """
+    return ('%.2E' % x).replace('E', 'D')
+
+
+def synthetic_rate(rate_type, rng, photolysis_index=0):
+    """
+    Random KPP rate expression of a rate type
+
+    Parameters
+        (str) rate_type: one of RATE_TYPES
+        (random.Random) rng: random number generator
+        (int) photolysis_index: index of the photolysis rate name
+
+    Returns
+        (str): KPP rate expression
+    """
+
+    A = _fortran_real(10.0**rng.uniform(-16.0, -10.0))
+    B = '%.1f_dp' % rng.uniform(-2000.0, 2000.0)
+    C = '%.1f_dp' % rng.uniform(-3.0, 3.0)
+
+    if rate_type == 'photolysis':
+        return 'j(Pj_%d)' % photolysis_index
+    elif rate_type == 'arrhenius':
+        return rng.choice([
+            'ARR2( %s , %s, TEMP )' % (A, B),
+            'ARR_ab( %s , %s )' % (A, B),
+            'ARR_ac( %s , %s )' % (A, C),
+            'ARR_abc( %s , %s , %s )' % (A, B, C),
+            'ARR( %s , %s , %s )' % (A, B, C)])
+    elif rate_type in ('troe', 'troee'):
+        troe = '%s , %.1f_dp , %s , %.1f_dp , TEMP, C_M' % (
+            _fortran_real(10.0**rng.uniform(-33.0, -28.0)),
+            rng.uniform(0.0, 5.0),
+            _fortran_real(10.0**rng.uniform(-13.0, -10.0)),
+            rng.uniform(0.0, 2.0))
+        if rate_type == 'troe':
+            return 'TROE( %s )' % troe
+        return 'TROEE( %s,%.1f_dp, %s )' % (
+            _fortran_real(10.0**rng.uniform(25.0, 27.0)),
+            rng.uniform(9000.0, 12000.0), troe)
+    elif rate_type == 'k45':
+        return 'k45(TEMP,C_M)'
+    elif rate_type == 'k57':
+        return 'k57(TEMP,C_M)'
+    elif rate_type == 'constant':
+        return _fortran_real(10.0**rng.uniform(-16.0, -10.0))
+
+    raise ValueError('unknown rate type %s' % rate_type)
+
+
+def synthetic_mechanism(n_species, n_reactions, mix=None, n_fixed=2, seed=0):
+    """
+    Generate a synthetic KPP mechanism
+
+    Parameters
+        (int) n_species: number of #DEFVAR species
+        (int) n_reactions: number of equations
+        (dict) mix: relative weights of RATE_TYPES (default DEFAULT_MIX)
+        (int) n_fixed: number of #DEFFIX species
+        (int) seed: random seed
+
+    Returns
+        (str, str): .spc and .eqn file contents
+    """
+
+    mix = DEFAULT_MIX if mix is None else mix
+    for rate_type in mix:
+        if rate_type not in RATE_TYPES:
+            raise ValueError('unknown rate type %s' % rate_type)
+    rate_types = [rate_type for rate_type in RATE_TYPES if mix.get(rate_type)]
+    weights = [mix[rate_type] for rate_type in rate_types]
+
+    rng = random.Random(seed)
+
+    variable = ['V%d' % n for n in range(n_species)]
+    fixed = ['M', 'O2', 'H2O', 'N2'][:n_fixed] \
+        + ['F%d' % n for n in range(4, n_fixed)]
+
+    spc_lines = ['#DEFVAR']
+    spc_lines.extend('%s = IGNORE ;' % name for name in variable)
+    spc_lines.append('#DEFFIX')
+    spc_lines.extend('%s = IGNORE ;' % name for name in fixed)
+
+    eqn_lines = ['#EQUATIONS { synthetic mechanism, seed %d }' % seed]
+    for n, rate_type in enumerate(rng.choices(rate_types, weights,
+        k=n_reactions)):
+        if rate_type == 'photolysis':
+            reactants = [rng.choice(variable), 'hv']
+        else:
+            reactants = rng.sample(variable, min(2, n_species))
+            if rate_type in ('troe', 'troee') and fixed:
+                reactants.append(fixed[0])
+        products = list()
+        for name in rng.sample(variable, min(rng.randint(1, 3), n_species)):
+            if rng.random() < 0.3:
+                products.append('%.3f %s' % (rng.uniform(0.1, 2.0), name))
+            else:
+                products.append(name)
+        eqn_lines.append('<R%d> %s = %s : %s ;' % (n + 1,
+            ' + '.join(reactants), ' + '.join(products),
+            synthetic_rate(rate_type, rng, photolysis_index=n)))
+
+    return '\n'.join(spc_lines) + '\n', '\n'.join(eqn_lines) + '\n'
+
+
+def write_synthetic_mechanism(kpp_dir, kpp_name, n_species, n_reactions,
+    **kwargs):
+    """
+    Write a synthetic KPP mechanism as <kpp_name>.spc and <kpp_name>.eqn
+
+    Parameters
+        (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
+        (int) n_species: number of #DEFVAR species
+        (int) n_reactions: number of equations
+        **kwargs: passed to synthetic_mechanism
+
+    Returns
+        (list of str): files written
+    """
+
+    files = list()
+    for suffix, text in zip(['.spc', '.eqn'],
+        synthetic_mechanism(n_species, n_reactions, **kwargs)):
+        files.append(os.path.join(kpp_dir, kpp_name + suffix))
+        with open(files[-1], 'w') as f:
+            f.write(text)
+
+    return files
+
+
+def _best_time(function, repeat):
+    """
+    Result of a function and its fastest run time [s] over repeat runs
+    """
+    best = float('inf')
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def write_output(mode, f_species, f_reactions, species_json, mechanism,
+    equations_json):
+    """
+    Write MICM species.json and reactions.json in an output mode
+
+    Parameters
+        (str) mode: one of OUTPUT_MODES
+        (file) f_species, f_reactions: writable text streams
+        (dict) species_json: species.json document
+        (str) mechanism: mechanism name
+        (list of dict) equations_json: MICM equation entries
+    """
+
+    if mode == 'pretty_twice':
+        reactions_json = {'camp-data': [{'name': mechanism,
+            'type': 'MECHANISM', 'reactions': equations_json}]}
+        # the copies that were logged, serialized and discarded
+        json.dumps(species_json, indent=4)
+        json.dumps(reactions_json, indent=4)
+        json.dump(species_json, f_species, indent=4)
+        json.dump(reactions_json, f_reactions, indent=4)
+        return
+
+    if mode not in OUTPUT_MODES:
+        raise ValueError('unknown output mode %s' % mode)
+    indent = None if mode == 'compact' else 4
+    json.dump(species_json, f_species, indent=indent)
+    write_micm_reactions_json(f_reactions, mechanism, equations_json,
+        indent=indent)
+
+
+def _read_mozart(mozart_dir, mozart_name):
+    """
+    Texts of the MOZART input files, one per file
+    """
+    texts = list()
+    for mozart_file in mozart_config_files(mozart_dir, mozart_name):
+        with open(mozart_file, 'r') as f:
+            texts.append(f.read())
+    return texts
+
+
+def _front_end(front_end):
+    """
+    Read, split and equations functions of a front-end
+    """
+    if front_end == 'kpp':
+        return read_kpp_config, split_by_section, micm_equation_json
+    if front_end == 'mozart':
+        return _read_mozart, split_mozart_by_section, \
+            lambda tokens: list(iter_mozart_equations(tokens))
+    raise ValueError('unknown front-end %s' % front_end)
+
+
+def _translate(kpp_dir, kpp_name, front_end='kpp'):
+    """
+    Species.json document and MICM equation entries of a mechanism
+    """
+    read, split, equations = _front_end(front_end)
+    sections = split(read(kpp_dir, kpp_name))
+    species_json = {'camp-data':
+        micm_species_json(sections['#DEFFIX'], fixed=True)
+        + micm_species_json(sections['#DEFVAR'])}
+    return species_json, equations(sections['#EQUATIONS'])
+
+
+def benchmark_output(kpp_dir, kpp_name, mechanism='benchmark', repeat=3,
+    front_end='kpp'):
+    """
+    Time and peak memory of writing MICM JSON in each output mode
+
+    Parameters
+        (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
+        (str) mechanism: MICM mechanism name
+        (int) repeat: runs per mode, the fastest is kept
+        (str) front_end: 'kpp' or 'mozart'
+
+    Returns
+        (dict): mode -> 'seconds', 'peak_bytes' allocated while writing
+            and 'bytes' written
+    """
+
+    species_json, equations_json = _translate(kpp_dir, kpp_name, front_end)
+
+    results = dict()
+    with tempfile.TemporaryDirectory() as out_dir:
+        files = [os.path.join(out_dir, 'species.json'),
+                 os.path.join(out_dir, 'reactions.json')]
+
+        def write(mode):
+            with open(files[0], 'w') as f_species, \
+                open(files[1], 'w') as f_reactions:
+                write_output(mode, f_species, f_reactions,
+                    species_json, mechanism, equations_json)
+
+        for mode in OUTPUT_MODES:
+            _, seconds = _best_time(lambda: write(mode), repeat)
+            tracemalloc.start()
+            write(mode)
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[mode] = {'seconds': seconds, 'peak_bytes': peak_bytes,
+                'bytes': sum(os.path.getsize(f) for f in files)}
+
+    return results
+
+
+def benchmark_translation(kpp_dir, kpp_name, mechanism='benchmark', repeat=3,
+    front_end='kpp'):
+    """
+    Time the translator stages on one KPP or MOZART mechanism
+
+    Parameters
+        (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
+        (str) mechanism: MICM mechanism name
+        (int) repeat: runs per stage, the fastest is kept
+        (str) front_end: 'kpp' or 'mozart'
+
+    Returns
+        (dict): 'species' and 'reactions' counts,
+            'stages' dict of stage -> seconds and their 'total'
+    """
+
+    read, split, equations = _front_end(front_end)
+    stages = dict()
+
+    lines, stages['read'] = _best_time(
+        lambda: read(kpp_dir, kpp_name), repeat)
+
+    sections, stages['split'] = _best_time(
+        lambda: split(lines), repeat)
+
+    species_json, stages['species'] = _best_time(
+        lambda: {'camp-data':
+            micm_species_json(sections['#DEFFIX'], fixed=True)
+            + micm_species_json(sections['#DEFVAR'])}, repeat)
+
+    equations_json, stages['equations'] = _best_time(
+        lambda: equations(sections['#EQUATIONS']), repeat)
+
+    def serialize():
+        with open(os.devnull, 'w') as f:
+            write_output('streamed', f, f, species_json, mechanism,
+                equations_json)
+
+    _, stages['serialize'] = _best_time(serialize, repeat)
+
+    return {'species': len(species_json['camp-data']),
+        'reactions': len(equations_json),
+        'stages': stages,
+        'total': sum(stages.values())}
+
+
+def benchmark_partition(kpp_dir, kpp_name, repeat=3, front_end='kpp'):
+    """
+    Time the block partition of one mechanism
+
+    Parameters
+        (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
+        (int) repeat: runs, the fastest is kept
+        (str) front_end: 'kpp' or 'mozart'
+
+    Returns
+        (dict): 'seconds', number of 'blocks', 'largest' block size
+            and number of 'sequential' species
+    """
+
+    species_json, equations_json = _translate(kpp_dir, kpp_name, front_end)
+    species = [entry['name'] for entry in species_json['camp-data']
+        if entry.get('tracer type') != 'CONSTANT']
+
+    result, seconds = _best_time(
+        lambda: partition(species, equations_json), repeat)
+
+    return {'seconds': seconds, 'blocks': len(result['blocks']),
+        'largest': result['largest'],
+        'sequential': len(result['sequential'])}
+
+
+def compare_baseline(results, baseline, threshold=0.25, min_seconds=1.0e-3):
+    """
+    Compare benchmark results against a baseline
+
+    Parameters
+        (dict) results: workload name -> result of benchmark_translation
+        (dict) baseline: results of a previous run, same structure
+        (float) threshold: relative slowdown reported as a regression
+        (float) min_seconds: smaller slowdowns [s] are timer noise,
+            not reported as regressions
+
+    Returns
+        (list of dict): per workload and stage present in both,
+            'workload', 'stage', 'baseline', 'current', 'ratio'
+            and 'regression' (True if ratio > 1 + threshold)
+    """
+
+    comparisons = list()
+
+    for workload, result in results.items():
+        if workload not in baseline:
+            continue
+        for stage in STAGES + ['total']:
+            current = result['total'] if stage == 'total' \
+                else result['stages'].get(stage)
+            previous = baseline[workload]['total'] if stage == 'total' \
+                else baseline[workload]['stages'].get(stage)
+            if current is None or previous is None:
+                continue
+            ratio = current / previous if previous > 0.0 else float('inf')
+            comparisons.append({'workload': workload, 'stage': stage,
+                'baseline': previous, 'current': current, 'ratio': ratio,
+                'regression': ratio > 1.0 + threshold
+                    and current - previous > min_seconds})
+
+    return comparisons
+
+
+def parse_mix(items):
+    """
+    Parse rate type weights from command line items 'type=weight'
+
+    Parameters
+        (list of str) items: e.g. ['arrhenius=3', 'troe=1']
+
+    Returns
+        (dict): rate type -> weight
+    """
+
+    mix = dict()
+    for item in items:
+        rate_type, _, weight = item.partition('=')
+        if rate_type not in RATE_TYPES:
+            raise ValueError('unknown rate type %s, expected one of %s'
+                % (rate_type, ', '.join(RATE_TYPES)))
+        mix[rate_type] = float(weight)
+
+    return mix
+
+
+if __name__ == '__main__':
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--sizes', type=int, nargs='*',
+        default=[1000, 10000, 100000],
+        help='reactions of the synthetic mechanisms')
+    parser.add_argument('--species_per_reaction', type=float,
+        default=0.3,
+        help='variable species per reaction of the synthetic mechanisms')
+    parser.add_argument('--mix', type=str, nargs='+',
+        default=None,
+        help='rate type weights, e.g. arrhenius=3 troe=1 (default RACM-like)')
+    parser.add_argument('--seed', type=int,
+        default=0,
+        help='random seed of the synthetic mechanisms')
+    parser.add_argument('--skip_fixed', action='store_true',
+        help='skip the RACM_SOA_VBS, AM4 and MCM workloads')
+    parser.add_argument('--output', action='store_true',
+        help='compare the output modes of kpp_to_micm.py')
+    parser.add_argument('--partition', action='store_true',
+        help='time the block partition of the species')
+    parser.add_argument('--repeat', type=int,
+        default=3,
+        help='runs per stage, the fastest is kept')
+    parser.add_argument('--baseline', type=str,
+        default=None,
+        help='baseline file to compare against')
+    parser.add_argument('--save_baseline', type=str,
+        default=None,
+        help='save the results as a baseline file')
+    parser.add_argument('--threshold', type=float,
+        default=0.25,
+        help='relative slowdown reported as a regression')
+    parser.add_argument('--min_seconds', type=float,
+        default=1.0e-3,
+        help='smallest slowdown [s] reported as a regression')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    try:
+        mix = None if args.mix is None else parse_mix(args.mix)
+    except ValueError as error:
+        parser.error(str(error))
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    """
+    Collect workloads: synthetic mechanisms in a temporary directory,
+    then the fixed inputs
+    """
+    tmp_dir = tempfile.TemporaryDirectory()
+    workloads = list()
+    for size in args.sizes:
+        name = 'synthetic_%d' % size
+        kpp_dir = os.path.join(tmp_dir.name, name)
+        os.mkdir(kpp_dir)
+        write_synthetic_mechanism(kpp_dir, name,
+            max(int(args.species_per_reaction * size), 2), size,
+            mix=mix, seed=args.seed)
+        workloads.append((name, kpp_dir, name, 'kpp'))
+    if not args.skip_fixed:
+        workloads.extend(FIXED_WORKLOADS)
+
+    """
+    Run the benchmark, the translator logging silenced
+    """
+    results = dict()
+    logging.info('%-16s %8s %9s ' % ('workload', 'species', 'reactions')
+        + ' '.join('%10s' % stage for stage in STAGES + ['total']))
+    for name, kpp_dir, kpp_name, front_end in workloads:
+        logging.getLogger().setLevel(logging.WARNING)
+        try:
+            result = benchmark_translation(kpp_dir, kpp_name,
+                mechanism=name, repeat=args.repeat, front_end=front_end)
+        finally:
+            logging.getLogger().setLevel(logging_level)
+        results[name] = result
+        logging.info('%-16s %8d %9d ' % (name, result['species'],
+            result['reactions'])
+            + ' '.join('%10.4f' % result['stages'][stage] for stage in STAGES)
+            + ' %10.4f' % result['total'])
+
+    """
+    Compare output modes
+    """
+    if args.output:
+        logging.info('%-16s %-12s %10s %12s %12s' % ('workload', 'output',
+            'time [s]', 'peak [MB]', 'size [MB]'))
+        for name, kpp_dir, kpp_name, front_end in workloads:
+            logging.getLogger().setLevel(logging.WARNING)
+            try:
+                output = benchmark_output(kpp_dir, kpp_name,
+                    mechanism=name, repeat=args.repeat, front_end=front_end)
+            finally:
+                logging.getLogger().setLevel(logging_level)
+            results[name]['output'] = output
+            for mode in OUTPUT_MODES:
+                logging.info('%-16s %-12s %10.4f %12.2f %12.2f'
+                    % (name, mode, output[mode]['seconds'],
+                       output[mode]['peak_bytes'] / 1.0e6,
+                       output[mode]['bytes'] / 1.0e6))
+
+    """
+    Time the block partition
+    """
+    if args.partition:
+        logging.info('%-16s %10s %8s %8s %10s' % ('workload', 'time [s]',
+            'blocks', 'largest', 'sequential'))
+        for name, kpp_dir, kpp_name, front_end in workloads:
+            logging.getLogger().setLevel(logging.WARNING)
+            try:
+                timing = benchmark_partition(kpp_dir, kpp_name,
+                    repeat=args.repeat, front_end=front_end)
+            finally:
+                logging.getLogger().setLevel(logging_level)
+            results[name]['partition'] = timing
+            logging.info('%-16s %10.4f %8d %8d %10d' % (name,
+                timing['seconds'], timing['blocks'], timing['largest'],
+                timing['sequential']))
+    tmp_dir.cleanup()
+
+    """
+    Compare against and save the baseline
+    """
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        comparisons = compare_baseline(results, baseline['results'],
+            threshold=args.threshold, min_seconds=args.min_seconds)
+        for comparison in comparisons:
+            logging.info('%-16s %-10s %10.4f %10.4f %6.2fx%s'
+                % (comparison['workload'], comparison['stage'],
+                   comparison['baseline'], comparison['current'],
+                   comparison['ratio'],
+                   '  REGRESSION' if comparison['regression'] else ''))
+        n_regressions = sum(c['regression'] for c in comparisons)
+        logging.info('%d of %d stages slower than the baseline by more '
+            'than %.0f%%' % (n_regressions, len(comparisons),
+            100.0 * args.threshold))
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                'machine': platform.machine(),
+                'repeat': args.repeat,
+                'results': results}, f, indent=4)
+        logging.info('saved baseline %s' % args.save_baseline)
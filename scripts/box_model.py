@@ -0,0 +1,637 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    box_model.py
+
+Description:
+    box_model.py integrates a translated MICM mechanism
+    (species.json, reactions.json) in a single box with a
+    stiff Rosenbrock solver, as a dependency-light reference for MICM.
+
+    compile_mechanism packs the mechanism into index arrays.
+    Reactants of each reaction are stored as a padded (reactions, slots)
+    index array into the state vector [variable species, constant species, 1],
+    so the rate of every reaction is k * prod(state[reactants], axis=1).
+    The net stoichiometry is kept as (species, reaction, coefficient) triplets,
+    and the Jacobian is assembled from (row, column, reaction, slot) triplets
+    onto its fixed sparsity pattern, one value per nonzero.
+
+    The Rosenbrock methods (ROS2, ROS3, RODAS3) follow the KPP formulation,
+    with the coefficients of Sandu et al. (1997), Atmos. Environ. 31, 3459,
+    and the KPP step size control. The matrix I / (h gamma) - J
+    is factored once per step without pivoting, as in KPP,
+    on the symbolic LU pattern of the Jacobian in Markowitz order
+    (see sparsity.py). The decomposition and solve are compiled
+    into an elimination program of index arrays, one LuStep per pivot,
+    so each pivot costs a few NumPy operations on its nonzeros only.
+    Constant species (tracer type CONSTANT) have no tendency.
+
+    State arrays may have a trailing cell axis, (species, cells),
+    the vector-ordered layout of MICM, so forcing, Jacobian, LU decomposition
+    and solve of a block of cells are each a handful of NumPy operations
+    over the whole block. rosenbrock_cells splits (cells, species) arrays
+    into blocks of block_size cells; the cells of a block share a step size,
+    with the error norm taken over the block.
+"""
+
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from rate_constants import compile_rate_parameters, mechanism_reactions
+from sparsity import markowitz_ordering, symbolic_lu
+
+logger = logging.getLogger(__name__)
+
+# (str) name, (int) stages, (ndarray) A, C lower triangular (stages, stages),
+# (ndarray) M, E, alpha, gamma (stages,), (list of bool) new_f, (float) elo
+RosenbrockTableau = namedtuple('RosenbrockTableau',
+    ['name', 'stages', 'A', 'C', 'M', 'E', 'alpha', 'gamma', 'new_f', 'elo'])
+
+
+def _lower(stages, values):
+    """
+    Unpack KPP packed lower triangular coefficients, row by row
+    """
+    matrix = np.zeros((stages, stages))
+    matrix[np.tril_indices(stages, -1)] = values
+    return matrix
+
+
+def _ros2():
+    g = 1.0 + 1.0 / np.sqrt(2.0)
+    return RosenbrockTableau('ROS2', 2,
+        A=_lower(2, [1.0 / g]),
+        C=_lower(2, [-2.0 / g]),
+        M=np.array([3.0 / (2.0 * g), 1.0 / (2.0 * g)]),
+        E=np.array([1.0 / (2.0 * g), 1.0 / (2.0 * g)]),
+        alpha=np.array([0.0, 1.0]),
+        gamma=np.array([g, -g]),
+        new_f=[True, True], elo=2.0)
+
+
+def _ros3():
+    return RosenbrockTableau('ROS3', 3,
+        A=_lower(3, [1.0, 1.0, 0.0]),
+        C=_lower(3, [-0.10156171083877702091975600115545e+01,
+                     0.40759956452537699824805835358067e+01,
+                     0.92076794298330791242156818474003e+01]),
+        M=np.array([0.1e+01, 0.61697947043828245592553615689730e+01,
+                    -0.42772256543218573326238373806514]),
+        E=np.array([0.5, -0.29079558716805469821718236208017e+01,
+                    0.22354069897811569627360909276199]),
+        alpha=np.array([0.0, 0.43586652150845899941601945119356,
+                        0.43586652150845899941601945119356]),
+        gamma=np.array([0.43586652150845899941601945119356,
+                        0.24291996454816804366592249683314,
+                        0.21851380027664058511513169485832e+01]),
+        new_f=[True, True, False], elo=3.0)
+
+
+def _rodas3():
+    return RosenbrockTableau('RODAS3', 4,
+        A=_lower(4, [0.0, 2.0, 0.0, 2.0, 0.0, 1.0]),
+        C=_lower(4, [4.0, 1.0, -1.0, 1.0, -1.0, -8.0 / 3.0]),
+        M=np.array([2.0, 0.0, 1.0, 1.0]),
+        E=np.array([0.0, 0.0, 0.0, 1.0]),
+        alpha=np.array([0.0, 0.0, 1.0, 1.0]),
+        gamma=np.array([0.5, 1.5, 0.0, 0.0]),
+        new_f=[True, False, True, True], elo=3.0)
+
+
+TABLEAUS = {'ROS2': _ros2(), 'ROS3': _ros3(), 'RODAS3': _rodas3()}
+
+# elimination of one pivot, indices into the LU nonzeros (positions)
+# or into the species vector (rows)
+#   (int) pivot, diagonal: pivot species, position of its diagonal
+#   (ndarray) lower, lower_values: later rows of the pivot column
+#   (ndarray) targets, lefts, rights: updates LU[i, j] -= LU[i, p] * LU[p, j]
+#   (ndarray) upper, upper_values: earlier rows of the pivot column
+LuStep = namedtuple('LuStep', ['pivot', 'diagonal', 'lower', 'lower_values',
+    'targets', 'lefts', 'rights', 'upper', 'upper_values'])
+
+
+def compile_lu_program(pattern, n, order):
+    """
+    Compile the LU decomposition without pivoting into an elimination program
+
+    Parameters
+        (set of tuple) pattern: (row, column) nonzeros, including the diagonal
+        (int) n: matrix size
+        (list of int) order: elimination order
+
+    Returns
+        (list of tuple, list of LuStep): LU nonzeros (row, column),
+            one step per pivot in elimination order
+    """
+
+    lu_pattern = sorted(symbolic_lu(pattern, n, order))
+    position = dict((nz, k) for k, nz in enumerate(lu_pattern))
+    rank = dict((pivot, k) for k, pivot in enumerate(order))
+
+    column = dict((j, list()) for j in range(n))
+    row = dict((i, list()) for i in range(n))
+    for i, j in lu_pattern:
+        column[j].append(i)
+        row[i].append(j)
+
+    def indices(values):
+        return np.array(values, dtype=np.intp)
+
+    program = list()
+    for p in order:
+        lower = [i for i in column[p] if rank[i] > rank[p]]
+        upper = [i for i in column[p] if rank[i] < rank[p]]
+        right = [j for j in row[p] if rank[j] > rank[p]]
+        updates = [(position[(i, j)], position[(i, p)], position[(p, j)])
+            for i in lower for j in right]
+        program.append(LuStep(p, position[(p, p)],
+            indices(lower), indices([position[(i, p)] for i in lower]),
+            indices([u[0] for u in updates]), indices([u[1] for u in updates]),
+            indices([u[2] for u in updates]),
+            indices(upper), indices([position[(i, p)] for i in upper])))
+
+    return lu_pattern, program
+
+
+def compile_mechanism(species_json, reactions_json, reorder=True):
+    """
+    Pack a MICM mechanism into index arrays
+
+    Parameters
+        (dict) species_json: species.json document
+        (dict or list) reactions_json: reactions.json document,
+            or a list of MICM reaction entries
+        (bool) reorder: eliminate species in Markowitz order,
+            otherwise in species order
+
+    Returns
+        (dict): 'species' names (variable species first),
+            'n_variable', 'absolute_tolerance', 'parameters'
+            (from compile_rate_parameters), 'reactants' padded index array,
+            stoichiometry triplets 'net_species', 'net_reaction', 'net_coefficient'
+            sorted by species, and Jacobian 'jac_rows', 'jac_cols'
+            (sparsity pattern), 'jac_index', 'jac_source', 'jac_coefficient'
+            (triplets sorted by nonzero), with 'net_present', 'net_starts',
+            'jac_present', 'jac_starts' the segments of each sum,
+            and 'lu_pattern', 'lu_program' (from compile_lu_program),
+            'jac_lu' (LU position of each Jacobian nonzero),
+            'lu_diagonal' (LU position of each diagonal element)
+    """
+
+    reactions = mechanism_reactions(reactions_json)
+
+    variable = list()
+    constant = list()
+    absolute_tolerance = list()
+    for entry in species_json['camp-data']:
+        if entry.get('type') != 'CHEM_SPEC':
+            continue
+        if entry.get('tracer type') == 'CONSTANT':
+            constant.append(entry['name'])
+        else:
+            variable.append(entry['name'])
+            absolute_tolerance.append(entry.get('absolute tolerance', 1.0e-12))
+
+    # species only named in reactions are variable
+    known = set(variable) | set(constant)
+    for reaction in reactions:
+        for name in list(reaction.get('reactants', {})) \
+            + list(reaction.get('products', {})):
+            if name not in known:
+                logger.warning('species %s not in species.json', name)
+                variable.append(name)
+                absolute_tolerance.append(1.0e-12)
+                known.add(name)
+
+    species = variable + constant
+    index = dict((name, n) for n, name in enumerate(species))
+    n_variable = len(variable)
+    one = len(species)
+
+    """
+    Reactants, padded with the index of the trailing 1 in the state
+    """
+    reactant_lists = list()
+    for reaction in reactions:
+        slots = list()
+        for name, entry in reaction.get('reactants', {}).items():
+            qty = entry.get('qty', 1)
+            if qty != int(qty):
+                raise ValueError('non-integer reactant quantity %s of %s'
+                    % (qty, name))
+            slots.extend([index[name]] * int(qty))
+        reactant_lists.append(slots)
+
+    n_slots = max([len(slots) for slots in reactant_lists] + [1])
+    reactants = np.full((len(reactions), n_slots), one, dtype=np.intp)
+    for n, slots in enumerate(reactant_lists):
+        reactants[n, :len(slots)] = slots
+
+    """
+    Net stoichiometry of variable species
+    """
+    net = dict()
+    for n, reaction in enumerate(reactions):
+        for name, entry in reaction.get('reactants', {}).items():
+            net[(index[name], n)] = net.get((index[name], n), 0.0) \
+                - entry.get('qty', 1)
+        for name, entry in reaction.get('products', {}).items():
+            net[(index[name], n)] = net.get((index[name], n), 0.0) \
+                + entry.get('yield', 1)
+    triplets = sorted((i, n, coefficient) for (i, n), coefficient in net.items()
+        if i < n_variable and coefficient != 0.0)
+    net_species = np.array([t[0] for t in triplets], dtype=np.intp)
+    net_reaction = np.array([t[1] for t in triplets], dtype=np.intp)
+    net_coefficient = np.array([t[2] for t in triplets], dtype=np.float64)
+
+    """
+    Jacobian triplets d f_i / d c_j = sum_r S_ir k_r prod_{l != m} c_{R_rl},
+    for each reactant slot m of reaction r with R_rm = j
+    """
+    rows, cols, sources, coefficients = list(), list(), list(), list()
+    for m in range(n_slots):
+        col = reactants[net_reaction, m]
+        mask = col < n_variable
+        rows.append(net_species[mask])
+        cols.append(col[mask])
+        sources.append(net_reaction[mask] * n_slots + m)
+        coefficients.append(net_coefficient[mask])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+
+    # sparsity pattern, always including the diagonal
+    diagonal = np.arange(n_variable, dtype=np.intp)
+    keys = np.concatenate([rows * n_variable + cols,
+        diagonal * n_variable + diagonal])
+    pattern, inverse = np.unique(keys, return_inverse=True)
+
+    # triplets sorted by nonzero, summed by np.add.reduceat
+    jac_index = inverse[:len(rows)]
+    order = np.argsort(jac_index, kind='stable')
+    jac_index = jac_index[order]
+    jac_present, jac_starts = np.unique(jac_index, return_index=True)
+    net_present, net_starts = np.unique(net_species, return_index=True)
+
+    """
+    Symbolic LU decomposition
+    """
+    jac_rows = pattern // max(n_variable, 1)
+    jac_cols = pattern % max(n_variable, 1)
+    jac_pattern = set(zip(jac_rows.tolist(), jac_cols.tolist()))
+    elimination_order = markowitz_ordering(jac_pattern, n_variable) \
+        if reorder else list(range(n_variable))
+    lu_pattern, lu_program = compile_lu_program(jac_pattern, n_variable,
+        elimination_order)
+    lu_position = dict((nz, k) for k, nz in enumerate(lu_pattern))
+
+    return {
+        'species': species,
+        'n_variable': n_variable,
+        'absolute_tolerance': np.array(absolute_tolerance, dtype=np.float64),
+        'parameters': compile_rate_parameters(reactions),
+        'reactants': reactants,
+        'net_species': net_species,
+        'net_reaction': net_reaction,
+        'net_coefficient': net_coefficient,
+        'net_present': net_present,
+        'net_starts': net_starts,
+        'jac_rows': jac_rows,
+        'jac_cols': jac_cols,
+        'jac_index': jac_index,
+        'jac_source': np.concatenate(sources)[order],
+        'jac_coefficient': np.concatenate(coefficients)[order],
+        'jac_present': jac_present,
+        'jac_starts': jac_starts,
+        'lu_pattern': lu_pattern,
+        'lu_program': lu_program,
+        'jac_lu': np.array([lu_position[nz] for nz in zip(jac_rows.tolist(),
+            jac_cols.tolist())], dtype=np.intp),
+        'lu_diagonal': np.array([lu_position[(i, i)]
+            for i in range(n_variable)], dtype=np.intp)}
+
+
+def _column(values, ndim):
+    """
+    Append axes to a per species or per triplet array
+    to broadcast against arrays with ndim - 1 trailing cell axes
+    """
+    return values.reshape(values.shape + (1,) * (ndim - 1))
+
+
+def _segment_sum(terms, present, starts, n):
+    """
+    Sum sorted terms by segment along the first axis
+
+    Parameters
+        (ndarray) terms: (triplets, ...) sorted terms
+        (ndarray) present: output index of each segment
+        (ndarray) starts: first term of each segment
+        (int) n: output length
+
+    Returns
+        (ndarray): (n, ...) sums, zero where no segment
+    """
+    sums = np.zeros((n,) + terms.shape[1:])
+    if len(starts):
+        sums[present] = np.add.reduceat(terms, starts, axis=0)
+    return sums
+
+
+def full_state(y, constants):
+    """
+    Parameters
+        (ndarray) y: variable species concentrations, (species[, cells])
+        (ndarray) constants: constant species concentrations
+
+    Returns
+        (ndarray): state [y, constants, 1]
+    """
+    return np.concatenate([y, constants, np.ones((1,) + y.shape[1:])])
+
+
+def reaction_rates(mechanism, rate_constants, state):
+    """
+    Parameters
+        (dict) mechanism: from compile_mechanism
+        (ndarray) rate_constants: (reactions[, cells])
+        (ndarray) state: from full_state
+
+    Returns
+        (ndarray): rate of each reaction, (reactions[, cells])
+    """
+    return rate_constants * np.prod(state[mechanism['reactants']], axis=1)
+
+
+def forcing(mechanism, rate_constants, state):
+    """
+    Tendency of the variable species, f = S rates
+
+    Parameters
+        (dict) mechanism: from compile_mechanism
+        (ndarray) rate_constants: (reactions[, cells])
+        (ndarray) state: from full_state
+
+    Returns
+        (ndarray): d y / d t, (species[, cells])
+    """
+    rates = reaction_rates(mechanism, rate_constants, state)
+    terms = _column(mechanism['net_coefficient'], rates.ndim) \
+        * rates[mechanism['net_reaction']]
+    return _segment_sum(terms, mechanism['net_present'],
+        mechanism['net_starts'], mechanism['n_variable'])
+
+
+def jacobian(mechanism, rate_constants, state):
+    """
+    Nonzero values of the Jacobian d f / d y
+
+    Parameters
+        (dict) mechanism: from compile_mechanism
+        (ndarray) rate_constants: (reactions[, cells])
+        (ndarray) state: from full_state
+
+    Returns
+        (ndarray): one value per nonzero of (jac_rows, jac_cols),
+            (nonzeros[, cells])
+    """
+
+    concentrations = state[mechanism['reactants']]
+    n_reactions, n_slots = concentrations.shape[:2]
+
+    # partial[r, m] = k_r * prod of the other reactant slots of reaction r
+    partial = np.empty_like(concentrations)
+    for m in range(n_slots):
+        others = np.delete(concentrations, m, axis=1)
+        partial[:, m] = rate_constants * np.prod(others, axis=1)
+
+    partial = partial.reshape((n_reactions * n_slots,) + partial.shape[2:])
+    terms = _column(mechanism['jac_coefficient'], partial.ndim) \
+        * partial[mechanism['jac_source']]
+    return _segment_sum(terms, mechanism['jac_present'],
+        mechanism['jac_starts'], len(mechanism['jac_rows']))
+
+
+def lu_decompose(program, values):
+    """
+    Sparse LU decomposition without pivoting, as KppDecomp
+
+    Parameters
+        (list of LuStep) program: from compile_lu_program
+        (ndarray) values: (LU nonzeros[, cells]) matrix values
+            on the LU pattern, zero at fill-in
+
+    Returns
+        (ndarray): (LU nonzeros[, cells]) unit lower L (below diagonal) and U
+    """
+
+    lu = np.array(values, dtype=np.float64)
+    for step in program:
+        if len(step.lower):
+            lu[step.lower_values] /= lu[step.diagonal]
+        if len(step.targets):
+            lu[step.targets] -= lu[step.lefts] * lu[step.rights]
+
+    return lu
+
+
+def lu_solve(program, lu, b):
+    """
+    Solve L U x = b
+
+    Parameters
+        (list of LuStep) program: from compile_lu_program
+        (ndarray) lu: from lu_decompose
+        (ndarray) b: right hand side, (n[, cells])
+
+    Returns
+        (ndarray): x, (n[, cells])
+    """
+
+    x = np.array(b, dtype=np.float64)
+    # column oriented substitution, one broadcast operation per pivot
+    for step in program:
+        if len(step.lower):
+            x[step.lower] -= lu[step.lower_values] * x[step.pivot]
+    for step in reversed(program):
+        x[step.pivot] /= lu[step.diagonal]
+        if len(step.upper):
+            x[step.upper] -= lu[step.upper_values] * x[step.pivot]
+
+    return x
+
+
+def error_norm(y, y_new, y_err, absolute_tolerance, relative_tolerance):
+    """
+    Root mean square of the scaled error estimate, over all cells
+    """
+    scale = _column(np.asarray(absolute_tolerance, dtype=np.float64), y.ndim) \
+        + relative_tolerance * np.maximum(np.abs(y), np.abs(y_new))
+    return max(np.sqrt(np.mean((y_err / scale)**2)), 1.0e-10)
+
+
+def rosenbrock(mechanism, rate_constants, y, constants, t_end,
+    method='RODAS3', relative_tolerance=1.0e-4, absolute_tolerance=None,
+    h_start=None, h_min=0.0, h_max=None, max_steps=100000, kernels=None):
+    """
+    Integrate the mechanism over [0, t_end] with fixed rate constants
+
+    Parameters
+        (dict) mechanism: from compile_mechanism
+        (ndarray) rate_constants: (reactions[, cells])
+        (ndarray) y: initial variable species concentrations, (species[, cells])
+        (ndarray) constants: constant species concentrations
+        (float) t_end: integration time [s]
+        (str) method: ROS2, ROS3 or RODAS3
+        (float) relative_tolerance: relative tolerance
+        (ndarray) absolute_tolerance: per species (default from species.json)
+        (float) h_start, h_min, h_max: step sizes [s]
+        (int) max_steps: maximum number of steps
+        (module) kernels: generated forcing and jacobian
+            (codegen.load_kernels), default box_model forcing and jacobian
+
+    Returns
+        (ndarray, dict): concentrations at t_end, solver statistics
+            including the next step size 'h_next'
+    """
+
+    tableau = TABLEAUS[method.upper()]
+    if absolute_tolerance is None:
+        absolute_tolerance = mechanism['absolute_tolerance']
+    h_max = t_end if h_max is None else h_max
+    h = max(h_min, 1.0e-5) if h_start is None else h_start
+
+    program = mechanism['lu_program']
+    jac_lu = mechanism['jac_lu']
+    lu_diagonal = mechanism['lu_diagonal']
+    n_lu = len(mechanism['lu_pattern'])
+
+    if kernels is None:
+        def evaluate_forcing(state):
+            return forcing(mechanism, rate_constants, state)
+
+        def evaluate_jacobian(state):
+            return jacobian(mechanism, rate_constants, state)
+    else:
+        def evaluate_forcing(state):
+            return kernels.forcing(rate_constants, state,
+                np.empty((kernels.N_VARIABLE,) + state.shape[1:]))
+
+        def evaluate_jacobian(state):
+            return kernels.jacobian(rate_constants, state,
+                np.empty((kernels.N_JACOBIAN,) + state.shape[1:]))
+
+    stats = {'steps': 0, 'accepted': 0, 'rejected': 0, 'functions': 0,
+        'jacobians': 0, 'decompositions': 0, 'solves': 0}
+
+    y = np.array(y, dtype=np.float64)
+    t = 0.0
+    rejected_last = False
+    K = np.zeros((tableau.stages,) + y.shape)
+
+    while t_end - t > 1.0e-12 * t_end:
+        if stats['steps'] >= max_steps:
+            raise RuntimeError('rosenbrock: more than %d steps at t = %g'
+                % (max_steps, t))
+        stats['steps'] += 1
+
+        state = full_state(y, constants)
+        f0 = evaluate_forcing(state)
+        jac = evaluate_jacobian(state)
+        stats['functions'] += 1
+        stats['jacobians'] += 1
+
+        while True:
+            h = min(h, h_max, t_end - t)
+
+            G = np.zeros((n_lu,) + y.shape[1:])
+            G[jac_lu] = - jac
+            G[lu_diagonal] += 1.0 / (h * tableau.gamma[0])
+            lu = lu_decompose(program, G)
+            stats['decompositions'] += 1
+
+            for stage in range(tableau.stages):
+                if stage == 0:
+                    f = f0
+                elif tableau.new_f[stage]:
+                    y_stage = y + np.tensordot(tableau.A[stage, :stage],
+                        K[:stage], axes=1)
+                    f = evaluate_forcing(full_state(y_stage, constants))
+                    stats['functions'] += 1
+                rhs = f + np.tensordot(tableau.C[stage, :stage] / h,
+                    K[:stage], axes=1)
+                K[stage] = lu_solve(program, lu, rhs)
+                stats['solves'] += 1
+
+            y_new = y + np.tensordot(tableau.M, K, axes=1)
+            y_err = np.tensordot(tableau.E, K, axes=1)
+            error = error_norm(y, y_new, y_err,
+                absolute_tolerance, relative_tolerance)
+
+            factor = min(6.0, max(0.2, 0.9 / error**(1.0 / tableau.elo)))
+            h_new = h * factor
+
+            if error <= 1.0 or h <= h_min:
+                stats['accepted'] += 1
+                y = y_new
+                t += h
+                h_new = max(h_min, min(h_new, h_max))
+                if rejected_last:
+                    h_new = min(h_new, h)
+                rejected_last = False
+                h = h_new
+                break
+
+            stats['rejected'] += 1
+            h = max(h_min, h_new if not rejected_last else h * 0.1)
+            rejected_last = True
+
+    stats['h_next'] = h
+
+    return y, stats
+
+
+def rosenbrock_cells(mechanism, rate_constants, y, constants, t_end,
+    block_size=None, **kwargs):
+    """
+    Integrate independent cells in blocks of block_size cells
+
+    Parameters
+        (dict) mechanism: from compile_mechanism
+        (ndarray) rate_constants: (cells, reactions),
+            e.g. from rate_constants.evaluate_rate_constants
+        (ndarray) y: (cells, variable species) initial concentrations
+        (ndarray) constants: (cells, constant species) concentrations
+        (float) t_end: integration time [s]
+        (int) block_size: cells per block (default all cells)
+        kwargs: passed to rosenbrock
+
+    Returns
+        (ndarray, dict): (cells, variable species) concentrations at t_end,
+            solver statistics summed over blocks
+    """
+
+    n_cells = y.shape[0]
+    block_size = n_cells if block_size is None else block_size
+
+    y_end = np.empty_like(y, dtype=np.float64)
+    totals = dict()
+
+    for start in range(0, n_cells, block_size):
+        block = slice(start, min(start + block_size, n_cells))
+        # vector-ordered block, species by cells
+        y_block, stats = rosenbrock(mechanism,
+            np.ascontiguousarray(rate_constants[block].T),
+            np.ascontiguousarray(y[block].T),
+            np.ascontiguousarray(constants[block].T), t_end, **kwargs)
+        y_end[block] = y_block.T
+        stats.pop('h_next')
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+    totals['blocks'] = -(-n_cells // block_size) if n_cells else 0
+
+    return y_end, totals
@@ -0,0 +1,281 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    codegen.py
+
+Usage:
+    python codegen.py
+    python codegen.py --help
+
+Description:
+    codegen.py generates loop-free Python kernels for a compiled mechanism
+    (box_model.compile_mechanism), as KPP generates Fortran for the
+    ODE function and Jacobian:
+
+        forcing(rates, conc, out)    d y / d t of the variable species
+        jacobian(rates, conc, out)   Jacobian values on (jac_rows, jac_cols)
+
+    rates are the rate constants and conc the state [variable species,
+    constant species, 1], either lists of floats (one cell) or arrays
+    with a trailing cell axis. Results are written into the preallocated out.
+    Each reaction rate and each partial derivative of a reaction rate
+    by one reactant is one statement, and each tendency
+    and Jacobian element is one sum of these, with no loop or index array.
+
+    Generated modules are cached on disk, named by the hash
+    of the mechanism structure, so they are generated once per mechanism.
+    The main program benchmarks the kernels against box_model.py.
+"""
+
+import os
+import sys
+import argparse
+import logging
+import json
+import time
+import hashlib
+import tempfile
+import importlib.util
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GENERATOR_VERSION = '2'
+
+
+def mechanism_digest(mechanism):
+    """
+    Hash of the mechanism structure the kernels depend on
+
+    Parameters
+        (dict) mechanism: from box_model.compile_mechanism
+
+    Returns
+        (str): hex digest
+    """
+
+    digest = hashlib.sha256(GENERATOR_VERSION.encode())
+    for key in ['reactants', 'net_species', 'net_reaction', 'net_coefficient',
+        'jac_index', 'jac_source', 'jac_coefficient']:
+        digest.update(key.encode())
+        digest.update(np.ascontiguousarray(mechanism[key]).tobytes())
+    digest.update(json.dumps([mechanism['species'],
+        len(mechanism['jac_rows'])]).encode())
+
+    return digest.hexdigest()
+
+
+def _term(coefficient, expression):
+    """
+    Signed term of a sum, e.g. ' - r3', ' + 0.5 * r7'
+    """
+    sign = ' - ' if coefficient < 0.0 else ' + '
+    magnitude = abs(coefficient)
+    if magnitude == 1.0:
+        return sign + expression
+    return sign + repr(magnitude) + ' * ' + expression
+
+
+def _sum(terms):
+    """
+    Sum of signed terms, '0.0' if empty
+    """
+    if not terms:
+        return '0.0'
+    expression = ''.join(terms)
+    return '- ' + expression[3:] if expression.startswith(' - ') \
+        else expression[3:]
+
+
+def kernel_source(mechanism, digest=None):
+    """
+    Generate the Python source of the forcing and Jacobian kernels
+
+    Parameters
+        (dict) mechanism: from box_model.compile_mechanism
+        (str) digest: mechanism hash for the module docstring
+
+    Returns
+        (str): module source
+    """
+
+    one = len(mechanism['species'])
+    reactants = mechanism['reactants'].tolist()
+    n_slots = mechanism['reactants'].shape[1]
+
+    def product(factors):
+        return ' * '.join(factors)
+
+    def slots(r, skip=None):
+        return ['conc[%d]' % c for m, c in enumerate(reactants[r])
+            if c != one and m != skip]
+
+    lines = ['"""',
+        'Generated by codegen.py from mechanism %s, do not edit' % digest,
+        '"""',
+        '',
+        'N_VARIABLE = %d' % mechanism['n_variable'],
+        'N_JACOBIAN = %d' % len(mechanism['jac_rows']),
+        '',
+        '',
+        'def forcing(rates, conc, out):']
+
+    """
+    Reaction rates, then one sum per species
+    """
+    net_reaction = mechanism['net_reaction'].tolist()
+    for r in sorted(set(net_reaction)):
+        lines.append('    r%d = %s' % (r, product(['rates[%d]' % r] + slots(r))))
+
+    terms = dict()
+    for i, r, coefficient in zip(mechanism['net_species'].tolist(),
+        net_reaction, mechanism['net_coefficient'].tolist()):
+        terms.setdefault(i, list()).append(_term(coefficient, 'r%d' % r))
+    for i in range(mechanism['n_variable']):
+        lines.append('    out[%d] = %s' % (i, _sum(terms.get(i, []))))
+    lines.extend(['    return out', '', '',
+        'def jacobian(rates, conc, out):'])
+
+    """
+    Partial derivatives of each reaction rate by each reactant slot,
+    then one sum per nonzero
+    """
+    jac_source = mechanism['jac_source'].tolist()
+    for source in sorted(set(jac_source)):
+        r, m = divmod(source, n_slots)
+        lines.append('    b%d = %s'
+            % (source, product(['rates[%d]' % r] + slots(r, skip=m))))
+
+    terms = dict()
+    for nz, source, coefficient in zip(mechanism['jac_index'].tolist(),
+        jac_source, mechanism['jac_coefficient'].tolist()):
+        terms.setdefault(nz, list()).append(_term(coefficient, 'b%d' % source))
+    for nz in range(len(mechanism['jac_rows'])):
+        lines.append('    out[%d] = %s' % (nz, _sum(terms.get(nz, []))))
+    lines.extend(['    return out', ''])
+
+    return '\n'.join(lines)
+
+
+def load_kernels(mechanism, cache_dir):
+    """
+    Load the kernels of a mechanism, generating them on a cache miss
+
+    Parameters
+        (dict) mechanism: from box_model.compile_mechanism
+        (str) cache_dir: directory of generated modules, created if missing
+
+    Returns
+        (module): generated module with forcing and jacobian
+    """
+
+    digest = mechanism_digest(mechanism)
+    name = 'micm_kernels_' + digest[:16]
+    module_file = os.path.join(cache_dir, name + '.py')
+
+    if not os.path.exists(module_file):
+        os.makedirs(cache_dir, exist_ok=True)
+        start = time.perf_counter()
+        source = kernel_source(mechanism, digest)
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(source)
+        os.replace(tmp_file, module_file)
+        logger.info('generated %s in %.3f s',
+            module_file, time.perf_counter() - start)
+    else:
+        logger.debug('using cached %s', module_file)
+
+    spec = importlib.util.spec_from_file_location(name, module_file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+if __name__ == '__main__':
+
+    from box_model import compile_mechanism, full_state, forcing, jacobian
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--micm_dir', type=str,
+        default=os.path.join('..', 'racm_esrl_vcp', 'micm'),
+        help='MICM config directory')
+    parser.add_argument('--mechanism', type=str,
+        default='RACM_SOA_VBS',
+        help='mechanism name')
+    parser.add_argument('--cache_dir', type=str,
+        default=os.path.join(os.path.expanduser('~'), '.cache', 'micm-kpp',
+            'kernels'),
+        help='directory of generated kernels')
+    parser.add_argument('--n_cells', type=int,
+        default=256,
+        help='number of cells of the vector benchmark')
+    parser.add_argument('--repeat', type=int,
+        default=200,
+        help='evaluations per benchmark')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    with open(os.path.join(args.micm_dir, args.mechanism, 'species.json')) as f:
+        species_json = json.load(f)
+    with open(os.path.join(args.micm_dir, args.mechanism, 'reactions.json')) as f:
+        reactions_json = json.load(f)
+
+    mechanism = compile_mechanism(species_json, reactions_json)
+    kernels = load_kernels(mechanism, args.cache_dir)
+
+    """
+    Benchmark generated kernels against box_model.py
+    """
+    rng = np.random.default_rng(0)
+    n_variable = mechanism['n_variable']
+    n_constant = len(mechanism['species']) - n_variable
+    n_reactions = mechanism['reactants'].shape[0]
+
+    for n_cells in [None, args.n_cells]:
+        shape = tuple() if n_cells is None else (n_cells,)
+        rates = rng.uniform(size=(n_reactions,) + shape)
+        state = full_state(rng.uniform(size=(n_variable,) + shape),
+            rng.uniform(size=(n_constant,) + shape))
+        f_out = np.empty((n_variable,) + shape)
+        jac_out = np.empty((len(mechanism['jac_rows']),) + shape)
+        # one cell kernels run on Python floats
+        kernel_rates = rates.tolist() if n_cells is None else rates
+        kernel_state = state.tolist() if n_cells is None else state
+
+        timings = dict()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            f = forcing(mechanism, rates, state)
+            jac = jacobian(mechanism, rates, state)
+        timings['box_model'] = (time.perf_counter() - start) / args.repeat
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            kernels.forcing(kernel_rates, kernel_state, f_out)
+            kernels.jacobian(kernel_rates, kernel_state, jac_out)
+        timings['generated'] = (time.perf_counter() - start) / args.repeat
+
+        assert np.allclose(f, f_out) and np.allclose(jac, jac_out)
+        logging.info('%s cells: forcing + jacobian box_model %.1f us, '
+            'generated %.1f us (%.1fx)'
+            % (1 if n_cells is None else n_cells,
+               1.0e6 * timings['box_model'], 1.0e6 * timings['generated'],
+               timings['box_model'] / timings['generated']))
@@ -9,10 +9,39 @@ File:
 
 Usage:
     python initial_conditions.py
+    python initial_conditions.py --n_steps 60 --method ROS2
+    python initial_conditions.py --n_cells 4096 --block_sizes 1 16 64 256 4096
+    python initial_conditions.py --n_steps 2880 --diurnal_amplitude 5
     python initial_conditions.py --help
 
 Description:
+    initial_conditions.py reads the MICM initial conditions
+    (initial_conditions.csv) of a mechanism and integrates the
+    translated mechanism (species.json, reactions.json) in a box model
+    with the Rosenbrock solver of box_model.py, without a MICM build.
 
+    initial_conditions.csv has one name,value pair per line:
+        CONC.<species>       initial concentration
+        ENV.temperature      temperature [K]
+        ENV.pressure         pressure [Pa]
+        ENV.air_density      air density
+        ENV.time_step        time step [s]
+        PHOTO.<MUSICA name>  photolysis rate [s-1]
+    Concentrations and air density are in the units of the rate parameters,
+    as for MICM. M defaults to the air density, other species to zero.
+
+    With --n_cells, the initial conditions are replicated over n_cells
+    independent cells with temperatures spread by +/- 10 K,
+    and one time step is integrated with box_model.rosenbrock_cells
+    for each block size, reporting throughput in cells per second.
+    With --kernels_dir, forcing and Jacobian are evaluated
+    by kernels generated with codegen.py and cached in that directory.
+
+    The rate constants of each time step are taken from a
+    rate_constants.RateConstantCache, and recomputed only when the
+    quantized environment changes. With --diurnal_amplitude, the temperature
+    follows a 24 h cycle of that amplitude around ENV.temperature,
+    so runs longer than a day revisit the states of the first day.
 """
 
 import os
@@ -20,10 +49,87 @@ import sys
 import argparse
 import logging
 import json
+import time
+
+import numpy as np
+
+from rate_constants import RateConstantCache, evaluate_rate_constants
+from box_model import TABLEAUS, compile_mechanism, rosenbrock, \
+    rosenbrock_cells
+from codegen import load_kernels
+
+logger = logging.getLogger(__name__)
+
+
+def read_initial_conditions(csv_file):
+    """
+    Read a MICM initial conditions file
+
+    Parameters
+        (str) csv_file: initial_conditions.csv
+
+    Returns
+        (dict): 'CONC', 'ENV', 'PHOTO', ... dicts of name -> value
+    """
+
+    conditions = {'CONC': dict(), 'ENV': dict(), 'PHOTO': dict()}
+
+    with open(csv_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            key, _, value = line.partition(',')
+            prefix, _, name = key.strip().partition('.')
+            conditions.setdefault(prefix, dict())[name] = float(value)
+
+    return conditions
+
+
+def initial_conditions(species_json, reactions_json, conditions, cache=None):
+    """
+    Compile a mechanism and its initial state
 
+    Parameters
+        (dict) species_json: species.json document
+        (dict) reactions_json: reactions.json document
+        (dict) conditions: from read_initial_conditions
+        (RateConstantCache) cache: rate constant cache of the mechanism,
+            default direct evaluation
 
-def initial_conditions(species_json, reactions_json):
-    pass
+    Returns
+        (dict, ndarray, ndarray, ndarray): mechanism from compile_mechanism,
+            rate constants, variable and constant species concentrations
+    """
+
+    mechanism = compile_mechanism(species_json, reactions_json)
+
+    env = conditions['ENV']
+    concentrations = dict(conditions['CONC'])
+    concentrations.setdefault('M', env['air_density'])
+
+    species = mechanism['species']
+    for name in concentrations:
+        if name not in species:
+            logger.warning('initial condition for unknown species %s', name)
+    state = np.array([concentrations.get(name, 0.0) for name in species])
+
+    if cache is not None:
+        rate_constants = cache.rate_constants(env['temperature'],
+            env['pressure'], env['air_density'],
+            photolysis=conditions['PHOTO'])
+    else:
+        rate_constants = evaluate_rate_constants(mechanism['parameters'],
+            env['temperature'], env['pressure'], env['air_density'],
+            photolysis=conditions['PHOTO'])[0]
+
+    for name in mechanism['parameters'].get('PHOTOLYSIS', {}).get('names', []):
+        if name not in conditions['PHOTO']:
+            logger.warning('no photolysis rate for %s, set to 0', name)
+
+    n_variable = mechanism['n_variable']
+
+    return mechanism, rate_constants, state[:n_variable], state[n_variable:]
 
 
 if __name__ == '__main__':
@@ -43,6 +149,33 @@ if __name__ == '__main__':
         # default='test',
         default='RACM_SOA_VBS',
         help='mechanism name')
+    parser.add_argument('--initial_conditions', type=str,
+        default=None,
+        help='initial conditions file (default <micm_dir>/<mechanism>/initial_conditions.csv)')
+    parser.add_argument('--n_steps', type=int,
+        default=10,
+        help='number of time steps')
+    parser.add_argument('--method', type=str,
+        default='RODAS3', choices=sorted(TABLEAUS),
+        help='Rosenbrock method')
+    parser.add_argument('--relative_tolerance', type=float,
+        default=1.0e-4,
+        help='solver relative tolerance')
+    parser.add_argument('--kernels_dir', type=str,
+        default=None,
+        help='use generated kernels, cached in this directory')
+    parser.add_argument('--diurnal_amplitude', type=float,
+        default=0.0,
+        help='amplitude of the diurnal temperature cycle [K]')
+    parser.add_argument('--cache_size', type=int,
+        default=1024,
+        help='environmental states kept in the rate constant cache')
+    parser.add_argument('--n_cells', type=int,
+        default=0,
+        help='benchmark batched integration of n_cells cells')
+    parser.add_argument('--block_sizes', type=int, nargs='+',
+        default=[1, 16, 64, 256, 1024],
+        help='cells per block in the batched benchmark')
     parser.add_argument('--debug', action='store_true',
         help='set logging level to debug')
     args = parser.parse_args()
@@ -59,13 +192,86 @@ if __name__ == '__main__':
     reactions_file = os.path.join(args.micm_dir, args.mechanism, 'reactions.json')
     logging.info(reactions_file)
 
+    csv_file = args.initial_conditions if args.initial_conditions is not None \
+        else os.path.join(args.micm_dir, args.mechanism, 'initial_conditions.csv')
+    logging.info(csv_file)
+
     with open(species_file, 'r') as f:
         species_json = json.load(f)
 
     with open(reactions_file, 'r') as f:
         reactions_json = json.load(f)
 
-    species_json_str = json.dumps(species_json, indent=4)
-    reactions_json_str = json.dumps(reactions_json, indent=4)
+    conditions = read_initial_conditions(csv_file)
+
+    mechanism, rate_constants, y, constants \
+        = initial_conditions(species_json, reactions_json, conditions)
+    logging.info('%d variable species, %d constant species, %d reactions, '
+        '%d Jacobian nonzeros'
+        % (mechanism['n_variable'], len(constants), len(rate_constants),
+           len(mechanism['jac_rows'])))
+
+    time_step = conditions['ENV'].get('time_step', 60.0)
+
+    kernels = None
+    if args.kernels_dir is not None:
+        kernels = load_kernels(mechanism, args.kernels_dir)
+
+    if args.n_cells > 0:
+        """
+        Benchmark batched integration by block size
+        """
+        env = conditions['ENV']
+        rng = np.random.default_rng(0)
+        temperature = env['temperature'] \
+            + rng.uniform(-10.0, 10.0, args.n_cells)
+        cell_rate_constants = evaluate_rate_constants(mechanism['parameters'],
+            temperature, env['pressure'], env['air_density'],
+            photolysis=conditions['PHOTO'])
+        cell_y = np.tile(y, (args.n_cells, 1))
+        cell_constants = np.tile(constants, (args.n_cells, 1))
+
+        logging.info('%10s %10s %12s %10s' % ('block size', 'time [s]',
+            'cells / s', 'steps'))
+        for block_size in args.block_sizes:
+            start = time.perf_counter()
+            _, stats = rosenbrock_cells(mechanism, cell_rate_constants,
+                cell_y, cell_constants, time_step, block_size=block_size,
+                method=args.method, relative_tolerance=args.relative_tolerance,
+                kernels=kernels)
+            seconds = time.perf_counter() - start
+            logging.info('%10d %10.3f %12.1f %10d' % (block_size, seconds,
+                args.n_cells / seconds, stats['steps']))
+        sys.exit(0)
+
+    """
+    Integrate the box model
+    """
+    env = conditions['ENV']
+    cache = RateConstantCache(mechanism['parameters'],
+        max_size=args.cache_size)
+    totals = dict()
+    h_start = None
+    start = time.perf_counter()
+    for step in range(args.n_steps):
+        temperature = env['temperature'] + args.diurnal_amplitude \
+            * np.sin(2.0 * np.pi * step * time_step / 86400.0)
+        rate_constants = cache.rate_constants(temperature, env['pressure'],
+            env['air_density'], photolysis=conditions['PHOTO'])
+        y, stats = rosenbrock(mechanism, rate_constants, y, constants,
+            time_step, method=args.method,
+            relative_tolerance=args.relative_tolerance, h_start=h_start,
+            kernels=kernels)
+        h_start = stats.pop('h_next')
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+        logging.debug('t = %g s, %s' % ((step + 1) * time_step, stats))
+    seconds = time.perf_counter() - start
 
-    initial_conditions(species_json, reactions_json)
+    for name, value in zip(mechanism['species'], y):
+        logging.info('%-16s %14.6e' % (name, value))
+    logging.info('%s: %d time steps of %g s in %.3f s, %s'
+        % (args.method, args.n_steps, time_step, seconds, totals))
+    logging.info('rate constant cache: %d states, %d hits, %d misses, '
+        '%d evictions' % (len(cache), cache.hits, cache.misses,
+            cache.evictions))
@@ -0,0 +1,203 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    kpp_cache.py
+
+Description:
+    kpp_cache.py is an on-disk cache for incremental KPP to MICM translation.
+    Each entry is one JSON file, named by the hash of the MICM output
+    directory it describes, holding the content hash of the inputs,
+    the size and modification time of the outputs,
+    and the translated MICM entries of every equation.
+
+    Entries are written atomically, so several processes can share
+    a cache directory. Access time is tracked by file modification time,
+    and the least recently used entries are removed
+    when the cache grows beyond its size limit.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def digest_files(filenames, *extra):
+    """
+    Hash the contents of files together with extra strings
+
+    Parameters
+        (list of str) filenames: files to hash, order matters
+        (str) extra: e.g. translator version, mechanism name
+
+    Returns
+        (str): hex digest
+    """
+
+    digest = hashlib.sha256()
+
+    for item in extra:
+        digest.update(str(item).encode())
+        digest.update(b'\0')
+
+    for filename in filenames:
+        digest.update(os.path.basename(filename).encode())
+        digest.update(b'\0')
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        digest.update(b'\0')
+
+    return digest.hexdigest()
+
+
+def file_stamps(filenames):
+    """
+    Size and modification time of files, None for missing files
+
+    Parameters
+        (list of str) filenames: files to stamp
+
+    Returns
+        (dict): basename -> [size, mtime_ns] or None
+    """
+
+    stamps = dict()
+
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+            stamps[os.path.basename(filename)] = [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            stamps[os.path.basename(filename)] = None
+
+    return stamps
+
+
+class EquationMemo:
+    """
+    Translated equations keyed by equation text,
+    reusing entries from a previous translation;
+    only entries used by the current translation are kept
+    """
+
+    def __init__(self, previous=None):
+        self.previous = previous if previous is not None else dict()
+        self.current = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.current.get(key)
+        if value is None:
+            value = self.previous.get(key)
+            if value is not None:
+                self.current[key] = value
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self.current[key] = value
+
+
+class TranslationCache:
+    """
+    On-disk cache of translation entries with LRU eviction
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Parameters
+            (str) cache_dir: cache directory, created if missing
+            (int) max_bytes: size limit of all entries
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_file(self, name):
+        """
+        Parameters
+            (str) name: entry name, e.g. MICM output directory
+
+        Returns
+            (str): entry file path
+        """
+        digest = hashlib.sha256(os.path.abspath(name).encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.json')
+
+    def load(self, name):
+        """
+        Load an entry and mark it as recently used
+
+        Parameters
+            (str) name: entry name
+
+        Returns
+            (dict): entry, None if absent or unreadable
+        """
+        entry_file = self.entry_file(name)
+        try:
+            with open(entry_file, 'r') as f:
+                entry = json.load(f)
+            os.utime(entry_file)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def save(self, name, entry):
+        """
+        Atomically write an entry, then evict least recently used entries
+
+        Parameters
+            (str) name: entry name
+            (dict) entry: JSON serializable entry
+        """
+        fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_file, self.entry_file(name))
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits its size limit
+
+        Returns
+            (int): number of entries removed
+        """
+        entries = list()
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, filename))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+            logger.debug('evicted cache entry %s' % filename)
+
+        return removed
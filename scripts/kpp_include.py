@@ -0,0 +1,250 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    kpp_include.py
+
+Usage:
+    from kpp_include import shared_include_cache
+    files = shared_include_cache.dependencies(['small_strato.def'])
+    tokens = shared_include_cache.iter_tokens(['small_strato.def'])
+
+Description:
+    kpp_include.py resolves KPP #INCLUDE directives.
+    An included file is looked up in the directory of the including file,
+    then in the include directories of the cache.
+    The files reachable from a set of root files form a dependency graph,
+    which is read depth first: the files included by a file
+    come before it, and each file is read once,
+    however many files include it (e.g. atoms.kpp).
+
+    Each file is tokenized (kpp_lexer.tokenize) on its own,
+    starting outside any section, and its tokens are cached with
+    the size and modification time of the file. An IncludeCache
+    is shared by every mechanism read through it, so common files
+    are tokenized once per process, and a file is tokenized again
+    only when it changes. shared_include_cache is the cache
+    used by kpp_to_micm.py and kpp_translate.py.
+
+    Files larger than max_cached_size (e.g. a generated .eqn file)
+    keep only their #INCLUDE files in the cache; their tokens are
+    read lazily from the open file each time, so streaming a large
+    mechanism (kpp_to_micm.py --stream) stays in bounded memory.
+"""
+
+import os
+import logging
+from collections import namedtuple
+
+from kpp_lexer import tokenize, SECTION
+
+logger = logging.getLogger(__name__)
+
+# files larger than this (bytes) are not kept as tokens in the cache
+MAX_CACHED_SIZE = 1 << 20
+
+# (str) absolute path, [size, mtime_ns], (tuple of KppToken) tokens,
+# None if the file is too large to cache,
+# (tuple of str) resolved absolute paths of the #INCLUDE files
+ParsedFile = namedtuple('ParsedFile', ['path', 'stamp', 'tokens', 'includes'])
+
+
+def _stamp(path):
+    """
+    Size and modification time of a file
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class IncludeCache:
+    """
+    Tokens and #INCLUDE files of KPP config files,
+    tokenized once and shared by every mechanism including them
+    """
+
+    def __init__(self, include_dirs=None, max_cached_size=MAX_CACHED_SIZE):
+        """
+        Parameters
+            (list of str) include_dirs: directories searched
+                after the directory of the including file
+            (int) max_cached_size: size in bytes of the largest file
+                whose tokens are cached
+        """
+        self.include_dirs = list(include_dirs) if include_dirs else list()
+        self.max_cached_size = max_cached_size
+        self.files = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, name, including_dir):
+        """
+        Path of an included file
+
+        Parameters
+            (str) name: #INCLUDE argument, e.g. 'atoms.kpp'
+            (str) including_dir: directory of the including file
+
+        Returns
+            (str): absolute path, None if not found
+        """
+        for directory in [including_dir] + self.include_dirs:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                return os.path.abspath(path)
+        return None
+
+    def parse(self, path):
+        """
+        Tokenize a file unless it is cached and unchanged
+
+        Parameters
+            (str) path: KPP config file
+
+        Returns
+            (ParsedFile): tokens and resolved #INCLUDE files
+        """
+        path = os.path.abspath(path)
+        stamp = _stamp(path)
+
+        parsed = self.files.get(path)
+        if parsed is not None and parsed.stamp == stamp:
+            self.hits += 1
+            return parsed
+        self.misses += 1
+
+        with open(path, 'r') as f:
+            if stamp[0] <= self.max_cached_size:
+                tokens = tuple(tokenize(f))
+                includes = self._includes(path, tokens)
+            elif any('#INCLUDE' in line for line in f):
+                # a large file is tokenized again, streamed, when read
+                f.seek(0)
+                tokens = None
+                includes = self._includes(path, tokenize(f))
+            else:
+                tokens = None
+                includes = tuple()
+
+        logger.debug('parsed %s, includes %s', path, includes)
+        parsed = ParsedFile(path, stamp, tokens, includes)
+        self.files[path] = parsed
+        return parsed
+
+    def _includes(self, path, tokens):
+        """
+        Resolve the #INCLUDE directives of a file
+
+        Parameters
+            (str) path: absolute path of the file
+            (iterable of KppToken) tokens: tokens of the file
+
+        Returns
+            (tuple of str): absolute paths of the found files
+        """
+        includes = list()
+        for token in tokens:
+            if token.kind == SECTION and token.value.name == '#INCLUDE':
+                included = self.resolve(token.value.argument,
+                    os.path.dirname(path))
+                if included is None:
+                    logger.warning('%s:%d: #INCLUDE %s not found',
+                        path, token.line, token.value.argument)
+                else:
+                    includes.append(included)
+        return tuple(includes)
+
+    def graph(self, roots):
+        """
+        Include graph of the files reachable from root files
+
+        Parameters
+            (list of str) roots: KPP config files
+
+        Returns
+            (dict): absolute path -> tuple of included absolute paths
+        """
+        graph = dict()
+        pending = [os.path.abspath(root) for root in roots]
+        while pending:
+            path = pending.pop()
+            if path not in graph:
+                graph[path] = self.parse(path).includes
+                pending.extend(graph[path])
+        return graph
+
+    def dependencies(self, roots, seen=None):
+        """
+        Files reachable from root files, included files first,
+        each file once
+
+        Parameters
+            (list of str) roots: KPP config files
+            (set) seen: absolute paths already read, skipped and updated
+
+        Returns
+            (list of str): absolute paths in read order
+
+        Raises
+            ValueError: if files include each other
+        """
+        seen = seen if seen is not None else set()
+        order = list()
+
+        def visit(path, stack):
+            if path in stack:
+                raise ValueError('#INCLUDE cycle: %s'
+                    % ' -> '.join(stack + (path,)))
+            if path in seen:
+                return
+            for included in self.parse(path).includes:
+                visit(included, stack + (path,))
+            seen.add(path)
+            order.append(path)
+
+        for root in roots:
+            visit(os.path.abspath(root), tuple())
+
+        return order
+
+    def roots(self, files):
+        """
+        Files not included by another of the files
+
+        Parameters
+            (list of str) files: KPP config files, e.g. from kpp_config_files
+
+        Returns
+            (list of str): files, in order, without the included ones
+        """
+        included = set()
+        for filename in files:
+            included.update(self.dependencies([filename])[:-1])
+        return [filename for filename in files
+            if os.path.abspath(filename) not in included]
+
+    def iter_tokens(self, roots, seen=None):
+        """
+        Tokens of the files reachable from root files,
+        in the order of dependencies
+
+        Parameters
+            (list of str) roots: KPP config files
+            (set) seen: see dependencies
+
+        Yields
+            (KppToken): tokens of each file, cached,
+                or read from the file if it is too large to cache
+        """
+        for path in self.dependencies(roots, seen):
+            tokens = self.files[path].tokens
+            if tokens is None:
+                with open(path, 'r') as f:
+                    yield from tokenize(f)
+            else:
+                yield from tokens
+
+
+shared_include_cache = IncludeCache()
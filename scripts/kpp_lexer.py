@@ -0,0 +1,228 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    kpp_lexer.py
+
+Description:
+    kpp_lexer.py tokenizes KPP config files in a single pass.
+    Lines are consumed one at a time (a list or an open file),
+    so the input is never joined or re-split, and typed tokens
+    are yielded with the line number on which they start.
+
+    Token kinds
+        SECTION    #DEFVAR, #EQUATIONS, #INCLUDE file, ...
+        SPECIES    species definition in #DEFVAR, #DEFFIX or #DEFRAD
+        EQUATION   equation in #EQUATIONS
+        LABEL      equation label <R1> or {001:J01}
+        COMMENT    { ... } or // ... comment
+        INLINE     #INLINE ... #ENDINLINE code block
+        STATEMENT  any other ; terminated statement (#ATOMS, #CHECK, ...)
+"""
+
+import re
+from collections import namedtuple
+
+SECTION = 'SECTION'
+SPECIES = 'SPECIES'
+EQUATION = 'EQUATION'
+LABEL = 'LABEL'
+COMMENT = 'COMMENT'
+INLINE = 'INLINE'
+STATEMENT = 'STATEMENT'
+
+# (str) kind, value, (str) section, (int) line
+KppToken = namedtuple('KppToken', ['kind', 'value', 'section', 'line'])
+
+# value of SECTION tokens, argument is '' unless the directive takes one
+SectionDef = namedtuple('SectionDef', ['name', 'argument'])
+
+# value of SPECIES tokens, e.g. ('O3', 'O + O + O')
+SpeciesDef = namedtuple('SpeciesDef', ['name', 'composition'])
+
+# value of EQUATION tokens, e.g. (['O3', 'hv'], ['O', 'O2'], '(6.120E-04) * SUN')
+EquationDef = namedtuple('EquationDef', ['reactants', 'products', 'rate'])
+
+# value of INLINE tokens, e.g. ('F90_INIT', 'TSTART = (12*3600)\n...')
+InlineDef = namedtuple('InlineDef', ['type', 'code'])
+
+SPECIES_SECTIONS = ('#DEFVAR', '#DEFFIX', '#DEFRAD')
+
+EQUATION_SECTIONS = ('#EQUATIONS',)
+
+# directives whose argument is the remainder of the line
+LINE_ARGUMENT_SECTIONS = ('#INCLUDE', '#MODEL', '#INTEGRATOR', '#LANGUAGE',
+    '#DRIVER', '#DOUBLE', '#REORDER', '#JACOBIAN', '#HESSIAN', '#STOICMAT',
+    '#MEX', '#DUMMYINDEX', '#EQNTAGS', '#FUNCTION', '#STOCHASTIC',
+    '#INTFILE', '#UPPERCASEF90', '#MINVERSION', '#AUTOREDUCE')
+
+_TOKEN_RE = re.compile(r"""
+      (?P<comment>\{[^}]*\}?)           # { comment }, may continue on next line
+    | (?P<line_comment>//.*)            # // comment to end of line
+    | (?P<section>\#[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<label><[^<>]*>)               # <label>
+    | (?P<end>;)
+    | (?P<text>(?:[^{};#<>/]|/(?!/))+)
+    | (?P<other>.)
+    """, re.VERBOSE | re.DOTALL)
+
+_ARGUMENT_RE = re.compile(r'[^{;\n]*?(?=\s*(?:\{|//|;|$))')
+
+
+def _statement_token(text, section, line):
+    """
+    Classify a ; terminated statement by the section it appears in
+
+    Parameters
+        (str) text: statement text without comments or terminator
+        (str) section: enclosing section name
+        (int) line: line number of the start of the statement
+
+    Returns
+        (KppToken): SPECIES, EQUATION or STATEMENT token
+    """
+
+    if section in SPECIES_SECTIONS:
+        name, _, composition = text.partition('=')
+        return KppToken(SPECIES,
+            SpeciesDef(name.strip(), composition.strip()), section, line)
+
+    if section in EQUATION_SECTIONS:
+        lhs, equal, rhs = text.partition('=')
+        products, colon, rate = rhs.partition(':')
+        if not (equal and colon):
+            raise ValueError('line %d: malformed KPP equation %r'
+                % (line, text.strip()))
+        reactants = [term.strip() for term in lhs.split('+') if term.strip()]
+        products = [term.strip() for term in products.split('+') if term.strip()]
+        return KppToken(EQUATION,
+            EquationDef(reactants, products, rate.strip()), section, line)
+
+    return KppToken(STATEMENT, text.strip(), section, line)
+
+
+def tokenize(lines):
+    """
+    Tokenize KPP config lines in a single pass
+
+    Parameters
+        (iterable of str) lines: KPP config lines, e.g. an open file
+
+    Yields
+        (KppToken): typed tokens in input order
+    """
+
+    section = None
+    statement = list()      # text fragments of the pending statement
+    statement_line = 0
+    label = None            # { } comment that may label the next equation
+    comment = None          # fragments of an unterminated { } comment
+    comment_line = 0
+    inline = None           # lines of an open #INLINE block
+    inline_type = None
+    inline_line = 0
+    line_number = 0
+
+    for line_number, line in enumerate(lines, start=1):
+
+        if inline is not None:
+            end = line.find('#ENDINLINE')
+            if end < 0:
+                inline.append(line)
+                continue
+            inline.append(line[:end])
+            yield KppToken(INLINE, InlineDef(inline_type, ''.join(inline)),
+                section, inline_line)
+            inline = None
+            line = line[end + len('#ENDINLINE'):]
+
+        pos = 0
+        if comment is not None:
+            end = line.find('}')
+            if end < 0:
+                comment.append(line)
+                continue
+            comment.append(line[:end])
+            yield KppToken(COMMENT, ''.join(comment).strip(),
+                section, comment_line)
+            comment = None
+            pos = end + 1
+
+        length = len(line)
+        while pos < length:
+            match = _TOKEN_RE.match(line, pos)
+            kind = match.lastgroup
+            value = match.group()
+            pos = match.end()
+
+            if kind == 'text' or kind == 'other':
+                if value.strip():
+                    if label is not None:
+                        yield KppToken(LABEL, label, section, line_number)
+                        label = None
+                    if not statement:
+                        statement_line = line_number
+                    statement.append(value)
+                elif statement:
+                    statement.append(value)
+                continue
+
+            if label is not None:
+                yield KppToken(COMMENT, label, section, line_number)
+                label = None
+
+            if kind == 'comment':
+                if not value.endswith('}'):
+                    comment = [value[1:]]
+                    comment_line = line_number
+                elif section in EQUATION_SECTIONS and not statement:
+                    label = value[1:-1].strip()
+                else:
+                    yield KppToken(COMMENT, value[1:-1].strip(),
+                        section, line_number)
+            elif kind == 'line_comment':
+                yield KppToken(COMMENT, value[2:].strip(),
+                    section, line_number)
+            elif kind == 'label':
+                yield KppToken(LABEL, value[1:-1].strip(),
+                    section, line_number)
+            elif kind == 'end':
+                if statement:
+                    yield _statement_token(''.join(statement),
+                        section, statement_line)
+                    statement = list()
+            elif kind == 'section':
+                if statement:
+                    yield _statement_token(''.join(statement),
+                        section, statement_line)
+                    statement = list()
+                name = value.upper()
+                if name == '#INLINE':
+                    inline_type = line[pos:].split('{')[0].strip()
+                    inline = list()
+                    inline_line = line_number
+                    break
+                argument = ''
+                if name in LINE_ARGUMENT_SECTIONS:
+                    match = _ARGUMENT_RE.match(line, pos)
+                    argument = match.group().strip()
+                    pos = match.end()
+                else:
+                    section = name
+                yield KppToken(SECTION, SectionDef(name, argument),
+                    section, line_number)
+
+        if label is not None:
+            yield KppToken(COMMENT, label, section, line_number)
+            label = None
+
+    if comment is not None:
+        yield KppToken(COMMENT, ''.join(comment).strip(),
+            section, comment_line)
+    if inline is not None:
+        yield KppToken(INLINE, InlineDef(inline_type, ''.join(inline)),
+            section, inline_line)
+    if statement and ''.join(statement).strip():
+        yield _statement_token(''.join(statement), section, statement_line)
@@ -0,0 +1,122 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    kpp_metrics.py
+
+Description:
+    kpp_metrics.py collects stage timings and counters of a KPP to MICM
+    translation: the wall time of each pipeline stage
+    (read, split, species, equations, write),
+    the equations translated per detected KPP rate type,
+    including those falling back to the default Arrhenius branch,
+    and the bytes read and written.
+    The report is a JSON document, written by kpp_to_micm.py --metrics
+    and included per mechanism in the batch_kpp_to_micm.py --report.
+
+    Translator functions take an optional metrics argument,
+    None by default, in which case nothing is collected
+    and the only cost is the test for None.
+"""
+
+import os
+import json
+import time
+import contextlib
+
+
+class TranslationMetrics:
+    """
+    Stage timings and counters of one translation
+    """
+
+    def __init__(self):
+        self.stages = dict()
+        self.counters = dict()
+        self.rate_types = dict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Time a pipeline stage, accumulated over repeated entries
+
+        Parameters
+            (str) name: stage name
+        """
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) \
+                + time.perf_counter() - start
+
+    def count(self, name, n=1):
+        """
+        Increment a counter
+
+        Parameters
+            (str) name: counter name
+            (int) n: increment
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def count_rate_type(self, rate_type):
+        """
+        Count an equation by its detected KPP rate type
+
+        Parameters
+            (str) rate_type: e.g. 'ARR', 'TROE', 'default_arrhenius'
+        """
+        self.rate_types[rate_type] = self.rate_types.get(rate_type, 0) + 1
+
+    def count_bytes(self, name, filenames):
+        """
+        Add the size of files to a byte counter
+
+        Parameters
+            (str) name: counter name, e.g. 'bytes_read'
+            (list of str) filenames: files
+        """
+        self.count(name, sum(os.path.getsize(filename)
+            for filename in filenames))
+
+    def report(self):
+        """
+        Metrics as a JSON document
+
+        Returns
+            (dict): 'stages' [s], their 'total' [s], 'counters', 'rate_types'
+        """
+        return {'stages': dict(self.stages),
+            'total': sum(self.stages.values()),
+            'counters': dict(self.counters),
+            'rate_types': dict(self.rate_types)}
+
+    def write(self, json_file):
+        """
+        Write the metrics report
+
+        Parameters
+            (str) json_file: output JSON file
+        """
+        with open(json_file, 'w') as f:
+            json.dump(self.report(), f, indent=4)
+
+
+def timed(metrics, name):
+    """
+    Context timing a stage if metrics are collected
+
+    Parameters
+        (TranslationMetrics) metrics: metrics, or None
+        (str) name: stage name
+
+    Returns
+        (context manager): metrics.stage(name), or a no-op context
+    """
+
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.stage(name)
@@ -10,6 +10,15 @@ File:
 Usage:
     python kpp_to_micm.py
     python kpp_to_micm.py --help
+    python kpp_to_micm.py --stream
+    python kpp_to_micm.py --compact
+    python kpp_to_micm.py --cache_dir ~/.cache/micm-kpp
+    python kpp_to_micm.py --reorder
+    python kpp_to_micm.py --reduce --targets O3 NO2
+    python kpp_to_micm.py --metrics metrics.json --profile translate.prof
+    python kpp_to_micm.py --stoichiometry
+    python kpp_to_micm.py --partition
+    python kpp_to_micm.py --check
 
 Description:
     kpp_to_micm.py translates KPP config files to MICM JSON config files
@@ -18,14 +27,50 @@ Description:
     --kpp_dir and --kpp_name arguments.
 
     In the initial implementation,
-    the KPP sections #ATOMS (not yet used), #DEFFIX,
-    #DEFVAR, and #EQUATIONS are read and parsed.
+    the KPP sections #ATOMS, #DEFFIX,
+    #DEFVAR, #EQUATIONS and #CHECK / #CHECKALL are read and parsed;
+    species compositions, in the atoms of #ATOMS, and #CHECK
+    are used by the mass-balance check (--check, see atoms.py).
     Equations with the hv reactant are MICM PHOTOLYSIS reactions,
     equations with a single coefficient are assumed to be ARRHENIUS reactions.
+    KPP rate functions are dispatched by name (see rxn_registry.py),
+    and other inline rate expressions are matched exactly to MICM reactions
+    or fitted to an ARRHENIUS reaction (see rate_expression.py);
+    rates that cannot be translated are logged and written with A = 0.
+    Config files are tokenized in a single pass by kpp_lexer.tokenize,
+    so { } and // comments are dropped wherever they appear.
+    #INCLUDE directives are followed (see kpp_include.py):
+    a config file included by another, e.g. small_strato.spc
+    by small_strato.def, is read once through its #INCLUDE,
+    and included files shared by several mechanisms, e.g. atoms.kpp,
+    are tokenized once per process.
+    species.json and reactions.json are serialized once, streamed to disk,
+    indented by 4 or, with --compact, on a single line.
+    To translate in memory without writing files, use kpp_translate.translate.
+    With --stream, lines flow from the config files through the lexer
+    and translation into an incremental reactions.json writer,
+    so peak memory does not grow with the number of equations.
+    With --cache_dir, unchanged mechanisms are skipped
+    and unchanged equations are reused (see kpp_cache.py).
+    With --reorder, #DEFVAR species are written to species.json
+    in the fill-reducing Markowitz order of the Jacobian (see sparsity.py),
+    as KPP reorders species, and the Jacobian and LU nonzeros are reported.
+    With --reduce, reactions that cannot affect the --targets species
+    and species in no reaction are removed, and duplicate ARRHENIUS
+    reactions are merged (see reduction.py).
+    With --stoichiometry, the reactant, product and net stoichiometric
+    matrices are written next to the JSON as .npz (see stoichiometry.py).
+    With --partition, the block lower triangular partition of the species
+    is written next to the JSON as partition.json (see partition.py).
+    With --check, the atom balance of every reaction is checked,
+    unbalanced reactions are logged, and the composition matrix and
+    conservation laws are written next to the JSON as .npz (see atoms.py).
+    With --metrics, stage timings, equations per rate type
+    and bytes read and written are written to a JSON file
+    (see kpp_metrics.py), and with --profile, a cProfile dump.
 
 TODO:
-    (1) Add pytest unit test for method micm_equation_json.
-    (2+) Add support for several other reaction types ...
+    (1+) Add support for several other reaction types ...
 """
 
 import os
@@ -33,43 +78,128 @@ import sys
 import argparse
 import logging
 import json
+import cProfile
 from glob import glob
 
-from parse_kpp_utils import is_float, parse_term
-from rxn_arrhenius import parse_kpp_arrhenius
-from rxn_troe import parse_kpp_troe
-from rxn_special import parse_kpp_k45, parse_kpp_k57
+from parse_kpp_utils import is_float, parse_term, parse_composition
+from kpp_lexer import tokenize, SECTION, SPECIES, EQUATION, LABEL, STATEMENT
+from kpp_cache import TranslationCache, EquationMemo, digest_files, file_stamps
+from kpp_include import shared_include_cache
+from rxn_registry import parse_rate_expression
+from rate_expression import micm_rate_expression
+from sparsity import ordering_report
+from kpp_metrics import TranslationMetrics, timed
 
-__version__ = 'v1.05'
+__version__ = 'v1.09'
 
+logger = logging.getLogger(__name__)
 
-def read_kpp_config(kpp_dir, kpp_name):
+
+SUFFIXES = ['.kpp', '.spc', '.eqn', '.def']
+
+
+def kpp_config_files(kpp_dir, kpp_name):
     """
-    Read all KPP config files in a directory
+    List KPP config files in a directory; files included by another
+    are dropped when the files are read (IncludeCache.roots)
 
     Parameters
         (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
 
     Returns
-        (list of str): all lines from all config files
+        (list of str): config file paths, in suffix order
+    """
+
+    files = list()
+
+    for suffix in SUFFIXES:
+        suffix_files = glob(os.path.join(kpp_dir, kpp_name + '*' + suffix))
+        logger.debug(suffix_files)
+        files.extend(suffix_files)
+
+    return files
+
+
+def kpp_dependency_files(kpp_dir, kpp_name, include_cache=None):
     """
+    List KPP config files in a directory and the files they include
+
+    Parameters
+        (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
+        (IncludeCache) include_cache: default shared_include_cache
 
-    suffixes = ['.kpp', '.spc', '.eqn', '.def']
+    Returns
+        (list of str): absolute paths, included files first
+    """
+
+    if include_cache is None:
+        include_cache = shared_include_cache
+
+    return include_cache.dependencies(
+        include_cache.roots(kpp_config_files(kpp_dir, kpp_name)))
+
+
+def iter_kpp_config(kpp_dir, kpp_name):
+    """
+    Iterate over all KPP config lines in a directory,
+    included files first, reading one line at a time
+
+    Parameters
+        (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
+
+    Yields
+        (str): lines from all config files
+    """
+
+    for filename in kpp_dependency_files(kpp_dir, kpp_name):
+        with open(filename, 'r') as f:
+            for line in f:
+                yield line
+
+
+def iter_kpp_config_tokens(kpp_dir, kpp_name, include_cache=None):
+    """
+    Iterate over the tokens of all KPP config files in a directory,
+    included files first, each file tokenized once per include cache
+
+    Parameters
+        (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
+        (IncludeCache) include_cache: default shared_include_cache
+
+    Yields
+        (KppToken): tokens from all config files
+    """
+
+    if include_cache is None:
+        include_cache = shared_include_cache
+
+    yield from include_cache.iter_tokens(
+        include_cache.roots(kpp_config_files(kpp_dir, kpp_name)))
+
+
+def read_kpp_config(kpp_dir, kpp_name):
+    """
+    Read all KPP config files in a directory
 
-    lines = list()
+    Parameters
+        (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
 
-    for suffix in suffixes:
-        files = glob(os.path.join(kpp_dir, kpp_name + '*' + suffix))
-        logging.debug(files)
-        for filename in files:
-            with open(filename, 'r') as f:
-                lines.extend(f.readlines())
+    Returns
+        (list of str): all lines from all config files
+    """
 
     # remove empty lines and tabs
-    lines = [line.replace('\t', '') for line in lines if line.strip()] 
+    lines = [line.replace('\t', '')
+        for line in iter_kpp_config(kpp_dir, kpp_name) if line.strip()]
 
-    for line in lines:
-        logging.debug(line.strip())
+    if logger.isEnabledFor(logging.DEBUG):
+        for line in lines:
+            logger.debug(line.strip())
 
     return lines
 
@@ -79,34 +209,50 @@ def split_by_section(lines):
     Split KPP config lines by section
 
     Parameters
-        (list of str) lines: all lines config files
+        (iterable of str) lines: all lines config files
+
+    Returns
+        (dict of list of KppToken): tokens in each section
+    """
+
+    return split_tokens_by_section(tokenize(lines))
+
+
+def split_tokens_by_section(tokens):
+    """
+    Split KPP config tokens by section
+
+    Parameters
+        (iterable of KppToken) tokens: e.g. from iter_kpp_config_tokens
 
     Returns
-        (dict of list of str): lines in each section
+        (dict of list of KppToken): tokens in each section
     """
 
     sections = {'#ATOMS': [],
                 '#DEFVAR': [],
                 '#DEFFIX': [],
-                '#EQUATIONS': []}
+                '#EQUATIONS': [],
+                '#CHECK': [],
+                '#CHECKALL': []}
 
-    joined_lines = ''.join(lines)
-    section_blocks = joined_lines.split('#')
+    kinds = (SPECIES, EQUATION, LABEL, STATEMENT)
 
-    for section in sections:
-        for section_block in section_blocks:
-            if section.replace('#', '') in section_block:
-                sections[section].extend(section_block.split('\n')[1:-1])
+    for token in tokens:
+        if token.kind in kinds and token.section in sections:
+            sections[token.section].append(token)
+        elif token.kind == SECTION and token.value.name == '#CHECKALL':
+            sections['#CHECKALL'].append(token)
 
     return sections
 
 
-def micm_species_json(lines, fixed=False, tolerance=1.0e-12):
+def micm_species_json(tokens, fixed=False, tolerance=1.0e-12):
     """
     Generate MICM species JSON
 
     Parameters
-        (list of str) lines: lines of species section
+        (iterable of KppToken): tokens of species section
         (bool) fixed: set constant tracer
         (float) tolerance: absolute tolerance
 
@@ -116,11 +262,11 @@ def micm_species_json(lines, fixed=False, tolerance=1.0e-12):
 
     species_json = list() # list of dict
 
-    for line in lines:
-        lhs, rhs = tuple(line.split('='))
-        logging.debug((lhs, rhs))
-        species_dict = {'name': lhs.replace('{', '').replace('}', '').strip().lstrip(),
-            'type': 'CHEM_SPEC'}
+    for token in tokens:
+        if token.kind != SPECIES:
+            continue
+        logger.debug(token.value)
+        species_dict = {'name': token.value.name, 'type': 'CHEM_SPEC'}
         if fixed:
             species_dict['tracer type'] = 'CONSTANT'
         else:
@@ -130,111 +276,447 @@ def micm_species_json(lines, fixed=False, tolerance=1.0e-12):
     return species_json
 
 
-def micm_equation_json(lines):
+def kpp_composition(sections):
     """
-    Generate MICM equation JSON
+    Atom composition of the species and the atoms to check
 
     Parameters
-        (list of str) lines: lines of equation section
+        (dict of list of KppToken) sections: from split_by_section
 
     Returns
-        (list of dict): list of MICM equation entries
+        (dict, list of str): species name -> atom -> count
+            (None if IGNORE or not parsed), atoms of #CHECK,
+            all atoms of the compositions with #CHECKALL,
+            None without either
     """
 
-    equations = list() # list of dict
+    atoms = set(token.value for token in sections['#ATOMS']
+        if token.kind == STATEMENT)
+
+    composition = dict()
+    for token in sections['#DEFFIX'] + sections['#DEFVAR']:
+        if token.kind != SPECIES:
+            continue
+        species_composition = parse_composition(token.value.composition)
+        if species_composition is not None and atoms \
+            and not atoms.issuperset(species_composition):
+            logger.warning('%s: atoms %s not in #ATOMS, composition ignored'
+                % (token.value.name,
+                   ', '.join(sorted(set(species_composition) - atoms))))
+            species_composition = None
+        composition[token.value.name] = species_composition
+
+    checks = None
+    if sections['#CHECKALL']:
+        checks = sorted(set(atom for value in composition.values()
+            if value is not None for atom in value))
+    elif sections['#CHECK']:
+        checks = [atom for token in sections['#CHECK']
+            if token.kind == STATEMENT
+            for atom in token.value.replace(',', ' ').split()]
+
+    return composition, checks
+
+
+def reorder_species_json(species_json, equations_json):
+    """
+    Order MICM species entries to reduce fill-in of the LU decomposition
 
-    for line in lines:
-        logging.debug(line)
+    Parameters
+        (list of dict) species_json: MICM species entries of variable species
+        (list of dict) equations_json: MICM reaction entries
 
-        # split on equal sign into left hand and right hand sides 
-        lhs, rhs = tuple(line.split('='))
+    Returns
+        (list of dict, dict): reordered species entries,
+            nonzero counts from sparsity.ordering_report
+    """
 
-        # extract reaction coefficients
-        rhs, coeffs = tuple(rhs.split(':'))
-        coeffs = coeffs.replace(';', '')
+    names, report = ordering_report(
+        [species['name'] for species in species_json], equations_json)
+    by_name = dict((species['name'], species) for species in species_json)
 
-        # get reactants and products
-        reactants = lhs.split('+')
-        products = rhs.split('+')
+    return [by_name[name] for name in names], report
 
-        # extract equation label delimited by < > or { }
-        if '>' in reactants[0]:
-            label, reactants[0] = tuple(reactants[0].split('>'))
-            label = label.lstrip('<')
+
+def micm_equation(label, equation, metrics=None):
+    """
+    Generate MICM equation JSON for a single KPP equation
+
+    Parameters
+        (str) label: equation label
+        (EquationDef) equation: reactants, products and rate expression
+        (TranslationMetrics) metrics: counts the detected rate type, optional
+
+    Returns
+        (list of dict): one MICM equation entry,
+            or two if the KPP rate is the sum of two MICM reaction types
+    """
+
+    rate_type, equation_dicts = _micm_equation(label, equation)
+    if metrics is not None:
+        metrics.count_rate_type(rate_type)
+
+    return equation_dicts
+
+
+def _micm_equation(label, equation):
+    """
+    Rate type and MICM equation JSON of a single KPP equation,
+    see micm_equation
+    """
+
+    logger.debug(equation)
+
+    coeffs = equation.rate
+    N_reactants = len(equation.reactants)
+
+    equation_dict = dict()
+    equation_second_dict = None
+
+    rate = parse_rate_expression(coeffs, N_reactants=N_reactants)
+    number = coeffs.replace('(', '').replace(')', '').replace(
+        'D', 'E').replace('_dp', '')
+    if rate is not None:
+        # registered KPP rate function (rxn_registry.py)
+        rate_type, reactions = rate
+        equation_dict = reactions[0]
+        if len(reactions) > 1:
+            equation_second_dict = reactions[1]
+    elif is_float(number):
+        # default to Arrhenius with a single coefficient
+        rate_type = 'default_arrhenius'
+        equation_dict['type'] = 'ARRHENIUS'
+        equation_dict['A'] = float(number)
+    else:
+        # inline expression, matched exactly or fitted (rate_expression.py)
+        rate_type, reactions, error = micm_rate_expression(coeffs)
+        if rate_type is None:
+            logger.warning('%s: rate %s not translated (%s), A = 0',
+                label, coeffs.strip(), error)
+            rate_type = 'default_arrhenius_unparsed'
+            equation_dict['type'] = 'ARRHENIUS'
+            equation_dict['A'] = 0.0
         else:
-            label, reactants[0] = tuple(reactants[0].split('}'))
-            label = label.replace('{', '').lstrip()
-        logging.info('label:' + label)
-
-        # remove trailing and leading whitespace
-        reactants = [reactant.strip().lstrip().replace('{', '').replace('}', '') for reactant in reactants]
-        products = [product.strip().lstrip().replace('{', '').replace('}', '') for product in products]
-
-        N_reactants = len(reactants)
-
-        equation_dict = dict()
-        equation_second_dict = None
-
-        if ('SUN' in coeffs) or ('Pj_' in coeffs):
-            equation_dict['type'] = 'PHOTOLYSIS'
-        elif 'ARR' in coeffs:
-            equation_dict = parse_kpp_arrhenius(coeffs,
-                N_reactants=N_reactants)
-        elif 'TROE' in coeffs:
-            equation_dict = parse_kpp_troe(coeffs,
-                N_reactants=N_reactants)
-        elif 'k45' in coeffs:
-            equation_dict, equation_second_dict = parse_kpp_k45(coeffs)
-        elif 'k57' in coeffs:
-            equation_dict, equation_second_dict = parse_kpp_k57(coeffs)
+            if rate_type == 'expression_fit':
+                logger.info('%s: rate %s fitted, max relative error %.2e',
+                    label, coeffs.strip(), error)
+            equation_dict = reactions[0]
+            if len(reactions) > 1:
+                equation_second_dict = reactions[1]
+
+    equation_dict['reactants'] = dict()
+    equation_dict['products'] = dict()
+
+    if equation_second_dict is not None:
+        equation_second_dict['reactants'] = dict()
+        equation_second_dict['products'] = dict()
+
+    # repeated species, e.g. NO + NO, are summed
+    for reactant in equation.reactants:
+        if 'hv' in reactant:
+            pass
         else:
-            # default to Arrhenius with a single coefficient
-            coeffs = coeffs.replace('(', '').replace(')', '').replace(
-                'D', 'E').replace('_dp', '')
-            equation_dict['type'] = 'ARRHENIUS'
-            if is_float(coeffs):
-                equation_dict['A'] = float(coeffs)
-            else:
-                equation_dict['A'] = 0.0
-
-        equation_dict['reactants'] = dict()
-        equation_dict['products'] = dict()
+            x, M = parse_term(reactant)
+            x += equation_dict['reactants'].get(M, {'qty': 0.0})['qty']
+            equation_dict['reactants'][M] = {'qty': x}
+            if equation_second_dict is not None:
+                equation_second_dict['reactants'][M] = {'qty': x}
 
+    for product in equation.products:
+        x, M = parse_term(product)
+        x += equation_dict['products'].get(M, {'yield': 0.0})['yield']
+        equation_dict['products'][M] = {'yield': x}
         if equation_second_dict is not None:
-            equation_second_dict['reactants'] = dict()
-            equation_second_dict['products'] = dict()
+            equation_second_dict['products'][M] = {'yield': x}
+
+    if equation_second_dict is not None:
+        equation_dict['MUSICA name'] = label + '_first_term'
+        equation_second_dict['MUSICA name'] = label + '_second_term'
+        return rate_type, [equation_dict, equation_second_dict]
+
+    equation_dict['MUSICA name'] = label
+    return rate_type, [equation_dict]
+
+
+def equation_key(label, equation):
+    """
+    Key identifying a KPP equation and its label
+
+    Parameters
+        (str) label: equation label
+        (EquationDef) equation: reactants, products and rate expression
+
+    Returns
+        (str): key
+    """
+
+    return json.dumps([label, equation.reactants, equation.products,
+        equation.rate])
+
+
+def iter_micm_equations(tokens, memo=None, metrics=None):
+    """
+    Generate MICM equation JSON one equation at a time
+
+    Parameters
+        (iterable of KppToken) tokens: tokens of equation section
+        (dict-like) memo: rate type and MICM entries of translated
+            equations by equation_key, reused and updated if given
+        (TranslationMetrics) metrics: counts equations, reactions
+            and rate types of translated and reused equations, optional
+
+    Yields
+        (dict): MICM equation entry
+    """
 
-        for reactant in reactants:
-            if 'hv' in reactant:
-                pass
+    label = ''
+    for token in tokens:
+        if token.kind == LABEL:
+            label = token.value
+            logger.debug('label: %s', label)
+        elif token.kind == EQUATION:
+            if memo is None:
+                equation_dicts = micm_equation(label, token.value, metrics)
             else:
-                x, M = parse_term(reactant)
-                equation_dict['reactants'][M] = {'qty': x}
-                if equation_second_dict is not None:
-                    equation_second_dict['reactants'][M] = {'qty': x}
-
-        for product in products:
-            x, M = parse_term(product)
-            equation_dict['products'][M] = {'yield': x}
-            if equation_second_dict is not None:
-                equation_second_dict['products'][M] = {'yield': x}
+                key = equation_key(label, token.value)
+                entry = memo.get(key)
+                if entry is None:
+                    rate_type, equation_dicts = _micm_equation(label,
+                        token.value)
+                    memo[key] = {'rate_type': rate_type,
+                        'reactions': equation_dicts}
+                else:
+                    rate_type = entry['rate_type']
+                    equation_dicts = entry['reactions']
+                    if metrics is not None:
+                        metrics.count('equations_reused')
+                if metrics is not None:
+                    metrics.count_rate_type(rate_type)
+            if metrics is not None:
+                metrics.count('equations')
+                metrics.count('reactions', len(equation_dicts))
+            for equation_dict in equation_dicts:
+                yield equation_dict
+            label = ''
+
+
+def micm_equation_json(tokens, metrics=None):
+    """
+    Generate MICM equation JSON
 
-        if equation_second_dict is not None:
-            equation_dict['MUSICA name'] = label + '_first_term'
-            equation_second_dict['MUSICA name'] = label + '_second_term'
-        else:
-            equation_dict['MUSICA name'] = label
+    Parameters
+        (iterable of KppToken) tokens: tokens of equation section
+        (TranslationMetrics) metrics: see iter_micm_equations, optional
 
-        equations.append(equation_dict)
+    Returns
+        (list of dict): list of MICM equation entries
+    """
 
-        if equation_second_dict is not None:
-            equations.append(equation_second_dict)
+    return list(iter_micm_equations(tokens, metrics=metrics))
+
+
+def write_micm_reactions_json(f, mechanism, equations, indent=4):
+    """
+    Write MICM reactions JSON incrementally,
+    holding only one equation in memory at a time;
+    the output is identical to json.dump of the assembled document
+
+    Parameters
+        (file) f: writable text stream
+        (str) mechanism: mechanism name
+        (iterable of dict) equations: MICM equation entries
+        (int) indent: JSON indent, None for compact output
+
+    Returns
+        (int): number of equations written
+    """
+
+    header = json.dumps({'camp-data':
+        [{'name': mechanism, 'type': 'MECHANISM', 'reactions': []}]},
+        indent=indent)
+    # split the document around the empty reactions list
+    head, tail = header.rsplit('[]', 1)
+
+    if indent is None:
+        separator, newline = ', ', ''
+    else:
+        separator = ','
+        newline = '\n' + ' ' * (4 * indent)
+
+    n_equations = 0
+    f.write(head)
+    for equation_dict in equations:
+        f.write('[' if n_equations == 0 else separator)
+        f.write(newline)
+        f.write(json.dumps(equation_dict, indent=indent).replace('\n', newline))
+        n_equations += 1
+    if n_equations == 0:
+        f.write('[]')
+    else:
+        f.write(newline[:len(newline) - (indent or 0)])
+        f.write(']')
+    f.write(tail)
+
+    return n_equations
+
+
+def stream_kpp_to_micm(lines, micm_mechanism_dir, mechanism, indent=4,
+    memo=None, metrics=None):
+    """
+    Translate KPP config lines to MICM species.json and reactions.json
+    in a single streaming pass, see stream_tokens_to_micm
+
+    Parameters
+        (iterable of str) lines: KPP config lines, e.g. from iter_kpp_config
+        (str) micm_mechanism_dir, mechanism, indent, memo, metrics:
+            see stream_tokens_to_micm
+
+    Returns
+        (tuple of int): number of species, number of equations written
+    """
+
+    return stream_tokens_to_micm(tokenize(lines), micm_mechanism_dir,
+        mechanism, indent=indent, memo=memo, metrics=metrics)
+
+
+def stream_tokens_to_micm(tokens, micm_mechanism_dir, mechanism, indent=4,
+    memo=None, metrics=None):
+    """
+    Translate KPP config tokens to MICM species.json and reactions.json
+    in a single streaming pass; equations are written as they are parsed,
+    only species entries are held in memory
+
+    Parameters
+        (iterable of KppToken) tokens: KPP config tokens,
+            e.g. from iter_kpp_config_tokens
+        (str) micm_mechanism_dir: MICM output directory
+        (str) mechanism: mechanism name
+        (int) indent: JSON indent, None for compact output
+        (dict-like) memo: translated equations, see iter_micm_equations
+        (TranslationMetrics) metrics: times the 'stream' of equations
+            and the 'species', counts equations and bytes written, optional
+
+    Returns
+        (tuple of int): number of species, number of equations written
+    """
+
+    species_tokens = {'#DEFFIX': [], '#DEFVAR': []}
+
+    def equation_tokens():
+        for token in tokens:
+            if token.kind == SPECIES:
+                if token.section in species_tokens:
+                    species_tokens[token.section].append(token)
+            elif token.section == '#EQUATIONS':
+                yield token
+
+    outputs = [os.path.join(micm_mechanism_dir, 'reactions.json'),
+               os.path.join(micm_mechanism_dir, 'species.json')]
+
+    with timed(metrics, 'stream'), open(outputs[0], 'w') as f:
+        n_equations = write_micm_reactions_json(f, mechanism,
+            iter_micm_equations(equation_tokens(), memo=memo, metrics=metrics),
+            indent=indent)
+
+    with timed(metrics, 'species'):
+        species_json = {'camp-data':
+            micm_species_json(species_tokens['#DEFFIX'], fixed=True)
+            + micm_species_json(species_tokens['#DEFVAR'])}
+        with open(outputs[1], 'w') as f:
+            json.dump(species_json, f, indent=indent)
+
+    if metrics is not None:
+        metrics.count('species', len(species_json['camp-data']))
+        metrics.count_bytes('bytes_written', outputs)
+
+    return len(species_json['camp-data']), n_equations
+
+
+def cached_kpp_to_micm(kpp_dir, kpp_name, micm_mechanism_dir, mechanism,
+    cache, indent=4, metrics=None):
+    """
+    Translate KPP config files to MICM JSON unless the inputs,
+    the translator version and the outputs are unchanged since the last run;
+    when the inputs changed, equations are reused from the last run
+    where their text is unchanged; the inputs are the config files
+    and the files they include
+
+    Parameters
+        (str) kpp_dir: KPP directory
+        (str) kpp_name: KPP config name
+        (str) micm_mechanism_dir: MICM output directory
+        (str) mechanism: mechanism name
+        (TranslationCache) cache: translation cache
+        (int) indent: JSON indent, None for compact output
+        (TranslationMetrics) metrics: see stream_kpp_to_micm,
+            also counts bytes read and 'skipped' translations, optional
+
+    Returns
+        (tuple): number of species, number of equations,
+            True if the translation was skipped
+    """
+
+    files = kpp_dependency_files(kpp_dir, kpp_name)
+    if metrics is not None:
+        metrics.count_bytes('bytes_read', files)
+    key = digest_files(files, __version__, mechanism, indent)
+    outputs = [os.path.join(micm_mechanism_dir, 'species.json'),
+               os.path.join(micm_mechanism_dir, 'reactions.json')]
+
+    entry = cache.load(micm_mechanism_dir)
 
-    return equations
+    if entry is not None and entry['key'] == key \
+        and entry['outputs'] == file_stamps(outputs):
+        logger.info('%s unchanged, skipped' % mechanism)
+        if metrics is not None:
+            metrics.count('skipped')
+        return entry['species'], entry['reactions'], True
+
+    previous = None
+    if entry is not None and entry['version'] == __version__:
+        previous = entry['equations']
+    memo = EquationMemo(previous)
+
+    n_species, n_equations = stream_tokens_to_micm(
+        iter_kpp_config_tokens(kpp_dir, kpp_name),
+        micm_mechanism_dir, mechanism, indent=indent, memo=memo,
+        metrics=metrics)
+    logger.info('%s translated, %d equations reused, %d translated'
+        % (mechanism, memo.hits, memo.misses))
+
+    cache.save(micm_mechanism_dir, {'key': key, 'version': __version__,
+        'outputs': file_stamps(outputs),
+        'species': n_species, 'reactions': n_equations,
+        'equations': memo.current})
+
+    return n_species, n_equations, False
+
+
+def make_micm_dir(micm_dir, mechanism):
+    """
+    Create the MICM output directory for a mechanism
+
+    Parameters
+        (str) micm_dir: MICM output directory
+        (str) mechanism: mechanism name
+
+    Returns
+        (str): MICM mechanism directory
+    """
+
+    micm_mechanism_dir = os.path.join(micm_dir, mechanism)
+    if not os.path.exists(micm_dir):
+        os.mkdir(micm_dir)
+    if not os.path.exists(micm_mechanism_dir):
+        os.mkdir(micm_mechanism_dir)
+
+    return micm_mechanism_dir
 
 
 if __name__ == '__main__':
 
+    from kpp_translate import translate, write_mechanism
+
     """
     Parse command line arguments
     """
@@ -258,9 +740,55 @@ if __name__ == '__main__':
         # default='test',
         default='RACM_SOA_VBS',
         help='mechanism name')
+    parser.add_argument('--stream', action='store_true',
+        help='stream equations to reactions.json with bounded memory')
+    parser.add_argument('--compact', action='store_true',
+        help='write JSON without indentation')
+    parser.add_argument('--cache_dir', type=str,
+        default=None,
+        help='translation cache directory, skip unchanged mechanisms')
+    parser.add_argument('--cache_size', type=float,
+        default=256.0,
+        help='translation cache size limit [MB]')
+    parser.add_argument('--reorder', action='store_true',
+        help='write species in fill-reducing Markowitz order')
+    parser.add_argument('--reduce', action='store_true',
+        help='remove unreachable reactions and dead species, '
+            'merge duplicate reactions')
+    parser.add_argument('--targets', type=str, nargs='+',
+        default=None,
+        help='target species of --reduce (default keep all reactions)')
+    parser.add_argument('--stoichiometry', action='store_true',
+        help='write sparse stoichiometric matrices (.npz, requires NumPy)')
+    parser.add_argument('--partition', action='store_true',
+        help='write the block partition of the species (partition.json)')
+    parser.add_argument('--check', action='store_true',
+        help='check the mass balance, write the conservation laws '
+            '(.npz, requires NumPy)')
+    parser.add_argument('--metrics', type=str,
+        default=None,
+        help='JSON file of stage timings and counters')
+    parser.add_argument('--profile', type=str,
+        default=None,
+        help='cProfile output file')
     parser.add_argument('--debug', action='store_true',
         help='set logging level to debug')
     args = parser.parse_args()
+    if args.reorder and (args.stream or args.cache_dir is not None):
+        parser.error('--reorder cannot be combined with --stream or --cache_dir')
+    if args.reduce and (args.stream or args.cache_dir is not None):
+        parser.error('--reduce cannot be combined with --stream or --cache_dir')
+    if args.targets is not None and not args.reduce:
+        parser.error('--targets requires --reduce')
+    if args.stoichiometry and (args.stream or args.cache_dir is not None):
+        parser.error('--stoichiometry cannot be combined with --stream '
+            'or --cache_dir')
+    if args.partition and (args.stream or args.cache_dir is not None):
+        parser.error('--partition cannot be combined with --stream '
+            'or --cache_dir')
+    if args.check and (args.stream or args.cache_dir is not None):
+        parser.error('--check cannot be combined with --stream '
+            'or --cache_dir')
 
     """
     Setup logging
@@ -268,65 +796,104 @@ if __name__ == '__main__':
     logging_level = logging.DEBUG if args.debug else logging.INFO
     logging.basicConfig(stream=args.logfile, level=logging_level)
 
+    indent = None if args.compact else 4
+
     """
-    Read KPP config files
+    Setup instrumentation, collected only if requested
     """
-    lines = read_kpp_config(args.kpp_dir, args.kpp_name)
+    metrics = TranslationMetrics() if args.metrics is not None else None
+    profiler = None
+    if args.profile is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def write_metrics():
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            logging.info('wrote profile %s' % args.profile)
+        if metrics is not None:
+            metrics.write(args.metrics)
+            logging.info('wrote metrics %s' % args.metrics)
 
     """
-    Split KPP config by section
+    Stream KPP config files to MICM JSON without holding all lines in memory
     """
-    sections = split_by_section(lines)
-    for section in sections:
-        logging.info('____ KPP section %s ____' % section)
-        for line in sections[section]:
-            logging.info(line)
-        print('\n')
+    if args.stream:
+        micm_mechanism_dir = make_micm_dir(args.micm_dir, args.mechanism)
+        if metrics is not None:
+            metrics.count_bytes('bytes_read',
+                kpp_dependency_files(args.kpp_dir, args.kpp_name))
+        n_species, n_equations = stream_tokens_to_micm(
+            iter_kpp_config_tokens(args.kpp_dir, args.kpp_name),
+            micm_mechanism_dir, args.mechanism, indent=indent, metrics=metrics)
+        logging.info('wrote %d species and %d reactions to %s'
+            % (n_species, n_equations, micm_mechanism_dir))
+        write_metrics()
+        sys.exit(0)
 
     """
-    Generate MICM species JSON from KPP #DEFFIX section
+    Translate only if KPP config files changed since the last cached run
     """
-    deffix_json = micm_species_json(sections['#DEFFIX'], fixed=True)
+    if args.cache_dir is not None:
+        cache = TranslationCache(args.cache_dir,
+            max_bytes=int(args.cache_size * 1024 * 1024))
+        micm_mechanism_dir = make_micm_dir(args.micm_dir, args.mechanism)
+        cached_kpp_to_micm(args.kpp_dir, args.kpp_name,
+            micm_mechanism_dir, args.mechanism, cache, indent=indent,
+            metrics=metrics)
+        write_metrics()
+        sys.exit(0)
 
     """
-    Generate MICM species JSON from KPP #DEFVAR section
+    Translate KPP config files
     """
-    defvar_json = micm_species_json(sections['#DEFVAR'])
+    files = kpp_config_files(args.kpp_dir, args.kpp_name)
+    mechanism = translate(files, name=args.mechanism, reorder=args.reorder,
+        reduce=args.reduce, targets=args.targets, metrics=metrics)
+    if metrics is not None:
+        metrics.count_bytes('bytes_read',
+            kpp_dependency_files(args.kpp_dir, args.kpp_name))
 
     """
-    Generate MICM equations JSON from KPP #EQUATIONS section
+    Write MICM JSON, each document serialized once and streamed to disk
     """
-    equations_json = micm_equation_json(sections['#EQUATIONS'])
+    micm_mechanism_dir = make_micm_dir(args.micm_dir, args.mechanism)
+    with timed(metrics, 'write'):
+        outputs = write_mechanism(mechanism, micm_mechanism_dir, indent=indent)
+    logging.info('wrote %d species and %d reactions to %s'
+        % (len(mechanism.species), len(mechanism.reactions),
+           micm_mechanism_dir))
 
     """
-    Assemble MICM species JSON
+    Write sparse stoichiometric matrices next to the MICM JSON
     """
-    micm_species_json = {'camp-data': deffix_json + defvar_json}
-    micm_species_json_str = json.dumps(micm_species_json, indent=4)
-    logging.info('____ MICM species ____')
-    logging.info(micm_species_json_str)
-    print('\n')
+    if args.stoichiometry:
+        from stoichiometry import write_stoichiometry
+        with timed(metrics, 'write'):
+            outputs += write_stoichiometry(mechanism, micm_mechanism_dir)
+        logging.info('wrote stoichiometric matrices to %s' % micm_mechanism_dir)
 
     """
-    Assemble MICM reactions JSON
+    Write the block partition of the species next to the MICM JSON
     """
-    micm_reactions_json = {'camp-data':
-        [{'name': args.mechanism, 'type': 'MECHANISM', 'reactions': equations_json}]}
-    micm_reactions_json_str = json.dumps(micm_reactions_json, indent=4)
-    logging.info('____ MICM reactions ____')
-    logging.info(micm_reactions_json_str)
-    print('\n')
+    if args.partition:
+        from partition import write_partition
+        with timed(metrics, 'partition'):
+            outputs.append(write_partition(mechanism, micm_mechanism_dir))
 
     """
-    Write MICM JSON
+    Check the mass balance, write the conservation laws next to the MICM JSON
     """
-    micm_mechanism_dir = os.path.join(args.micm_dir, args.mechanism)
-    if not os.path.exists(args.micm_dir):
-        os.mkdir(args.micm_dir)
-    if not os.path.exists(micm_mechanism_dir):
-        os.mkdir(micm_mechanism_dir)
-    with open(os.path.join(micm_mechanism_dir, 'species.json'), 'w') as f:
-        json.dump(micm_species_json, f, indent=4)
-    with open(os.path.join(micm_mechanism_dir, 'reactions.json'), 'w') as f:
-        json.dump(micm_reactions_json, f, indent=4)
-
+    if args.check:
+        from atoms import write_conservation
+        with timed(metrics, 'check'):
+            files, balance = write_conservation(mechanism, micm_mechanism_dir)
+            outputs += files
+        if metrics is not None:
+            metrics.count('unbalanced', len(balance['unbalanced']))
+
+    if metrics is not None:
+        metrics.count_bytes('bytes_written', outputs)
+
+    write_metrics()
@@ -0,0 +1,254 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    kpp_translate.py
+
+Usage:
+    from kpp_translate import translate, write_mechanism
+    mechanism = translate(['chapman.spc', 'chapman.eqn'], name='Chapman')
+    mechanism = translate(kpp_text)
+    write_mechanism(mechanism, 'micm/Chapman')
+
+Description:
+    kpp_translate.py is the library interface of the KPP to MICM translator.
+    translate reads KPP sources and returns the MICM species
+    and reactions in memory, as a compact mechanism.Mechanism;
+    writing species.json and reactions.json
+    is left to the optional writers dump_mechanism and write_mechanism.
+    Each equation is translated to MICM reaction entries as in kpp_to_micm.py,
+    which are packed into the mechanism and dropped one equation at a time.
+
+    A KPP source is a file path, KPP text (a str with at least one newline)
+    or an open text stream; several sources are read in order,
+    as kpp_to_micm.py reads the config files of a mechanism.
+    #INCLUDE is followed in files (see kpp_include.py),
+    each file being read once and tokenized once per include cache,
+    but not in KPP text or streams, which have no directory.
+
+    Nothing is written to disk and logging is not configured:
+    log records go to the module loggers (kpp_to_micm, rxn_arrhenius, ...),
+    which are silent unless the application configures logging.
+"""
+
+import os
+import io
+import json
+import logging
+
+from kpp_lexer import tokenize
+from kpp_include import shared_include_cache
+from kpp_to_micm import split_tokens_by_section, micm_species_json, \
+    kpp_composition, iter_micm_equations, write_micm_reactions_json
+from kpp_metrics import timed
+from mechanism import Mechanism
+from sparsity import ordering_report
+from reduction import reduce_mechanism
+
+logger = logging.getLogger(__name__)
+
+
+def iter_kpp_sources(kpp_sources):
+    """
+    Iterate over the lines of KPP sources
+
+    Parameters
+        (str, PathLike, file or list of these) kpp_sources:
+            file paths, KPP text containing a newline, or text streams
+
+    Yields
+        (str): lines of all sources, in order
+    """
+
+    if isinstance(kpp_sources, (str, os.PathLike)) \
+        or hasattr(kpp_sources, 'read'):
+        kpp_sources = [kpp_sources]
+
+    for source in kpp_sources:
+        if hasattr(source, 'read'):
+            yield from source
+        elif isinstance(source, str) and '\n' in source:
+            yield from io.StringIO(source)
+        else:
+            with open(source, 'r') as f:
+                yield from f
+
+
+def iter_kpp_tokens(kpp_sources, include_cache=None):
+    """
+    Iterate over the tokens of KPP sources, following #INCLUDE in files
+
+    Parameters
+        (str, PathLike, file or list of these) kpp_sources:
+            see iter_kpp_sources
+        (IncludeCache) include_cache: default shared_include_cache
+
+    Yields
+        (KppToken): tokens of each source, in order, the files
+            included by a file before it, each file once;
+            files included by another source are not read as sources
+    """
+
+    if include_cache is None:
+        include_cache = shared_include_cache
+
+    if isinstance(kpp_sources, (str, os.PathLike)) \
+        or hasattr(kpp_sources, 'read'):
+        kpp_sources = [kpp_sources]
+
+    def is_text(source):
+        return hasattr(source, 'read') \
+            or (isinstance(source, str) and '\n' in source)
+
+    kpp_sources = list(kpp_sources)
+    roots = set(os.path.abspath(source) for source in include_cache.roots(
+        [source for source in kpp_sources if not is_text(source)]))
+
+    seen = set()
+    for source in kpp_sources:
+        if is_text(source):
+            yield from tokenize(iter_kpp_sources(source))
+        elif os.path.abspath(source) in roots:
+            yield from include_cache.iter_tokens([source], seen)
+
+
+def translate(kpp_sources, name='mechanism', reorder=False, reduce=False,
+    targets=None, metrics=None):
+    """
+    Translate KPP sources to MICM species and reactions
+
+    Parameters
+        (str, PathLike, file or list of these) kpp_sources:
+            see iter_kpp_sources
+        (str) name: mechanism name
+        (bool) reorder: order #DEFVAR species to reduce LU fill-in
+            (see sparsity.ordering_report)
+        (bool) reduce: remove unreachable reactions and dead species,
+            and merge duplicate reactions (see reduction.reduce_mechanism)
+        (list of str) targets: target species of the reduction
+        (TranslationMetrics) metrics: stage timings and counters, optional
+
+    Returns
+        (Mechanism): translated mechanism, #DEFFIX species first
+    """
+
+    with timed(metrics, 'read'):
+        tokens = list(iter_kpp_tokens(kpp_sources))
+
+    with timed(metrics, 'split'):
+        sections = split_tokens_by_section(tokens)
+    if logger.isEnabledFor(logging.DEBUG):
+        for section in sections:
+            logger.debug('____ KPP section %s ____', section)
+            for token in sections[section]:
+                logger.debug('%s', token.value)
+
+    mechanism = Mechanism(name)
+
+    with timed(metrics, 'species'):
+        for entry in micm_species_json(sections['#DEFFIX'], fixed=True) \
+            + micm_species_json(sections['#DEFVAR']):
+            mechanism.add_species_json(entry)
+        mechanism.composition, mechanism.checks = kpp_composition(sections)
+
+    with timed(metrics, 'equations'):
+        for entry in iter_micm_equations(sections['#EQUATIONS'],
+            metrics=metrics):
+            mechanism.add_reaction_json(entry)
+
+    if reduce:
+        with timed(metrics, 'reduce'):
+            report = reduce_mechanism(mechanism, targets=targets)
+        if metrics is not None:
+            metrics.count('species_removed', len(report['species_removed']))
+            metrics.count('reactions_removed',
+                len(report['reactions_removed']))
+            metrics.count('reactions_merged', len(report['reactions_merged']))
+
+    if reorder:
+        with timed(metrics, 'reorder'):
+            names, report = ordering_report(
+                mechanism.species_names(constant=False),
+                mechanism.iter_reactions_json())
+            mechanism.reorder_species(
+                mechanism.species_names(constant=True) + names)
+        logger.info('%d species, %d Jacobian nonzeros, '
+            '%d LU nonzeros in KPP order, %d reordered',
+            report['species'], report['jacobian'],
+            report['lu_original'], report['lu_reordered'])
+
+    if metrics is not None:
+        metrics.count('species', len(mechanism.species))
+
+    return mechanism
+
+
+def species_document(mechanism):
+    """
+    MICM species.json document of a mechanism
+
+    Parameters
+        (Mechanism) mechanism: translated mechanism
+
+    Returns
+        (dict): species.json document
+    """
+
+    return {'camp-data': mechanism.species_json()}
+
+
+def reactions_document(mechanism):
+    """
+    MICM reactions.json document of a mechanism
+
+    Parameters
+        (Mechanism) mechanism: translated mechanism
+
+    Returns
+        (dict): reactions.json document
+    """
+
+    return {'camp-data': [{'name': mechanism.name, 'type': 'MECHANISM',
+        'reactions': list(mechanism.iter_reactions_json())}]}
+
+
+def dump_mechanism(mechanism, f_species, f_reactions, indent=4):
+    """
+    Write MICM species.json and reactions.json to text streams,
+    each document serialized once
+
+    Parameters
+        (Mechanism) mechanism: translated mechanism
+        (file) f_species, f_reactions: writable text streams
+        (int) indent: JSON indent, None for compact output
+    """
+
+    json.dump(species_document(mechanism), f_species, indent=indent)
+    write_micm_reactions_json(f_reactions, mechanism.name,
+        mechanism.iter_reactions_json(), indent=indent)
+
+
+def write_mechanism(mechanism, micm_mechanism_dir, indent=4):
+    """
+    Write MICM species.json and reactions.json to a directory
+
+    Parameters
+        (Mechanism) mechanism: translated mechanism
+        (str) micm_mechanism_dir: output directory, created if missing
+        (int) indent: JSON indent, None for compact output
+
+    Returns
+        (list of str): files written
+    """
+
+    os.makedirs(micm_mechanism_dir, exist_ok=True)
+    outputs = [os.path.join(micm_mechanism_dir, 'species.json'),
+               os.path.join(micm_mechanism_dir, 'reactions.json')]
+
+    with open(outputs[0], 'w') as f_species, \
+        open(outputs[1], 'w') as f_reactions:
+        dump_mechanism(mechanism, f_species, f_reactions, indent=indent)
+
+    return outputs
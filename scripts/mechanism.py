@@ -0,0 +1,267 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    mechanism.py
+
+Description:
+    mechanism.py is the compact in-memory representation
+    of a translated MICM mechanism.
+
+    Species names are interned in an index table (Mechanism.names,
+    Mechanism.index) holding every name of the mechanism, declared or not.
+    The declared species are arrays of name indices, tolerances
+    and constant flags, in species.json order.
+    Each reaction is a __slots__ record holding its MICM type, label,
+    rate parameters, and stoichiometry as arrays of name indices
+    with reactant quantities and product yields.
+    Rate parameter names are shared by all reactions with the same names.
+    The atom composition of each species (Mechanism.composition,
+    name -> atom -> count) and the atoms to check for mass balance
+    (Mechanism.checks, from #CHECK or #CHECKALL) are kept
+    from the KPP input; MICM JSON has neither.
+
+    MICM JSON entries are produced only at the serialization boundary,
+    by species_json and reaction_json / iter_reactions_json,
+    in the key order written by kpp_to_micm.py.
+    Entries read by from_json are normalized: a missing reactant 'qty'
+    or product 'yield' is 1, written back as 1.0.
+"""
+
+import math
+from array import array
+
+# MICM reaction keys that are not rate parameters
+_REACTION_KEYS = ('type', 'reactants', 'products', 'MUSICA name')
+
+
+class Reaction:
+    """
+    Compact MICM reaction
+    """
+
+    __slots__ = ('type', 'label', 'parameter_names', 'parameter_values',
+        'reactants', 'reactant_qty', 'products', 'product_yield')
+
+    def __init__(self, type, label, parameter_names, parameter_values,
+        reactants, reactant_qty, products, product_yield):
+        self.type = type
+        self.label = label
+        self.parameter_names = parameter_names
+        self.parameter_values = parameter_values
+        self.reactants = reactants
+        self.reactant_qty = reactant_qty
+        self.products = products
+        self.product_yield = product_yield
+
+    def parameters(self):
+        """
+        Rate parameters
+
+        Returns
+            (dict): parameter name -> value
+        """
+        return dict(zip(self.parameter_names, self.parameter_values))
+
+
+class Mechanism:
+    """
+    Compact MICM mechanism
+    """
+
+    __slots__ = ('name', 'names', 'index', 'species', 'constant',
+        'tolerance', 'reactions', 'composition', 'checks', '_parameter_names')
+
+    def __init__(self, name='mechanism'):
+        self.name = name
+        self.names = list()
+        self.index = dict()
+        self.species = array('i')
+        self.constant = bytearray()
+        self.tolerance = array('d')
+        self.reactions = list()
+        self.composition = dict()
+        self.checks = None
+        self._parameter_names = dict()
+
+    def intern(self, name):
+        """
+        Index of a species name, added to the table if new
+
+        Parameters
+            (str) name: species name
+
+        Returns
+            (int): index in names
+        """
+        n = self.index.get(name)
+        if n is None:
+            n = self.index[name] = len(self.names)
+            self.names.append(name)
+        return n
+
+    def add_species(self, name, constant=False, absolute_tolerance=1.0e-12):
+        """
+        Declare a species
+
+        Parameters
+            (str) name: species name
+            (bool) constant: constant tracer
+            (float) absolute_tolerance: solver tolerance of variable species
+        """
+        self.species.append(self.intern(name))
+        self.constant.append(1 if constant else 0)
+        self.tolerance.append(math.nan if constant else absolute_tolerance)
+
+    def add_species_json(self, entry):
+        """
+        Declare a species from a MICM species entry
+
+        Parameters
+            (dict) entry: e.g. {'name': 'O3', 'type': 'CHEM_SPEC',
+                'absolute tolerance': 1.0e-12}
+        """
+        self.add_species(entry['name'],
+            constant=entry.get('tracer type') == 'CONSTANT',
+            absolute_tolerance=entry.get('absolute tolerance', 1.0e-12))
+
+    def add_reaction_json(self, entry):
+        """
+        Add a reaction from a MICM reaction entry
+
+        Parameters
+            (dict) entry: MICM reaction entry
+
+        Returns
+            (Reaction): compact reaction
+        """
+        names = tuple(key for key in entry if key not in _REACTION_KEYS)
+        names = self._parameter_names.setdefault(names, names)
+        reactants = entry.get('reactants', {})
+        products = entry.get('products', {})
+
+        reaction = Reaction(entry['type'], entry.get('MUSICA name'),
+            names, tuple(entry[key] for key in names),
+            array('i', [self.intern(name) for name in reactants]),
+            array('d', [value.get('qty', 1) for value in reactants.values()]),
+            array('i', [self.intern(name) for name in products]),
+            array('d', [value.get('yield', 1) for value in products.values()]))
+        self.reactions.append(reaction)
+
+        return reaction
+
+    def species_names(self, constant=None):
+        """
+        Names of the declared species
+
+        Parameters
+            (bool) constant: only constant (True) or variable (False) species,
+                default all
+
+        Returns
+            (list of str): names in species.json order
+        """
+        return [self.names[n] for n, flag in zip(self.species, self.constant)
+            if constant is None or bool(flag) == constant]
+
+    def reorder_species(self, names):
+        """
+        Reorder the declared species; name indices are unchanged
+
+        Parameters
+            (list of str) names: all declared species names, in the new order
+        """
+        position = dict((self.names[n], k) for k, n in enumerate(self.species))
+        if sorted(position) != sorted(names):
+            raise ValueError('reordered species differ from declared species')
+        order = [position[name] for name in names]
+        self.species = array('i', [self.species[k] for k in order])
+        self.constant = bytearray(self.constant[k] for k in order)
+        self.tolerance = array('d', [self.tolerance[k] for k in order])
+
+    def remove_species(self, names):
+        """
+        Remove declared species; name indices are unchanged
+
+        Parameters
+            (iterable of str) names: declared species names to remove
+        """
+        removed = set(self.index[name] for name in names
+            if name in self.index)
+        keep = [k for k, n in enumerate(self.species) if n not in removed]
+        self.species = array('i', [self.species[k] for k in keep])
+        self.constant = bytearray(self.constant[k] for k in keep)
+        self.tolerance = array('d', [self.tolerance[k] for k in keep])
+
+    def species_json(self):
+        """
+        MICM species entries
+
+        Returns
+            (list of dict): species.json 'camp-data' entries
+        """
+        entries = list()
+        for n, constant, tolerance in zip(self.species, self.constant,
+            self.tolerance):
+            entry = {'name': self.names[n], 'type': 'CHEM_SPEC'}
+            if constant:
+                entry['tracer type'] = 'CONSTANT'
+            else:
+                entry['absolute tolerance'] = tolerance
+            entries.append(entry)
+        return entries
+
+    def reaction_json(self, reaction):
+        """
+        MICM reaction entry of a reaction
+
+        Parameters
+            (Reaction) reaction: reaction of this mechanism
+
+        Returns
+            (dict): MICM reaction entry
+        """
+        names = self.names
+        entry = {'type': reaction.type}
+        entry.update(zip(reaction.parameter_names, reaction.parameter_values))
+        entry['reactants'] = dict((names[n], {'qty': qty})
+            for n, qty in zip(reaction.reactants, reaction.reactant_qty))
+        entry['products'] = dict((names[n], {'yield': y})
+            for n, y in zip(reaction.products, reaction.product_yield))
+        if reaction.label is not None:
+            entry['MUSICA name'] = reaction.label
+        return entry
+
+    def iter_reactions_json(self):
+        """
+        Generate MICM reaction entries one at a time
+
+        Yields
+            (dict): MICM reaction entry
+        """
+        for reaction in self.reactions:
+            yield self.reaction_json(reaction)
+
+    @classmethod
+    def from_json(cls, species_json, reactions_json):
+        """
+        Build a mechanism from MICM JSON documents
+
+        Parameters
+            (dict) species_json: species.json document
+            (dict) reactions_json: reactions.json document
+
+        Returns
+            (Mechanism): compact mechanism
+        """
+        mechanism_json = [entry for entry in reactions_json['camp-data']
+            if entry.get('type') == 'MECHANISM'][0]
+        mechanism = cls(mechanism_json.get('name', 'mechanism'))
+        for entry in species_json['camp-data']:
+            if entry.get('type') == 'CHEM_SPEC':
+                mechanism.add_species_json(entry)
+        for entry in mechanism_json.get('reactions', []):
+            mechanism.add_reaction_json(entry)
+        return mechanism
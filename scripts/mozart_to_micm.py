@@ -0,0 +1,470 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    mozart_to_micm.py
+
+Usage:
+    python mozart_to_micm.py
+    python mozart_to_micm.py --mozart_name am4 --compact
+    python mozart_to_micm.py --metrics metrics.json
+    python mozart_to_micm.py --help
+
+Description:
+    mozart_to_micm.py translates MOZART preprocessor input to MICM JSON:
+    either a single .inp file (BEGSIM ... ENDSIM) or a pair of .spc and .eqn
+    files, as in am4/mozart, from the directory and name given by
+    --mozart_dir and --mozart_name.
+
+    tokenize_mozart reads the input one line at a time and yields
+    the tokens of the KPP lexer (kpp_lexer.py):
+    SPECIES tokens (SpeciesDef, the composition after ->)
+    in the #DEFVAR (Solution) and #DEFFIX (Fixed) sections,
+    and LABEL and EQUATION tokens (EquationDef, the rate being
+    the comma separated MOZART rate parameters) in the #EQUATIONS section,
+    each token's section recording the MOZART section
+    (Photolysis or Reactions). Lines starting with * are comments,
+    and lines starting with + continue the products of the previous reaction.
+    Each source file is tokenized on its own, so the reactions of an .eqn
+    file are not read as species of the preceding .spc file.
+    Species entries, the compact mechanism.Mechanism and the writers
+    are those of the KPP translator (kpp_translate.py).
+    The atom composition of a species is parsed from its formula
+    after ->, for atoms.py; a species without formula has no composition,
+    as names are not formulas (e.g. INO2, ISOPNBO2), and its reactions
+    are unchecked.
+
+    MOZART rates are translated by the number of parameters:
+
+        [jo2] O2 + hv -> 2*O            PHOTOLYSIS, MUSICA name jo2
+        A                               ARRHENIUS A
+        A, E                            ARRHENIUS A exp(E / T), C = E
+        k0, n, kinf, m [, Fc]           TROE if M is a reactant,
+                                        k0 (300 / T)^n, kinf (300 / T)^m,
+                                        Fc default 0.6, the third body M
+                                        is implicit; otherwise
+                                        TERNARY_CHEMICAL_ACTIVATION,
+                                        the chemical activation channel
+                                        k0 / (1 + k0 [M] / kinf) F
+        [usr_tag] no rate               USER_DEFINED, MUSICA name usr_tag,
+                                        the rate is set by the host model
+
+    M is dropped from TROE reactions, whose rate includes [M];
+    other reactions keep M as a reactant, a constant species.
+
+    Reactions without a rate in the Photolysis section, or with an hv
+    reactant, or tagged j... are photolysis reactions.
+"""
+
+import os
+import re
+import sys
+import argparse
+import logging
+
+from kpp_lexer import KppToken, SpeciesDef, EquationDef, \
+    SPECIES, EQUATION, LABEL
+from kpp_to_micm import micm_species_json, make_micm_dir
+from kpp_translate import iter_kpp_sources, write_mechanism
+from kpp_metrics import TranslationMetrics, timed
+from mechanism import Mechanism
+from parse_kpp_utils import parse_term, parse_formula
+
+logger = logging.getLogger(__name__)
+
+MOZART_SUFFIXES = ['.spc', '.eqn']
+
+# MOZART section headers and the KPP sections of their tokens
+_SPECIES_SECTIONS = {'solution': '#DEFVAR', 'fixed': '#DEFFIX',
+    '#defvar': '#DEFVAR', '#deffix': '#DEFFIX'}
+_EQUATION_SECTIONS = {'photolysis': 'Photolysis', 'reactions': 'Reactions'}
+# blocks whose lines are not species or reactions
+_IGNORED_SECTIONS = ('comments', 'col-int', 'solution classes',
+    'heterogeneous', 'ext forcing')
+
+_LABEL_RE = re.compile(r'^\s*\[([^\]]*)\]')
+
+# default Troe broadening factor
+TROE_FC = 0.6
+
+
+def mozart_config_files(mozart_dir, mozart_name):
+    """
+    List MOZART input files in a directory
+
+    Parameters
+        (str) mozart_dir: MOZART directory
+        (str) mozart_name: input name, name.inp or name.spc and name.eqn
+
+    Returns
+        (list of str): input file paths
+    """
+
+    inp = os.path.join(mozart_dir, mozart_name + '.inp')
+    if os.path.exists(inp):
+        return [inp]
+
+    return [os.path.join(mozart_dir, mozart_name + suffix)
+        for suffix in MOZART_SUFFIXES
+        if os.path.exists(os.path.join(mozart_dir, mozart_name + suffix))]
+
+
+def _terms(side):
+    """
+    KPP terms 'x M' of one side of a MOZART reaction, e.g. '.89*NO2 + O'
+    """
+    return [term.replace('*', ' ').strip() for term in side.split('+')
+        if term.strip()]
+
+
+def _reaction(text, section, n):
+    """
+    LABEL and EQUATION tokens of a MOZART reaction, continuations joined
+    """
+    tokens = list()
+    label = ''
+    match = _LABEL_RE.match(text)
+    if match is not None:
+        # [tag] or [tag->,alias]
+        label = re.split(r'->|,', match.group(1))[0].strip()
+        tokens.append(KppToken(LABEL, label, '#EQUATIONS', n))
+        text = text[match.end():]
+
+    equation, _, rate = text.partition(';')
+    reactants, _, products = equation.partition('->')
+
+    tokens.append(KppToken(EQUATION,
+        EquationDef(_terms(reactants), _terms(products), rate.strip()),
+        section, n))
+
+    return tokens
+
+
+def tokenize_mozart(lines):
+    """
+    Tokenize MOZART preprocessor input, one line at a time
+
+    Parameters
+        (iterable of str) lines: lines of .inp, or .spc and .eqn files
+
+    Yields
+        (KppToken): SPECIES tokens in section '#DEFVAR' or '#DEFFIX',
+            LABEL tokens, and EQUATION tokens in section
+            'Photolysis', 'Reactions' or None (a bare .eqn file)
+    """
+
+    section = None
+    pending = None  # [text, section, line number] of the last reaction
+
+    for n, line in enumerate(lines, 1):
+        stripped = line.strip()
+
+        if pending is not None and stripped.startswith('+'):
+            # products continue before the rate of the previous line
+            equation, semicolon, rate = pending[0].partition(';')
+            pending[0] = equation + ' ' + stripped + semicolon + rate
+            continue
+
+        if pending is not None:
+            yield from _reaction(*pending)
+            pending = None
+
+        if not stripped or stripped.startswith('*'):
+            continue
+
+        header = ' '.join(stripped.lower().split())
+        if header.startswith('end'):
+            section = None
+            continue
+        if header in _SPECIES_SECTIONS or header in _EQUATION_SECTIONS \
+            or header in _IGNORED_SECTIONS:
+            section = header
+            continue
+
+        if section in _SPECIES_SECTIONS:
+            for item in re.split(r'[,;]', stripped):
+                name, _, composition = item.partition('->')
+                if name.strip():
+                    yield KppToken(SPECIES,
+                        SpeciesDef(name.strip(), composition.strip()),
+                        _SPECIES_SECTIONS[section], n)
+        elif section in _IGNORED_SECTIONS:
+            continue
+        elif '->' in stripped:
+            pending = [stripped, _EQUATION_SECTIONS.get(section), n]
+
+    if pending is not None:
+        yield from _reaction(*pending)
+
+
+def tokenize_mozart_sources(mozart_sources):
+    """
+    Tokenize MOZART sources, each file starting outside any section
+
+    Parameters
+        (str, PathLike, file or list of these) mozart_sources:
+            see kpp_translate.iter_kpp_sources
+
+    Yields
+        (KppToken): tokens of all sources, in order (see tokenize_mozart)
+    """
+
+    if isinstance(mozart_sources, (str, os.PathLike)) \
+        or hasattr(mozart_sources, 'read'):
+        mozart_sources = [mozart_sources]
+
+    for source in mozart_sources:
+        yield from tokenize_mozart(iter_kpp_sources(source))
+
+
+def split_mozart_by_section(mozart_sources):
+    """
+    Split MOZART input into species and equation tokens
+
+    Parameters
+        (str, PathLike, file or list of these) mozart_sources:
+            see kpp_translate.iter_kpp_sources
+
+    Returns
+        (dict): '#DEFFIX', '#DEFVAR' and '#EQUATIONS' lists of KppToken,
+            as kpp_to_micm.split_by_section
+    """
+
+    sections = {'#DEFFIX': list(), '#DEFVAR': list(), '#EQUATIONS': list()}
+
+    for token in tokenize_mozart_sources(mozart_sources):
+        if token.kind == SPECIES:
+            sections[token.section].append(token)
+        else:
+            sections['#EQUATIONS'].append(token)
+
+    return sections
+
+
+def _rate_parameters(rate):
+    """
+    MOZART rate parameters, e.g. '8e-12, -2060' -> [8e-12, -2060.0]
+    """
+    return [float(value.strip().replace('D', 'E').replace('d', 'e'))
+        for value in rate.split(',') if value.strip()]
+
+
+def mozart_equation(label, equation, section=None, metrics=None):
+    """
+    Generate MICM equation JSON for a single MOZART reaction
+
+    Parameters
+        (str) label: reaction tag, '' if none
+        (EquationDef) equation: reactants, products and MOZART rate
+        (str) section: 'Photolysis', 'Reactions' or None
+        (TranslationMetrics) metrics: counts the rate type, optional
+
+    Returns
+        (list of dict): one MICM equation entry
+    """
+
+    logger.debug(equation)
+
+    reactants = [parse_term(term) for term in equation.reactants]
+    products = [parse_term(term) for term in equation.products]
+
+    try:
+        parameters = _rate_parameters(equation.rate)
+    except ValueError:
+        logger.warning('%s: MOZART rate %s not translated, USER_DEFINED',
+            label, equation.rate)
+        parameters = None
+
+    equation_dict = dict()
+    third_body = False
+
+    if section == 'Photolysis' or 'hv' in [M for x, M in reactants] \
+        or (parameters == [] and label.startswith('j')):
+        equation_dict['type'] = 'PHOTOLYSIS'
+    elif parameters is not None and len(parameters) in (1, 2):
+        equation_dict['type'] = 'ARRHENIUS'
+        equation_dict['A'] = parameters[0]
+        if len(parameters) == 2:
+            equation_dict['C'] = parameters[1]
+    elif parameters is not None and len(parameters) in (4, 5):
+        # a fall-off with M, or its chemical activation channel without M
+        # (e.g. CO + OH -> CO2 + H), whose rate has no [M] factor
+        third_body = 'M' in [M for x, M in reactants]
+        equation_dict['type'] = 'TROE' if third_body \
+            else 'TERNARY_CHEMICAL_ACTIVATION'
+        equation_dict['k0_A'] = parameters[0]
+        equation_dict['k0_B'] = - parameters[1]
+        equation_dict['k0_C'] = 0.0
+        equation_dict['kinf_A'] = parameters[2]
+        equation_dict['kinf_B'] = - parameters[3]
+        equation_dict['kinf_C'] = 0.0
+        equation_dict['Fc'] = parameters[4] if len(parameters) == 5 \
+            else TROE_FC
+        equation_dict['N'] = 1.0
+    else:
+        if parameters:
+            logger.warning('%s: %d MOZART rate parameters not translated, '
+                'USER_DEFINED', label, len(parameters))
+        elif not label:
+            logger.warning('reaction without rate or tag, USER_DEFINED')
+        equation_dict['type'] = 'USER_DEFINED'
+
+    if metrics is not None:
+        metrics.count_rate_type(equation_dict['type'])
+
+    equation_dict['reactants'] = dict()
+    equation_dict['products'] = dict()
+
+    for x, M in reactants:
+        if M == 'hv' or (third_body and M == 'M'):
+            continue
+        qty = equation_dict['reactants'].get(M, {'qty': 0.0})['qty'] + x
+        equation_dict['reactants'][M] = {'qty': qty}
+
+    for x, M in products:
+        if third_body and M == 'M':
+            continue
+        y = equation_dict['products'].get(M, {'yield': 0.0})['yield'] + x
+        equation_dict['products'][M] = {'yield': y}
+
+    equation_dict['MUSICA name'] = label
+    return [equation_dict]
+
+
+def iter_mozart_equations(tokens, metrics=None):
+    """
+    Generate MICM equation JSON one MOZART reaction at a time
+
+    Parameters
+        (iterable of KppToken) tokens: LABEL and EQUATION tokens
+        (TranslationMetrics) metrics: counts equations and rate types,
+            optional
+
+    Yields
+        (dict): MICM equation entry
+    """
+
+    label = ''
+    for token in tokens:
+        if token.kind == LABEL:
+            label = token.value
+        elif token.kind == EQUATION:
+            equation_dicts = mozart_equation(label, token.value,
+                token.section, metrics)
+            if metrics is not None:
+                metrics.count('equations')
+                metrics.count('reactions', len(equation_dicts))
+            yield from equation_dicts
+            label = ''
+
+
+def translate_mozart(mozart_sources, name='mechanism', metrics=None):
+    """
+    Translate MOZART input to MICM species and reactions,
+    reading and translating one line at a time
+
+    Parameters
+        (str, PathLike, file or list of these) mozart_sources:
+            see kpp_translate.iter_kpp_sources
+        (str) name: mechanism name
+        (TranslationMetrics) metrics: stage timings and counters, optional
+
+    Returns
+        (Mechanism): translated mechanism, fixed species first
+    """
+
+    mechanism = Mechanism(name)
+    species = {'#DEFFIX': list(), '#DEFVAR': list()}
+
+    def equation_tokens():
+        for token in tokenize_mozart_sources(mozart_sources):
+            if token.kind == SPECIES:
+                species[token.section].append(token)
+            else:
+                yield token
+
+    with timed(metrics, 'translate'):
+        for entry in iter_mozart_equations(equation_tokens(), metrics):
+            mechanism.add_reaction_json(entry)
+        for entry in micm_species_json(species['#DEFFIX'], fixed=True) \
+            + micm_species_json(species['#DEFVAR']):
+            mechanism.add_species_json(entry)
+        for token in species['#DEFFIX'] + species['#DEFVAR']:
+            if token.value.composition:
+                mechanism.composition[token.value.name] = parse_formula(
+                    token.value.composition)
+            else:
+                mechanism.composition[token.value.name] = None
+
+    if metrics is not None:
+        metrics.count('species', len(mechanism.species))
+
+    return mechanism
+
+
+if __name__ == '__main__':
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--mozart_dir', type=str,
+        default=os.path.join('..', 'am4', 'mozart'),
+        help='MOZART input directory')
+    parser.add_argument('--mozart_name', type=str,
+        default='AM4_v20180614',
+        help='MOZART input name (name.inp, or name.spc and name.eqn)')
+    parser.add_argument('--micm_dir', type=str,
+        default=os.path.join('..', 'am4', 'micm'),
+        help='MICM output directory')
+    parser.add_argument('--mechanism', type=str,
+        default='AM4',
+        help='mechanism name')
+    parser.add_argument('--compact', action='store_true',
+        help='write JSON without indentation')
+    parser.add_argument('--metrics', type=str,
+        default=None,
+        help='JSON file of stage timings and counters')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    metrics = TranslationMetrics() if args.metrics is not None else None
+
+    """
+    Translate MOZART input
+    """
+    files = mozart_config_files(args.mozart_dir, args.mozart_name)
+    if not files:
+        logging.error('no MOZART input %s in %s'
+            % (args.mozart_name, args.mozart_dir))
+        sys.exit(1)
+    mechanism = translate_mozart(files, name=args.mechanism, metrics=metrics)
+
+    """
+    Write MICM JSON
+    """
+    micm_mechanism_dir = make_micm_dir(args.micm_dir, args.mechanism)
+    with timed(metrics, 'write'):
+        outputs = write_mechanism(mechanism, micm_mechanism_dir,
+            indent=None if args.compact else 4)
+    logging.info('wrote %d species and %d reactions to %s'
+        % (len(mechanism.species), len(mechanism.reactions),
+           micm_mechanism_dir))
+
+    if metrics is not None:
+        metrics.count_bytes('bytes_read', files)
+        metrics.count_bytes('bytes_written', outputs)
+        metrics.write(args.metrics)
+        logging.info('wrote metrics %s' % args.metrics)
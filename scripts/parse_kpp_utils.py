@@ -7,8 +7,11 @@ File:
     parse_kpp_utils.py
 """
 
+import re
 import logging
 
+logger = logging.getLogger(__name__)
+
 
 def is_float(string):
     """
@@ -38,26 +41,85 @@ def parse_coeffs(kpp_str):
         (list of float): [float(x), float(y), float(z), ...]
     """
 
-    logger = logging.getLogger(__name__)
-    logger.debug('kpp_str:' + str(kpp_str))
+    logger.debug('kpp_str: %s', kpp_str)
 
     if (kpp_str.lstrip()[0] == '('):
         coeff_strs = kpp_str.lstrip().rstrip()[1:-1].split('(')[1].split(')')[0].split(',')
     else:
         coeff_strs = kpp_str.split('(')[1].split(')')[0].split(',')
 
-    logger.debug('coeff_strs:' + str(coeff_strs))
+    logger.debug('coeff_strs: %s', coeff_strs)
+
+    coeffs = parse_args(coeff_strs)
+
+    logger.debug(coeffs)
+
+    return coeffs
+
+
+# identifier, optionally opening a call, or a parenthesis or comma;
+# identifiers preceded by a digit or period are exponents or kinds (1.0D-3_dp)
+_RATE_TOKEN_RE = re.compile(r'(?<![\w.])([A-Za-z_]\w*)(\s*\()?|([(),])')
+
+
+def scan_rate_expression(kpp_str):
+    """
+    Scan a KPP rate expression once for identifiers and function calls
+
+    Parameters
+        (str) kpp_str: rate expression, e.g. '.5*ARR2(1.0D-12, 300.0_dp, TEMP)'
+
+    Returns
+        (list of tuple): (name, args) in order of appearance,
+            args the list of argument strings of a function call,
+            None for an identifier that is not called
+    """
+
+    found = list()
+    # open parentheses: [index in found or None, argument start, arguments]
+    stack = list()
+
+    for match in _RATE_TOKEN_RE.finditer(kpp_str):
+        name, call, symbol = match.groups()
+        if name is not None:
+            if call is None:
+                found.append((name, None))
+            else:
+                stack.append([len(found), match.end(), list()])
+                found.append((name, stack[-1][2]))
+        elif symbol == '(':
+            stack.append([None, match.end(), list()])
+        elif stack:
+            position, start, args = stack[-1]
+            if position is not None:
+                args.append(kpp_str[start:match.start()])
+            if symbol == ',':
+                stack[-1][1] = match.end()
+            else:
+                stack.pop()
+
+    return found
+
+
+def parse_args(arg_strs):
+    """
+    Parse numerical arguments of a KPP function call
+
+    Parameters
+        (list of str) arg_strs: e.g. ['1.0D-12', ' - 300.0_dp', 'TEMP']
+
+    Returns
+        (list of float): numerical arguments, others skipped, e.g. [1e-12, -300.0]
+    """
 
     coeffs = list()
 
-    for coeff_str in coeff_strs:
+    for coeff_str in arg_strs:
         coeff_str_reform \
             = coeff_str.replace(' ', '').replace('_dp', '').replace('D', 'E')
         if (is_float(coeff_str_reform)):
             coeffs.append(float(coeff_str_reform))
 
-    logger.debug(coeffs)
-
     return coeffs
 
 
@@ -74,8 +136,7 @@ def parse_term(kpp_str):
         (tuple float, str): float(x), M
     """
 
-    logger = logging.getLogger(__name__)
-    logger.debug('kpp_str:' + str(kpp_str))
+    logger.debug('kpp_str: %s', kpp_str)
 
     short_str = kpp_str.lstrip().rstrip()
 
@@ -90,3 +151,84 @@ def parse_term(kpp_str):
 
     return x, M
 
+
+_FORMULA_RE = re.compile(r'([A-Z][a-z]?)(\d*)|(\()|(\))(\d*)|([-=#\s])')
+
+ELEMENTS = frozenset("""
+    H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co
+    Ni Cu Zn Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb
+    Te I Xe Cs Ba La Ce Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re
+    Os Ir Pt Au Hg Tl Pb Bi Po At Rn Fr Ra Ac Th Pa U Np Pu Am Cm Bk Cf Es
+    Fm Md No Lr""".split())
+
+
+def parse_formula(formula):
+    """
+    Count the atoms of a molecular formula
+
+    Parameters
+        (str) formula: e.g. 'O', 'C5H8', 'HC(O)C(CH3)=CHCOOH',
+            bonds (- = #) ignored
+
+    Returns
+        (dict): element -> count, None if the formula cannot be parsed
+    """
+
+    stack = [dict()]
+    pos = 0
+    while pos < len(formula):
+        match = _FORMULA_RE.match(formula, pos)
+        if match is None:
+            return None
+        pos = match.end()
+        atom, count, opening, closing, group_count, _ = match.groups()
+        if atom is not None and atom not in ELEMENTS:
+            return None
+        if atom is not None:
+            stack[-1][atom] = stack[-1].get(atom, 0) + int(count or 1)
+        elif opening is not None:
+            stack.append(dict())
+        elif closing is not None:
+            if len(stack) == 1:
+                return None
+            group = stack.pop()
+            for atom, n in group.items():
+                stack[-1][atom] = stack[-1].get(atom, 0) \
+                    + n * int(group_count or 1)
+
+    if len(stack) != 1 or not stack[0]:
+        return None
+    return stack[0]
+
+
+def parse_composition(kpp_str):
+    """
+    Parse the atom composition of a KPP species definition
+
+    Parameters
+        (str) kpp_str: 'O + O + O', '2H + 2O', 'N + 2O' or IGNORE;
+            each term a coefficient and an atom or a formula of elements
+
+    Returns
+        (dict): atom -> count, None if IGNORE, empty or not parsed
+    """
+
+    if not kpp_str.strip() or kpp_str.strip().upper() == 'IGNORE':
+        return None
+
+    composition = dict()
+    for term in kpp_str.split('+'):
+        if not term.strip():
+            return None
+        x, formula = parse_term(term)
+        formula = formula.strip()
+        # a declared #ATOMS name, else a formula of elements
+        atoms = {formula: 1} if formula.isidentifier() \
+            and parse_formula(formula) is None else parse_formula(formula)
+        if atoms is None:
+            logger.debug('composition %s not parsed', kpp_str)
+            return None
+        for atom, n in atoms.items():
+            composition[atom] = composition.get(atom, 0) + x * n
+
+    return composition
@@ -0,0 +1,270 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    partition.py
+
+Usage:
+    python partition.py --micm_dir ../configs/micm --mechanism Chapman
+    python kpp_to_micm.py --partition
+    python partition.py --help
+
+Description:
+    partition.py analyses the structure of a MICM mechanism
+    and partitions its variable species into blocks
+    that a solver can integrate one after the other.
+
+    The species-reaction graph is bipartite: an edge from each reactant
+    to its reaction, whose rate it sets, and from each reaction
+    to every species whose net stoichiometry it changes.
+    Species i depends on species j if a path j -> reaction -> i exists,
+    the off-diagonal Jacobian nonzeros (see sparsity.py).
+    The strongly connected components of the dependency graph
+    (Tarjan's algorithm, without recursion) are the blocks;
+    in topological order, species influencing a block come in earlier
+    blocks, so the Jacobian is block lower triangular,
+    and each block can be solved given the blocks before it.
+
+    A block of one species has no feedback from later species:
+    it is flagged sequential, solved by a cheap scalar implicit
+    update after the coupled blocks it depends on, as the
+    unidirectional SOA/VBS aging chains of RACM_SOA_VBS.
+    The largest block is the stiff core.
+
+    partition.json, written next to species.json and reactions.json, holds
+    the species in block order, and for each block its 'species',
+    the indices of the 'reactions' changing them, the blocks it
+    'depends_on' and whether it is 'sequential'.
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+import json
+
+from mechanism import Mechanism
+
+logger = logging.getLogger(__name__)
+
+
+def bipartite_graph(species, reactions):
+    """
+    Species-reaction graph of the variable species
+
+    Parameters
+        (list of str) species: variable species names, defines the indices
+        (list of dict) reactions: MICM reaction entries
+
+    Returns
+        (list of list, list of list): reactions of which each species
+            is a reactant, species whose net stoichiometry
+            each reaction changes
+    """
+
+    index = dict((name, n) for n, name in enumerate(species))
+    species_reactions = [list() for _ in species]
+    reaction_species = list()
+
+    for r, reaction in enumerate(reactions):
+        reactants = reaction.get('reactants', {})
+        products = reaction.get('products', {})
+        net = dict()
+        for name, entry in reactants.items():
+            net[name] = net.get(name, 0.0) - entry.get('qty', 1)
+        for name, entry in products.items():
+            net[name] = net.get(name, 0.0) + entry.get('yield', 1)
+        for name in reactants:
+            if name in index:
+                species_reactions[index[name]].append(r)
+        reaction_species.append([index[name] for name, coefficient
+            in net.items() if coefficient != 0.0 and name in index])
+
+    return species_reactions, reaction_species
+
+
+def strongly_connected_components(successors):
+    """
+    Strongly connected components by Tarjan's algorithm, iteratively
+
+    Parameters
+        (list of iterable) successors: successor node indices of each node
+
+    Returns
+        (list of list): components in topological order,
+            a component before those reachable from it,
+            nodes of each component sorted
+    """
+
+    n = len(successors)
+    number = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = list()
+    components = list()
+    counter = 0
+
+    for root in range(n):
+        if number[root] >= 0:
+            continue
+        number[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(successors[root]))]
+        while work:
+            node, edges = work[-1]
+            advanced = False
+            for next_node in edges:
+                if number[next_node] < 0:
+                    number[next_node] = low[next_node] = counter
+                    counter += 1
+                    stack.append(next_node)
+                    on_stack[next_node] = True
+                    work.append((next_node, iter(successors[next_node])))
+                    advanced = True
+                    break
+                if on_stack[next_node]:
+                    low[node] = min(low[node], number[next_node])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == number[node]:
+                component = list()
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(sorted(component))
+
+    # Tarjan emits a component after every component reachable from it
+    components.reverse()
+    return components
+
+
+def partition(species, reactions):
+    """
+    Block lower triangular partition of the variable species
+
+    Parameters
+        (list of str) species: variable species names
+        (list of dict) reactions: MICM reaction entries
+
+    Returns
+        (dict): 'order' species names in block order, 'blocks' list of
+            'species' names, 'reactions' indices, 'depends_on' block indices
+            and 'sequential' flag, 'sequential' species names,
+            'largest' block size
+    """
+
+    species_reactions, reaction_species = bipartite_graph(species, reactions)
+
+    # j -> i if i depends on j
+    successors = [sorted(set(i for r in species_reactions[j]
+        for i in reaction_species[r] if i != j)) for j in range(len(species))]
+
+    components = strongly_connected_components(successors)
+    block_of = dict()
+    for b, component in enumerate(components):
+        for i in component:
+            block_of[i] = b
+
+    reactants_of = [list() for _ in reactions]
+    for j, rs in enumerate(species_reactions):
+        for r in rs:
+            reactants_of[r].append(j)
+
+    blocks = [{'species': [species[i] for i in component],
+        'reactions': set(), 'depends_on': set(),
+        'sequential': len(component) == 1} for component in components]
+
+    for r, changed in enumerate(reaction_species):
+        upstream = set(block_of[j] for j in reactants_of[r])
+        for b in set(block_of[i] for i in changed):
+            blocks[b]['reactions'].add(r)
+            blocks[b]['depends_on'].update(upstream - {b})
+
+    for block in blocks:
+        block['reactions'] = sorted(block['reactions'])
+        block['depends_on'] = sorted(block['depends_on'])
+
+    return {'order': [name for block in blocks for name in block['species']],
+        'blocks': blocks,
+        'sequential': [block['species'][0] for block in blocks
+            if block['sequential']],
+        'largest': max([len(block['species']) for block in blocks] + [0])}
+
+
+def write_partition(mechanism, micm_mechanism_dir):
+    """
+    Write partition.json of a mechanism
+
+    Parameters
+        (Mechanism) mechanism: compact mechanism
+        (str) micm_mechanism_dir: output directory
+
+    Returns
+        (str): file written
+    """
+
+    result = partition(mechanism.species_names(constant=False),
+        list(mechanism.iter_reactions_json()))
+    logger.info('%s: %d species in %d blocks, largest %d, %d sequential',
+        mechanism.name, len(result['order']), len(result['blocks']),
+        result['largest'], len(result['sequential']))
+
+    partition_file = os.path.join(micm_mechanism_dir, 'partition.json')
+    with open(partition_file, 'w') as f:
+        json.dump({'name': mechanism.name, 'order': result['order'],
+            'blocks': result['blocks']}, f, indent=4)
+
+    return partition_file
+
+
+if __name__ == '__main__':
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--micm_dir', type=str,
+        default=os.path.join('..', 'racm_esrl_vcp', 'micm'),
+        help='MICM config directory')
+    parser.add_argument('--mechanism', type=str,
+        default='RACM_SOA_VBS',
+        help='mechanism name')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    micm_mechanism_dir = os.path.join(args.micm_dir, args.mechanism)
+    with open(os.path.join(micm_mechanism_dir, 'species.json')) as f:
+        species_json = json.load(f)
+    with open(os.path.join(micm_mechanism_dir, 'reactions.json')) as f:
+        reactions_json = json.load(f)
+
+    """
+    Write the block partition next to the MICM JSON
+    """
+    mechanism = Mechanism.from_json(species_json, reactions_json)
+    start = time.perf_counter()
+    partition_file = write_partition(mechanism, micm_mechanism_dir)
+    logging.info('wrote %s in %.4f s'
+        % (partition_file, time.perf_counter() - start))
@@ -0,0 +1,449 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+(Software Package Data Exchange)
+
+File:
+    rate_constants.py
+
+Usage:
+    python rate_constants.py
+    python rate_constants.py --help
+
+Description:
+    rate_constants.py evaluates the rate constants of translated
+    MICM reactions (reactions.json) with NumPy.
+
+    compile_rate_parameters packs the parameters of each reaction type
+    into arrays, and evaluate_rate_constants evaluates all reactions
+    for arrays of temperature, pressure and air density
+    with no loop over reactions. The temperature dependence
+    A * exp(C / T) * (T / D)^B of every reaction is computed
+    as a single matrix product [C, B, log A - B log D] @ [1/T, log T, 1]
+    followed by a single exp.
+
+    ARRHENIUS
+    k = A * exp(C / T) * (T / D)^B * (1 + E * P)
+
+    TROE
+    k = k0 [M] / (1 + k0 [M] / kinf) * Fc^(N / (N + log10(k0 [M] / kinf)^2))
+
+    TERNARY_CHEMICAL_ACTIVATION
+    k = k0 / (1 + k0 [M] / kinf) * Fc^(N / (N + log10(k0 [M] / kinf)^2))
+
+    with k0 = k0_A * exp(k0_C / T) * (T / 300)^k0_B
+    and kinf = kinf_A * exp(kinf_C / T) * (T / 300)^kinf_B.
+
+    PHOTOLYSIS rate constants are taken from user supplied photolysis rates.
+
+    RateConstantCache keeps the rate constants of recent environmental
+    states, for box model runs that revisit the same states
+    (ensembles, diurnal cycles): temperature is quantized to
+    temperature_resolution, pressure and air density to a relative
+    resolution, and the rate constants of a quantized state are evaluated
+    once, at that state, so they do not depend on the order of the visits.
+    The least recently used state is evicted beyond max_size states.
+    Photolysis rates are applied on every lookup, not cached.
+
+    Requires NumPy.
+"""
+
+import os
+import sys
+import argparse
+import logging
+import json
+import time
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BOLTZMANN = 1.380649e-23  # J K-1
+
+ARRHENIUS_DEFAULTS = {'A': 1.0, 'B': 0.0, 'C': 0.0, 'D': 300.0, 'E': 0.0}
+
+TROE_DEFAULTS = {'k0_A': 1.0, 'k0_B': 0.0, 'k0_C': 0.0,
+                 'kinf_A': 1.0, 'kinf_B': 0.0, 'kinf_C': 0.0,
+                 'Fc': 0.6, 'N': 1.0}
+
+FALLOFF_TYPES = ('TROE', 'TERNARY_CHEMICAL_ACTIVATION')
+
+
+def mechanism_reactions(reactions_json):
+    """
+    Extract the list of reactions from a MICM reactions document
+
+    Parameters
+        (dict or list) reactions_json: reactions.json document,
+            or a list of MICM reaction entries
+
+    Returns
+        (list of dict): MICM reaction entries
+    """
+
+    if isinstance(reactions_json, list):
+        return reactions_json
+
+    reactions = list()
+    for entry in reactions_json['camp-data']:
+        if entry.get('type') == 'MECHANISM':
+            reactions.extend(entry['reactions'])
+
+    return reactions
+
+
+def arrhenius_exponent_matrix(A, B, C, D):
+    """
+    Pack Arrhenius parameters so that
+    log(A * exp(C / T) * (T / D)^B) = matrix.T @ [1/T, log T, 1]
+
+    Parameters
+        (ndarray) A, B, C, D: Arrhenius parameters, one per reaction
+
+    Returns
+        (ndarray, ndarray): (3, n) exponent matrix, sign of A
+    """
+
+    with np.errstate(divide='ignore'):
+        log_A = np.log(np.abs(A))
+
+    return np.vstack([C, B, log_A - B * np.log(D)]), np.sign(A)
+
+
+def compile_rate_parameters(reactions_json):
+    """
+    Pack the rate parameters of MICM reactions into arrays by reaction type
+
+    Parameters
+        (dict or list) reactions_json: reactions.json document,
+            or a list of MICM reaction entries
+
+    Returns
+        (dict): 'n_reactions', and for each reaction type present
+            a dict of 'index' (position in the reaction list)
+            and packed parameter arrays
+    """
+
+    reactions = mechanism_reactions(reactions_json)
+
+    by_type = dict()
+    for n, reaction in enumerate(reactions):
+        by_type.setdefault(reaction['type'], []).append(n)
+
+    parameters = {'n_reactions': len(reactions)}
+
+    for reaction_type, index in by_type.items():
+        entries = [reactions[n] for n in index]
+        packed = {'index': np.array(index, dtype=np.intp)}
+
+        if reaction_type == 'ARRHENIUS':
+            for key, default in ARRHENIUS_DEFAULTS.items():
+                packed[key] = np.array([entry.get(key, default)
+                    for entry in entries], dtype=np.float64)
+            # activation energy [J] is an alternative to C
+            for n, entry in enumerate(entries):
+                if 'Ea' in entry:
+                    packed['C'][n] = - entry['Ea'] / BOLTZMANN
+            packed['exponent'], packed['sign'] = arrhenius_exponent_matrix(
+                packed['A'], packed['B'], packed['C'], packed['D'])
+        elif reaction_type in FALLOFF_TYPES:
+            for key, default in TROE_DEFAULTS.items():
+                packed[key] = np.array([entry.get(key, default)
+                    for entry in entries], dtype=np.float64)
+            D = np.full(len(entries), 300.0)
+            packed['k0_exponent'], packed['k0_sign'] \
+                = arrhenius_exponent_matrix(packed['k0_A'],
+                    packed['k0_B'], packed['k0_C'], D)
+            packed['kinf_exponent'], packed['kinf_sign'] \
+                = arrhenius_exponent_matrix(packed['kinf_A'],
+                    packed['kinf_B'], packed['kinf_C'], D)
+        elif reaction_type == 'PHOTOLYSIS':
+            packed['names'] = [entry.get('MUSICA name', '')
+                for entry in entries]
+        else:
+            logger.warning('rate constants of %s reactions not evaluated',
+                reaction_type)
+
+        parameters[reaction_type] = packed
+
+    return parameters
+
+
+def temperature_basis(temperature):
+    """
+    Parameters
+        (ndarray) temperature: temperature [K], one per cell
+
+    Returns
+        (ndarray): (3, cells) array of [1/T, log T, 1]
+    """
+
+    temperature = np.asarray(temperature, dtype=np.float64)
+
+    return np.stack([1.0 / temperature, np.log(temperature),
+        np.ones_like(temperature)])
+
+
+def falloff(k0, kinf, air_density, Fc, N, chemical_activation=False):
+    """
+    Troe fall-off expression
+
+    Parameters
+        (ndarray) k0, kinf: (n, cells) low and high pressure limits
+        (ndarray) air_density: (cells,) air number density
+        (ndarray) Fc, N: (n,) broadening parameters
+        (bool) chemical_activation: omit [M] in the numerator
+
+    Returns
+        (ndarray): (n, cells) rate constants
+    """
+
+    Fc = Fc[:, np.newaxis]
+    N = N[:, np.newaxis]
+
+    k0_M = k0 * air_density
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = k0_M / kinf
+        log_ratio = np.log10(ratio)
+        broadening = np.power(Fc, N / (N + log_ratio * log_ratio))
+
+    numerator = k0 if chemical_activation else k0_M
+
+    return numerator / (1.0 + ratio) * broadening
+
+
+def evaluate_rate_constants(parameters, temperature, pressure, air_density,
+    photolysis=None, out=None):
+    """
+    Evaluate the rate constants of all reactions in all cells
+
+    Parameters
+        (dict) parameters: from compile_rate_parameters
+        (ndarray) temperature: temperature [K], one per cell
+        (ndarray) pressure: pressure [Pa], one per cell
+        (ndarray) air_density: air number density, one per cell,
+            in the units assumed by the rate parameters
+        (dict) photolysis: photolysis rate by MUSICA name,
+            scalar or one per cell (default 0)
+        (ndarray) out: (reactions, cells) array to reuse, e.g. block
+            after block; rows of reaction types not in parameters are
+            left unchanged (default a new array, zero there)
+
+    Returns
+        (ndarray): (cells, reactions) rate constants,
+            a transposed view of a (reactions, cells) array
+            so that each reaction is contiguous in memory
+    """
+
+    temperature = np.atleast_1d(np.asarray(temperature, dtype=np.float64))
+    n_cells = temperature.shape[0]
+    pressure = np.broadcast_to(np.asarray(pressure, dtype=np.float64),
+        (n_cells,))
+    air_density = np.broadcast_to(np.asarray(air_density, dtype=np.float64),
+        (n_cells,))
+
+    if out is None:
+        rates = np.zeros((parameters['n_reactions'], n_cells))
+    else:
+        rates = out
+        for reaction_type, packed in parameters.items():
+            if reaction_type not in ('n_reactions', 'ARRHENIUS', 'PHOTOLYSIS') \
+                + FALLOFF_TYPES:
+                rates[packed['index']] = 0.0
+
+    basis = temperature_basis(temperature)
+
+    if 'ARRHENIUS' in parameters:
+        packed = parameters['ARRHENIUS']
+        k = packed['exponent'].T @ basis
+        np.exp(k, out=k)
+        k *= packed['sign'][:, np.newaxis]
+        if np.any(packed['E'] != 0.0):
+            k *= 1.0 + np.outer(packed['E'], pressure)
+        rates[packed['index']] = k
+
+    for reaction_type in FALLOFF_TYPES:
+        if reaction_type not in parameters:
+            continue
+        packed = parameters[reaction_type]
+        k0 = np.exp(packed['k0_exponent'].T @ basis) \
+            * packed['k0_sign'][:, np.newaxis]
+        kinf = np.exp(packed['kinf_exponent'].T @ basis) \
+            * packed['kinf_sign'][:, np.newaxis]
+        rates[packed['index']] = falloff(k0, kinf, air_density,
+            packed['Fc'], packed['N'],
+            chemical_activation=(reaction_type == 'TERNARY_CHEMICAL_ACTIVATION'))
+
+    if 'PHOTOLYSIS' in parameters:
+        packed = parameters['PHOTOLYSIS']
+        photolysis = photolysis if photolysis is not None else dict()
+        for n, name in zip(packed['index'], packed['names']):
+            rates[n] = photolysis.get(name, 0.0)
+
+    return rates.T
+
+
+class RateConstantCache:
+    """
+    Rate constants by quantized environmental state, with LRU eviction
+    """
+
+    def __init__(self, parameters, max_size=1024, temperature_resolution=0.01,
+        relative_resolution=1.0e-5):
+        """
+        Parameters
+            (dict) parameters: from compile_rate_parameters
+            (int) max_size: number of states kept
+            (float) temperature_resolution: temperature quantum [K]
+            (float) relative_resolution: relative quantum of pressure
+                and air density
+        """
+        if max_size < 1:
+            raise ValueError('rate constant cache needs max_size >= 1')
+        self.parameters = parameters
+        self.max_size = max_size
+        self.temperature_resolution = temperature_resolution
+        self.log_resolution = math.log1p(relative_resolution)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _log_bin(self, value):
+        # non-positive values are kept as they are, tagged so that
+        # they never equal the bin of a positive value (0.0 == 0)
+        return round(math.log(value) / self.log_resolution) if value > 0.0 \
+            else ('raw', value)
+
+    def _log_value(self, key):
+        return key[1] if isinstance(key, tuple) \
+            else math.exp(key * self.log_resolution)
+
+    def key(self, temperature, pressure, air_density):
+        """
+        Parameters
+            (float) temperature: temperature [K]
+            (float) pressure: pressure [Pa]
+            (float) air_density: air number density
+
+        Returns
+            (tuple): quantized state
+        """
+        return (round(temperature / self.temperature_resolution),
+            self._log_bin(pressure), self._log_bin(air_density))
+
+    def rate_constants(self, temperature, pressure, air_density,
+        photolysis=None):
+        """
+        Rate constants of all reactions in one state
+
+        Parameters
+            (float) temperature: temperature [K]
+            (float) pressure: pressure [Pa]
+            (float) air_density: air number density,
+                in the units assumed by the rate parameters
+            (dict) photolysis: photolysis rate by MUSICA name (default 0)
+
+        Returns
+            (ndarray): (reactions,) rate constants, a new array
+        """
+
+        key = self.key(temperature, pressure, air_density)
+        thermal = self.entries.get(key)
+        if thermal is None:
+            self.misses += 1
+            thermal = evaluate_rate_constants(self.parameters,
+                key[0] * self.temperature_resolution,
+                self._log_value(key[1]), self._log_value(key[2]))[0].copy()
+            self.entries[key] = thermal
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+        rates = thermal.copy()
+        photolysis = photolysis if photolysis is not None else dict()
+        packed = self.parameters.get('PHOTOLYSIS', {})
+        for n, name in zip(packed.get('index', []), packed.get('names', [])):
+            rates[n] = photolysis.get(name, 0.0)
+
+        return rates
+
+
+def air_number_density(temperature, pressure):
+    """
+    Air number density of an ideal gas
+
+    Parameters
+        (ndarray) temperature: temperature [K]
+        (ndarray) pressure: pressure [Pa]
+
+    Returns
+        (ndarray): air number density [molecules cm-3]
+    """
+
+    return np.asarray(pressure) / (BOLTZMANN * np.asarray(temperature)) * 1.0e-6
+
+
+if __name__ == '__main__':
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--micm_dir', type=str,
+        default=os.path.join('..', 'racm_esrl_vcp', 'micm'),
+        help='MICM config directory')
+    parser.add_argument('--mechanism', type=str,
+        default='RACM_SOA_VBS',
+        help='mechanism name')
+    parser.add_argument('--n_cells', type=int,
+        default=100000,
+        help='number of grid cells')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    reactions_file = os.path.join(args.micm_dir, args.mechanism,
+        'reactions.json')
+    with open(reactions_file, 'r') as f:
+        reactions_json = json.load(f)
+
+    """
+    Evaluate rate constants on random atmospheric states
+    """
+    start = time.perf_counter()
+    parameters = compile_rate_parameters(reactions_json)
+    logging.info('compiled %d reactions in %.3f s'
+        % (parameters['n_reactions'], time.perf_counter() - start))
+
+    rng = np.random.default_rng(0)
+    temperature = rng.uniform(180.0, 320.0, args.n_cells)
+    pressure = rng.uniform(1.0e3, 1.0e5, args.n_cells)
+    air_density = air_number_density(temperature, pressure)
+
+    start = time.perf_counter()
+    rates = evaluate_rate_constants(parameters,
+        temperature, pressure, air_density)
+    seconds = time.perf_counter() - start
+    logging.info('evaluated %d x %d rate constants in %.3f s (%.1f ns each)'
+        % (rates.shape[0], rates.shape[1], seconds,
+           1.0e9 * seconds / rates.size))
@@ -0,0 +1,601 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    rate_expression.py
+
+Usage:
+    from rate_expression import compile_rate_expression, micm_rate_expression
+    node = compile_rate_expression('4.3D-13*EXP(1040./TEMP)')
+    k = evaluate_rate_expression(node, kpp_rate_namespace(T, air_density))
+    rate_type, reactions, error = micm_rate_expression(
+        '(1.33D-13+3.82D-11*EXP(-2000./TEMP))')
+
+Description:
+    rate_expression.py compiles inline KPP (Fortran) rate expressions,
+    arithmetic (+ - * / **) on numbers, TEMP, C_M (or M),
+    O2 and N2 (fixed fractions of C_M), EXP and the WRF-KPP rate functions,
+    to an abstract syntax tree of tuples:
+
+        ('num', value)          Fortran real, 1.0D-3_dp
+        ('name', name)          TEMP, C_M, ...
+        ('call', name, args)    EXP(...), ARR2(...), ...
+        ('neg', operand)
+        (op, left, right)       op one of + - * / **
+
+    evaluate_rate_expression evaluates a tree with NumPy
+    for arrays of temperature and air density, e.g. over the
+    temperature x pressure grid of verify_translation.py.
+
+    micm_rate_expression translates an expression to MICM reactions.
+    The tree is first expanded symbolically, with exact rational
+    arithmetic where possible, into a sum of terms
+
+        A * (T / 300)^B * exp(C / T) * [M]^m
+
+    An expression of one or two terms with m = 0 or 1 is matched exactly,
+    each term becoming an ARRHENIUS reaction (m = 0), or a TROE reaction
+    in its low pressure limit k0 [M] (m = 1, Fc = 1, kinf_A = 1e100),
+    as k45 and k57 are translated to two reactions.
+    Other expressions independent of [M] are fitted to a single ARRHENIUS
+    reaction by least squares in log k over FIT_TEMPERATURE,
+    and the maximum relative error of the fit is reported.
+    Expressions that can be neither matched nor fitted are left
+    to the caller.
+
+    Requires NumPy.
+"""
+
+import re
+import math
+import logging
+import functools
+from fractions import Fraction
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# mole fractions of O2 and N2 in air, for KPP expressions using O2 and N2
+AIR_COMPOSITION = {'O2': 0.20946, 'N2': 0.78084}
+
+# names of the air number density
+AIR_DENSITY_NAMES = ('C_M', 'M')
+
+# high pressure limit of TROE reactions standing for k0 [M]
+LOW_PRESSURE_KINF = 1.0e100
+
+# temperatures [K] of Arrhenius fits
+FIT_TEMPERATURE = np.linspace(180.0, 330.0, 64)
+
+# terms of an expanded expression beyond which it is fitted instead
+MAX_TERMS = 8
+
+_TOKEN_RE = re.compile(r'''\s*(?:
+    (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eEdD][+-]?\d+)?)(?:_dp)?
+    | \[(?P<bracket>\w+)\]
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<op>\*\*|[-+*/(),]))''', re.VERBOSE)
+
+
+def _tokenize(kpp_str):
+    """
+    Tokens of a rate expression, as (kind, value) pairs
+    """
+    tokens = list()
+    position = 0
+    kpp_str = kpp_str.rstrip()
+    while position < len(kpp_str):
+        match = _TOKEN_RE.match(kpp_str, position)
+        if match is None:
+            raise ValueError('unexpected %r in rate expression %r'
+                % (kpp_str[position:], kpp_str))
+        position = match.end()
+        if match.group('num') is not None:
+            tokens.append(('num', float(match.group('num').replace(
+                'd', 'e').replace('D', 'e'))))
+        elif match.group('bracket') is not None:
+            tokens.append(('name', match.group('bracket')))
+        elif match.group('name') is not None:
+            tokens.append(('name', match.group('name')))
+        else:
+            tokens.append(('op', match.group('op')))
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive descent parser of rate expressions, Fortran precedence
+    """
+
+    def __init__(self, kpp_str):
+        self.kpp_str = kpp_str
+        self.tokens = _tokenize(kpp_str)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def accept(self, op):
+        if self.peek() == ('op', op):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, op):
+        if not self.accept(op):
+            raise ValueError('expected %r in rate expression %r'
+                % (op, self.kpp_str))
+
+    def parse(self):
+        node = self.expression()
+        if self.position != len(self.tokens):
+            raise ValueError('unexpected %r in rate expression %r'
+                % (self.peek()[1], self.kpp_str))
+        return node
+
+    def expression(self):
+        node = self.term()
+        while True:
+            if self.accept('+'):
+                node = ('+', node, self.term())
+            elif self.accept('-'):
+                node = ('-', node, self.term())
+            else:
+                return node
+
+    def term(self):
+        node = self.unary()
+        while True:
+            if self.accept('*'):
+                node = ('*', node, self.unary())
+            elif self.accept('/'):
+                node = ('/', node, self.unary())
+            else:
+                return node
+
+    def unary(self):
+        if self.accept('-'):
+            return ('neg', self.unary())
+        if self.accept('+'):
+            return self.unary()
+        return self.power()
+
+    def power(self):
+        node = self.primary()
+        if self.accept('**'):
+            # right associative, and binds tighter than a unary minus
+            node = ('**', node, self.unary())
+        return node
+
+    def primary(self):
+        kind, value = self.peek()
+        if kind == 'num':
+            self.position += 1
+            return ('num', value)
+        if kind == 'name':
+            self.position += 1
+            if self.accept('('):
+                args = list()
+                if not self.accept(')'):
+                    args.append(self.expression())
+                    while self.accept(','):
+                        args.append(self.expression())
+                    self.expect(')')
+                return ('call', value, args)
+            return ('name', value)
+        if self.accept('('):
+            node = self.expression()
+            self.expect(')')
+            return node
+        raise ValueError('unexpected %r in rate expression %r'
+            % (value, self.kpp_str))
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_rate_expression(kpp_str):
+    """
+    Compile a KPP rate expression to a syntax tree
+
+    Parameters
+        (str) kpp_str: e.g. '4.3D-13*EXP(1040./TEMP)/(1.+0.027*EXP(660./TEMP))'
+
+    Returns
+        (tuple): syntax tree (see module description)
+
+    Raises
+        ValueError: the expression is not valid KPP syntax
+    """
+
+    return _Parser(kpp_str).parse()
+
+
+def expression_names(node):
+    """
+    Names and functions used in a syntax tree
+
+    Parameters
+        (tuple) node: syntax tree
+
+    Returns
+        (set of str): names and called functions
+    """
+
+    if node[0] == 'num':
+        return set()
+    if node[0] == 'name':
+        return {node[1]}
+    if node[0] == 'call':
+        names = {node[1]}
+        for arg in node[2]:
+            names |= expression_names(arg)
+        return names
+    names = set()
+    for operand in node[1:]:
+        names |= expression_names(operand)
+    return names
+
+
+"""
+Reference implementations of the WRF-KPP rate functions
+"""
+
+def kpp_troe(k0_300K, n, kinf_300K, m, T, cair):
+    """
+    WRF-KPP TROE(k0, n0, kinf, ninf, T, [M]), see rxn_troe.parse_kpp_troe
+    """
+    k0_T = k0_300K * (T / 300.0)**(- n)
+    kinf_T = kinf_300K * (T / 300.0)**(- m)
+    kratio = k0_T * cair / kinf_T
+    return k0_T * cair / (1.0 + kratio) \
+        * 0.6**(1.0 / (1.0 + np.log10(kratio)**2))
+
+
+def kpp_troee(A, B, k0_300K, n, kinf_300K, m, T, cair):
+    """
+    WRF-KPP TROEE(A, B, k0, n0, kinf, ninf, T, [M])
+    """
+    return A * np.exp(- B / T) * kpp_troe(k0_300K, n, kinf_300K, m, T, cair)
+
+
+def kpp_k45(T, cair):
+    """
+    WRF-KPP RACM k45(T, [M]) for HO + HNO3, see rxn_special.parse_kpp_k45
+    """
+    k0 = 2.4e-14 * np.exp(460.0 / T)
+    k2 = 2.7e-17 * np.exp(2199.0 / T)
+    k3 = 6.5e-34 * np.exp(1335.0 / T) * cair
+    return k0 + k3 / (1.0 + k3 / k2)
+
+
+def kpp_k57(T, cair):
+    """
+    RACM k57(T, [M]) for CO + HO, the JPL association (Troe) rate
+    plus the chemical activation rate, see rxn_special.parse_kpp_k57
+    """
+    association = kpp_troe(5.9e-33, 1.4, 1.1e-12, -1.3, T, cair)
+    k0 = 1.5e-13 * (T / 300.0)**0.6
+    kinf = 2.9e9 * (T / 300.0)**6.1
+    kratio = k0 * cair / kinf
+    activation = k0 / (1.0 + kratio) \
+        * 0.6**(1.0 / (1.0 + np.log10(kratio)**2))
+    return association + activation
+
+
+def kpp_rate_namespace(temperature, air_density):
+    """
+    Namespace for evaluating KPP rate expressions
+
+    Parameters
+        (ndarray) temperature: temperature [K]
+        (ndarray) air_density: air number density [molecules cm-3]
+
+    Returns
+        (dict): reference rate functions, TEMP, C_M, M, O2 and N2
+    """
+
+    T = temperature
+
+    namespace = {
+        'ARR': lambda A0, B0, C0, *args: A0 * np.exp(- B0 / T) * (T / 300.0)**C0,
+        'ARR_abc': lambda A0, B0, C0, *args: A0 * np.exp(- B0 / T) * (T / 300.0)**C0,
+        'ARR2': lambda A0, B0, *args: A0 * np.exp(- B0 / T),
+        'ARR_ab': lambda A0, B0, *args: A0 * np.exp(- B0 / T),
+        'ARR_ac': lambda A0, C0, *args: A0 * (T / 300.0)**C0,
+        'THERMAL_T2': lambda c, d, *args: c * T**2 * np.exp(- d / T),
+        'TROE': kpp_troe,
+        'TROEE': kpp_troee,
+        'k45': kpp_k45,
+        'k57': kpp_k57,
+        'TEMP': temperature}
+
+    for name in AIR_DENSITY_NAMES:
+        namespace[name] = air_density
+    for name, fraction in AIR_COMPOSITION.items():
+        namespace[name] = fraction * air_density
+
+    for name in ['exp', 'log', 'log10', 'sqrt']:
+        namespace[name] = getattr(np, name)
+        namespace[name.upper()] = getattr(np, name)
+
+    namespace['__builtins__'] = {}
+
+    return namespace
+
+
+_OPERATORS = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b,
+    '**': lambda a, b: a ** b}
+
+
+def evaluate_rate_expression(node, namespace):
+    """
+    Evaluate a syntax tree
+
+    Parameters
+        (tuple) node: syntax tree
+        (dict) namespace: values of names and rate functions,
+            see kpp_rate_namespace
+
+    Returns
+        (ndarray or float): rate constants
+
+    Raises
+        KeyError: a name or function is not in the namespace
+    """
+
+    op = node[0]
+    if op == 'num':
+        return node[1]
+    if op == 'name':
+        return namespace[node[1]]
+    if op == 'call':
+        return namespace[node[1]](*[evaluate_rate_expression(arg, namespace)
+            for arg in node[2]])
+    if op == 'neg':
+        return - evaluate_rate_expression(node[1], namespace)
+    return _OPERATORS[op](evaluate_rate_expression(node[1], namespace),
+        evaluate_rate_expression(node[2], namespace))
+
+
+"""
+Symbolic expansion to sums of terms A * (T / 300)^B * exp(C / T) * [M]^m,
+each term a tuple (A, B, C, m), None if the expansion does not exist
+"""
+
+def _constant(terms):
+    """
+    Value of a constant expansion, or None
+    """
+    if terms is not None and len(terms) == 1 and terms[0][1:] == (0, 0, 0):
+        return terms[0][0]
+    return None
+
+
+def _simplify(terms):
+    """
+    Sum terms with equal B, C, m and drop zero terms
+    """
+    if terms is None:
+        return None
+    sums = dict()
+    for A, B, C, m in terms:
+        sums[(B, C, m)] = sums.get((B, C, m), 0) + A
+    terms = [(A,) + key for key, A in sums.items() if A != 0]
+    if len(terms) > MAX_TERMS:
+        return None
+    return terms if terms else [(Fraction(0), 0, 0, 0)]
+
+
+def _multiply(left, right):
+    if left is None or right is None:
+        return None
+    return _simplify([(A1 * A2, B1 + B2, C1 + C2, m1 + m2)
+        for A1, B1, C1, m1 in left for A2, B2, C2, m2 in right])
+
+
+def _power(terms, exponent):
+    if terms is None or exponent is None or len(terms) != 1:
+        return None
+    A, B, C, m = terms[0]
+    if A < 0 and exponent != int(exponent):
+        return None
+    if A == 0 and exponent < 0:
+        return None
+    if exponent == int(exponent):
+        exponent = int(exponent)
+    elif isinstance(A, Fraction):
+        A = float(A)
+    return [(A ** exponent, B * exponent, C * exponent, m * exponent)]
+
+
+def _exp(terms):
+    """
+    exp of a sum of a constant and a multiple of 1 / T
+    """
+    if terms is None:
+        return None
+    A, C = 1, 0
+    for a, B, c, m in terms:
+        if (B, c, m) == (0, 0, 0):
+            A = math.exp(a)
+        elif (B, c, m) == (-1, 0, 0):
+            # a (T / 300)^-1 = 300 a / T
+            C = 300 * a
+        else:
+            return None
+    return [(A, 0, C, 0)]
+
+
+def _arrhenius(A0, B0, C0):
+    """
+    A0 * exp(- B0 / T) * (T / 300)^C0
+    """
+    if None in (A0, B0, C0):
+        return None
+    return [(A0, C0, - B0, 0)]
+
+
+def _expand_call(name, args):
+    constants = [_constant(arg) for arg in args]
+    if name in ('EXP', 'exp') and len(args) == 1:
+        return _exp(args[0])
+    if name in ('ARR', 'ARR_abc') and len(args) >= 3:
+        return _arrhenius(*constants[:3])
+    if name in ('ARR2', 'ARR_ab') and len(args) >= 2:
+        return _arrhenius(constants[0], constants[1], 0)
+    if name == 'ARR_ac' and len(args) >= 2:
+        return _arrhenius(constants[0], 0, constants[1])
+    if name == 'THERMAL_T2' and len(args) >= 2 and None not in constants[:2]:
+        # c T^2 exp(- d / T)
+        return [(constants[0] * 300 ** 2, 2, - constants[1], 0)]
+    return None
+
+
+def expand_rate_expression(node):
+    """
+    Expand a syntax tree to a sum of A * (T / 300)^B * exp(C / T) * [M]^m
+
+    Parameters
+        (tuple) node: syntax tree
+
+    Returns
+        (list of tuple): terms (A, B, C, m), exact fractions where possible,
+            or None if the expression is not such a sum
+    """
+
+    op = node[0]
+    if op == 'num':
+        return [(Fraction(node[1]), 0, 0, 0)]
+    if op == 'name':
+        if node[1] == 'TEMP':
+            return [(Fraction(300), 1, 0, 0)]
+        if node[1] in AIR_DENSITY_NAMES:
+            return [(Fraction(1), 0, 0, 1)]
+        if node[1] in AIR_COMPOSITION:
+            return [(Fraction(AIR_COMPOSITION[node[1]]), 0, 0, 1)]
+        return None
+    if op == 'call':
+        args = [expand_rate_expression(arg) for arg in node[2]]
+        # TEMP and C_M arguments are not constants
+        return _expand_call(node[1], args)
+    if op == 'neg':
+        terms = expand_rate_expression(node[1])
+        return None if terms is None \
+            else [(- A, B, C, m) for A, B, C, m in terms]
+
+    left = expand_rate_expression(node[1])
+    right = expand_rate_expression(node[2])
+    if left is None or right is None:
+        return None
+    if op == '+':
+        return _simplify(left + right)
+    if op == '-':
+        return _simplify(left + [(- A, B, C, m) for A, B, C, m in right])
+    if op == '*':
+        return _multiply(left, right)
+    if op == '/':
+        return _multiply(left, _power(right, -1))
+    if op == '**':
+        return _power(left, _constant(right))
+    return None
+
+
+def _micm_term(A, B, C, m):
+    """
+    MICM reaction of a term A * (T / 300)^B * exp(C / T) * [M]^m, m = 0 or 1
+    """
+    if m == 0:
+        reaction = {'type': 'ARRHENIUS', 'A': float(A)}
+        if B != 0:
+            reaction['B'] = float(B)
+        if C != 0:
+            reaction['C'] = float(C)
+        if B != 0:
+            reaction['D'] = 300.0
+        return reaction
+    return {'type': 'TROE',
+        'k0_A': float(A), 'k0_B': float(B), 'k0_C': float(C),
+        'kinf_A': LOW_PRESSURE_KINF, 'kinf_B': 0.0, 'kinf_C': 0.0,
+        'Fc': 1.0, 'N': 1.0}
+
+
+def fit_arrhenius(rate_constants, temperature=FIT_TEMPERATURE):
+    """
+    Least squares fit of A * (T / 300)^B * exp(C / T) in log k
+
+    Parameters
+        (ndarray) rate_constants: positive rate constants at temperature
+        (ndarray) temperature: temperature [K]
+
+    Returns
+        (tuple): MICM Arrhenius reaction dict, maximum relative error
+    """
+
+    basis = np.stack([np.ones_like(temperature), np.log(temperature / 300.0),
+        1.0 / temperature], axis=1)
+    (log_A, B, C), *_ = np.linalg.lstsq(basis, np.log(rate_constants),
+        rcond=None)
+
+    fitted = np.exp(basis @ np.array([log_A, B, C]))
+    max_rel_error = float(np.max(np.abs(fitted - rate_constants)
+        / rate_constants))
+
+    return {'type': 'ARRHENIUS', 'A': float(np.exp(log_A)), 'B': float(B),
+        'C': float(C), 'D': 300.0}, max_rel_error
+
+
+def micm_rate_expression(kpp_str):
+    """
+    Translate a KPP rate expression to MICM reactions,
+    exactly if possible, else by fitting an Arrhenius reaction
+
+    Parameters
+        (str) kpp_str: rate expression
+
+    Returns
+        (tuple): rate type 'expression' (exact) or 'expression_fit',
+            list of one or two MICM reaction dicts
+            and maximum relative error (0.0 if exact),
+            or (None, None, message) if the expression cannot be translated
+    """
+
+    try:
+        node = compile_rate_expression(kpp_str)
+    except ValueError as error:
+        return None, None, str(error)
+
+    terms = expand_rate_expression(node)
+    if terms is not None and len(terms) <= 2 \
+        and all(m in (0, 1) for A, B, C, m in terms):
+        return 'expression', [_micm_term(*term) for term in terms], 0.0
+
+    names = expression_names(node)
+    dependent = names & (set(AIR_DENSITY_NAMES) | set(AIR_COMPOSITION)
+        | {'TROE', 'TROEE', 'k45', 'k57'})
+    if dependent:
+        return None, None, 'depends on [M] through %s' \
+            % ', '.join(sorted(dependent))
+
+    namespace = kpp_rate_namespace(FIT_TEMPERATURE,
+        np.full_like(FIT_TEMPERATURE, np.nan))
+    try:
+        with np.errstate(all='ignore'):
+            rate_constants = np.broadcast_to(
+                evaluate_rate_expression(node, namespace),
+                FIT_TEMPERATURE.shape)
+    except KeyError as error:
+        return None, None, 'unknown name %s' % error
+    if not np.all(np.isfinite(rate_constants) & (rate_constants > 0.0)):
+        return None, None, 'not positive and finite for %.0f-%.0f K' \
+            % (FIT_TEMPERATURE[0], FIT_TEMPERATURE[-1])
+
+    reaction, max_rel_error = fit_arrhenius(rate_constants)
+    return 'expression_fit', [reaction], max_rel_error
@@ -0,0 +1,485 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    rate_tables.py
+
+Usage:
+    python rate_tables.py --micm_dir ../racm_esrl_vcp/micm --mechanism RACM_SOA_VBS
+    python rate_tables.py --n_cells 1000000
+    python rate_tables.py --help
+
+Description:
+    rate_tables.py pre-tabulates thermal rate constants of a translated
+    MICM mechanism (reactions.json) on a temperature x air density grid,
+    and looks them up by bilinear interpolation, vectorized over cells,
+    in place of the exp, log10 and pow of evaluate_rate_constants
+    (see rate_constants.py).
+
+    By default the fall-off reactions (TROE, TERNARY_CHEMICAL_ACTIVATION),
+    two exp, a log10 and a pow per value, are tabulated.
+    ARRHENIUS rate constants are a single exp per value
+    of the exponent matrix product, cheaper than the four table reads
+    of an interpolation; they are tabulated only on request (types),
+    and are otherwise evaluated directly by lookup_rate_constants,
+    as are PHOTOLYSIS rate constants.
+
+    The grid is uniform in 1/T and in log [M], where log k is
+    linear for ARRHENIUS without a B term, and smooth for the fall-off
+    expressions; log k is interpolated, so the error is relative.
+    Reactions with a zero or negative rate constant on the grid
+    are interpolated linearly in k. The pressure of ARRHENIUS E terms
+    is that of an ideal gas, [M] in molecules cm-3.
+    Temperatures and air densities outside the grid are clamped to its edges.
+
+    tabulate_rate_constants also evaluates every reaction directly at
+    the centers of the grid cells, where the interpolation error is largest,
+    and states the largest relative error of each reaction ('max_error').
+
+    write_rate_table writes the table values as a (temperature, density,
+    reactions) float64 array, rate_table.npy, that read_rate_table maps
+    into memory (numpy.load mmap_mode), and the grid, reaction indices
+    and errors as rate_table.json, next to reactions.json.
+
+    Requires NumPy.
+"""
+
+import os
+import sys
+import argparse
+import logging
+import json
+import time
+
+import numpy as np
+
+from rate_constants import BOLTZMANN, FALLOFF_TYPES, compile_rate_parameters, \
+    evaluate_rate_constants
+
+THERMAL_TYPES = ('ARRHENIUS',) + FALLOFF_TYPES
+
+
+def _tabulated_index(parameters, types):
+    """
+    Reaction indices of the tabulated reaction types, sorted
+    """
+    return np.sort(np.concatenate([np.zeros(0, dtype=np.intp)]
+        + [parameters[reaction_type]['index']
+           for reaction_type in types if reaction_type in parameters]))
+
+
+def _ideal_gas_pressure(temperature, air_density):
+    """
+    Pressure [Pa] of air density [molecules cm-3], inverse of
+    rate_constants.air_number_density
+    """
+    return air_density * 1.0e6 * BOLTZMANN * temperature
+
+
+def _thermal_rates(parameters, index, temperature, air_density):
+    """
+    Direct evaluation of the thermal rate constants, (cells, thermal)
+    """
+    return evaluate_rate_constants(parameters, temperature,
+        _ideal_gas_pressure(temperature, air_density), air_density)[:, index]
+
+
+def tabulate_rate_constants(parameters, types=FALLOFF_TYPES,
+    temperature_range=(150.0, 350.0), n_temperature=256,
+    density_range=(1.0e15, 1.0e20), n_density=128):
+    """
+    Tabulate rate constants on a temperature x air density grid
+
+    Parameters
+        (dict) parameters: from compile_rate_parameters
+        (tuple of str) types: reaction types tabulated, among THERMAL_TYPES
+        (tuple of float) temperature_range: lowest, highest temperature [K]
+        (int) n_temperature: grid points in temperature, uniform in 1/T
+        (tuple of float) density_range: lowest, highest air density
+            [molecules cm-3]
+        (int) n_density: grid points in air density, uniform in log [M]
+
+    Returns
+        (dict): 'n_reactions', 'types', 'index' of the tabulated reactions,
+            grid 'x0', 'dx' (1/T),
+            'y0', 'dy' (log [M]), 'values' (temperature, density, tabulated),
+            'log' (tabulated,) bool, log k interpolated,
+            'max_error' (tabulated,) largest relative error at cell centers
+    """
+
+    if n_temperature < 2 or n_density < 2:
+        raise ValueError('rate table needs at least 2 points per axis')
+
+    unknown = set(types) - set(THERMAL_TYPES)
+    if unknown:
+        raise ValueError('reaction types %s cannot be tabulated'
+            % ', '.join(sorted(unknown)))
+    index = _tabulated_index(parameters, types)
+
+    # 1/T decreases with T: x0 is 1 / highest temperature
+    x = np.linspace(1.0 / temperature_range[1], 1.0 / temperature_range[0],
+        n_temperature)
+    y = np.linspace(np.log(density_range[0]), np.log(density_range[1]),
+        n_density)
+
+    temperature = np.repeat(1.0 / x, n_density)
+    air_density = np.tile(np.exp(y), n_temperature)
+    values = _thermal_rates(parameters, index, temperature, air_density) \
+        .reshape(n_temperature, n_density, len(index))
+
+    log = (values > 0.0).all(axis=(0, 1))
+    values = np.ascontiguousarray(values)
+    values[:, :, log] = np.log(values[:, :, log])
+
+    table = {'n_reactions': parameters['n_reactions'],
+        'types': tuple(types), 'index': index,
+        'x0': x[0], 'dx': x[1] - x[0], 'y0': y[0], 'dy': y[1] - y[0],
+        'values': values, 'log': log}
+
+    """
+    Interpolation error at the centers of the grid cells
+    """
+    xc = 0.5 * (x[1:] + x[:-1])
+    yc = 0.5 * (y[1:] + y[:-1])
+    temperature = np.repeat(1.0 / xc, n_density - 1)
+    air_density = np.tile(np.exp(yc), n_temperature - 1)
+    exact = _thermal_rates(parameters, index, temperature, air_density)
+    table['max_error'] = relative_error(
+        interpolate(table, temperature, air_density), exact)
+
+    return table
+
+
+def relative_error(values, exact):
+    """
+    Largest relative error of each reaction
+
+    Parameters
+        (ndarray) values, exact: (cells, reactions) rate constants
+
+    Returns
+        (ndarray): (reactions,) max |values - exact| / |exact|,
+            absolute where exact is zero
+    """
+
+    error = np.abs(values - exact)
+    scale = np.abs(exact)
+    error = np.divide(error, scale, out=error, where=scale > 0.0)
+    return error.max(axis=0, initial=0.0)
+
+
+def interpolate(table, temperature, air_density):
+    """
+    Bilinear interpolation of the tabulated rate constants
+
+    Parameters
+        (dict) table: from tabulate_rate_constants or read_rate_table
+        (ndarray) temperature: temperature [K], one per cell
+        (ndarray) air_density: air number density [molecules cm-3],
+            one per cell
+
+    Returns
+        (ndarray): (cells, tabulated) rate constants
+    """
+
+    # a plain view of a memory map, without the np.memmap overhead per read
+    values = np.asarray(table['values'])
+    n_temperature, n_density, n_tabulated = values.shape
+    flat = values.reshape(n_temperature * n_density, n_tabulated)
+
+    temperature = np.atleast_1d(np.asarray(temperature, dtype=np.float64))
+    air_density = np.broadcast_to(np.asarray(air_density, dtype=np.float64),
+        temperature.shape)
+
+    # fractional grid positions, clamped to the grid
+    x = np.clip((1.0 / temperature - table['x0']) / table['dx'],
+        0.0, n_temperature - 1.0)
+    y = np.clip((np.log(air_density) - table['y0']) / table['dy'],
+        0.0, n_density - 1.0)
+    i = np.minimum(x.astype(np.intp), n_temperature - 2)
+    j = np.minimum(y.astype(np.intp), n_density - 2)
+    fx = (x - i)[:, np.newaxis]
+    fy = (y - j)[:, np.newaxis]
+
+    # corner values read into two buffers, no temporary per corner
+    corner = i * n_density + j
+    k = np.take(flat, corner, axis=0)
+    k *= (1.0 - fx) * (1.0 - fy)
+    term = np.take(flat, corner + n_density, axis=0)
+    term *= fx * (1.0 - fy)
+    k += term
+    np.take(flat, corner + 1, axis=0, out=term)
+    term *= (1.0 - fx) * fy
+    k += term
+    np.take(flat, corner + n_density + 1, axis=0, out=term)
+    term *= fx * fy
+    k += term
+
+    log = table['log']
+    if log.all():
+        np.exp(k, out=k)
+    elif log.any():
+        k[:, log] = np.exp(k[:, log])
+
+    return k
+
+
+def lookup_rate_constants(table, parameters, temperature, pressure,
+    air_density, photolysis=None, out=None):
+    """
+    Rate constants of all reactions in all cells, the tabulated reactions
+    from a rate table, the others evaluated directly
+
+    Parameters
+        (dict) table: from tabulate_rate_constants or read_rate_table
+        (dict) parameters: from compile_rate_parameters
+        (ndarray) temperature: temperature [K], one per cell
+        (ndarray) pressure: pressure [Pa], one per cell
+        (ndarray) air_density: air number density [molecules cm-3],
+            one per cell
+        (dict) photolysis: photolysis rate by MUSICA name,
+            scalar or one per cell (default 0)
+        (ndarray) out: (reactions, cells) array to reuse, e.g. block
+            after block (default a new array)
+
+    Returns
+        (ndarray): (cells, reactions) rate constants,
+            as evaluate_rate_constants
+    """
+
+    if table['n_reactions'] != parameters['n_reactions']:
+        raise ValueError('rate table of %d reactions, mechanism of %d'
+            % (table['n_reactions'], parameters['n_reactions']))
+
+    direct = dict((key, value) for key, value in parameters.items()
+        if key not in table['types'])
+    rates = evaluate_rate_constants(direct, temperature, pressure,
+        air_density, photolysis=photolysis, out=out)
+    rates[:, table['index']] = interpolate(table, temperature, air_density)
+
+    return rates
+
+
+def write_rate_table(table, micm_mechanism_dir):
+    """
+    Write rate_table.npy and rate_table.json
+
+    Parameters
+        (dict) table: from tabulate_rate_constants
+        (str) micm_mechanism_dir: output directory
+
+    Returns
+        (list of str): files written
+    """
+
+    files = [os.path.join(micm_mechanism_dir, 'rate_table.npy'),
+             os.path.join(micm_mechanism_dir, 'rate_table.json')]
+
+    np.save(files[0], np.ascontiguousarray(table['values']))
+    n_temperature, n_density, _ = table['values'].shape
+    with open(files[1], 'w') as f:
+        json.dump({'n_reactions': table['n_reactions'],
+            'types': list(table['types']),
+            'index': table['index'].tolist(),
+            'n_temperature': n_temperature, 'n_density': n_density,
+            'x0': table['x0'], 'dx': table['dx'],
+            'y0': table['y0'], 'dy': table['dy'],
+            'log': table['log'].tolist(),
+            'max_error': table['max_error'].tolist()}, f, indent=4)
+
+    return files
+
+
+def read_rate_table(micm_mechanism_dir, mmap=True):
+    """
+    Read a rate table written by write_rate_table
+
+    Parameters
+        (str) micm_mechanism_dir: directory of rate_table.npy and rate_table.json
+        (bool) mmap: map the table values into memory, read-only
+
+    Returns
+        (dict): rate table, as tabulate_rate_constants
+    """
+
+    with open(os.path.join(micm_mechanism_dir, 'rate_table.json'), 'r') as f:
+        header = json.load(f)
+    values = np.load(os.path.join(micm_mechanism_dir, 'rate_table.npy'),
+        mmap_mode='r' if mmap else None)
+    if values.shape != (header['n_temperature'], header['n_density'],
+        len(header['index'])):
+        raise ValueError('rate_table.npy shape %s does not match rate_table.json'
+            % str(values.shape))
+
+    return {'n_reactions': header['n_reactions'],
+        'types': tuple(header['types']),
+        'index': np.array(header['index'], dtype=np.intp),
+        'x0': header['x0'], 'dx': header['dx'],
+        'y0': header['y0'], 'dy': header['dy'],
+        'values': values,
+        'log': np.array(header['log'], dtype=bool),
+        'max_error': np.array(header['max_error'], dtype=np.float64)}
+
+
+def benchmark_rate_table(parameters, table, n_cells=1000000, block_size=1000,
+    repeat=3, temperature_range=(180.0, 320.0), pressure_range=(1.0e3, 1.0e5),
+    seed=0):
+    """
+    Time direct evaluation and table lookup of the rate constants
+    of all reactions on random atmospheric states, block by block
+
+    Parameters
+        (dict) parameters: from compile_rate_parameters
+        (dict) table: from tabulate_rate_constants or read_rate_table
+        (int) n_cells: number of cells
+        (int) block_size: cells per block
+        (int) repeat: timing repetitions, best kept
+        (tuple of float) temperature_range: [K]
+        (tuple of float) pressure_range: [Pa]
+        (int) seed: random seed
+
+    Returns
+        (dict): 'n_cells', 'n_reactions', 'n_tabulated', 'direct'
+            and 'table' seconds of all reactions, 'tabulated_direct'
+            and 'tabulated_table' seconds of the tabulated reactions only,
+            'speedup', 'max_error' largest relative error
+    """
+
+    rng = np.random.default_rng(seed)
+    temperature = rng.uniform(*temperature_range, n_cells)
+    pressure = rng.uniform(*pressure_range, n_cells)
+    air_density = pressure / (BOLTZMANN * temperature) * 1.0e-6
+    blocks = [slice(start, min(start + block_size, n_cells))
+        for start in range(0, n_cells, block_size)]
+    tabulated = dict((key, value) for key, value in parameters.items()
+        if key == 'n_reactions' or key in table['types'])
+
+    # one output array reused by the blocks of both methods,
+    # as a model evaluating the cells block by block
+    out = np.zeros((parameters['n_reactions'], block_size))
+
+    methods = {
+        'direct': lambda block, out: evaluate_rate_constants(parameters,
+            temperature[block], pressure[block], air_density[block],
+            out=out),
+        'table': lambda block, out: lookup_rate_constants(table, parameters,
+            temperature[block], pressure[block], air_density[block],
+            out=out),
+        'tabulated_direct': lambda block, out: evaluate_rate_constants(
+            tabulated, temperature[block], pressure[block],
+            air_density[block], out=out),
+        'tabulated_table': lambda block, out: interpolate(table,
+            temperature[block], air_density[block])}
+
+    # methods interleaved in each repetition, best kept,
+    # so that a slower period of the machine affects all of them
+    seconds = dict((name, float('inf')) for name in methods)
+    for _ in range(repeat):
+        for name, evaluate in methods.items():
+            start = time.perf_counter()
+            for block in blocks:
+                evaluate(block, out[:, :block.stop - block.start])
+            seconds[name] = min(seconds[name], time.perf_counter() - start)
+
+    block = blocks[0]
+    max_error = relative_error(
+        interpolate(table, temperature[block], air_density[block]),
+        _thermal_rates(parameters, table['index'], temperature[block],
+            air_density[block]))
+
+    return {'n_cells': n_cells, 'n_reactions': parameters['n_reactions'],
+        'n_tabulated': len(table['index']),
+        'direct': seconds['direct'], 'table': seconds['table'],
+        'tabulated_direct': seconds['tabulated_direct'],
+        'tabulated_table': seconds['tabulated_table'],
+        'speedup': seconds['direct'] / seconds['table']
+            if seconds['table'] > 0.0 else float('inf'),
+        'max_error': float(max_error.max(initial=0.0))}
+
+
+if __name__ == '__main__':
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--micm_dir', type=str,
+        default=os.path.join('..', 'racm_esrl_vcp', 'micm'),
+        help='MICM config directory')
+    parser.add_argument('--mechanism', type=str,
+        default='RACM_SOA_VBS',
+        help='mechanism name')
+    parser.add_argument('--types', type=str, nargs='+',
+        default=list(FALLOFF_TYPES), choices=THERMAL_TYPES,
+        help='reaction types tabulated')
+    parser.add_argument('--temperature_range', type=float, nargs=2,
+        default=[150.0, 350.0],
+        help='lowest and highest tabulated temperature [K]')
+    parser.add_argument('--n_temperature', type=int,
+        default=256,
+        help='grid points in temperature')
+    parser.add_argument('--density_range', type=float, nargs=2,
+        default=[1.0e15, 1.0e20],
+        help='lowest and highest tabulated air density [molecules cm-3]')
+    parser.add_argument('--n_density', type=int,
+        default=128,
+        help='grid points in air density')
+    parser.add_argument('--n_cells', type=int,
+        default=1000000,
+        help='number of grid cells of the benchmark, 0 to skip it')
+    parser.add_argument('--block_size', type=int,
+        default=1000,
+        help='cells per block of the benchmark')
+    parser.add_argument('--repeat', type=int,
+        default=3,
+        help='timing repetitions of the benchmark, best kept')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    micm_mechanism_dir = os.path.join(args.micm_dir, args.mechanism)
+    with open(os.path.join(micm_mechanism_dir, 'reactions.json'), 'r') as f:
+        reactions_json = json.load(f)
+    parameters = compile_rate_parameters(reactions_json)
+
+    """
+    Tabulate the rate constants next to reactions.json
+    """
+    start = time.perf_counter()
+    table = tabulate_rate_constants(parameters, types=tuple(args.types),
+        temperature_range=tuple(args.temperature_range),
+        n_temperature=args.n_temperature,
+        density_range=tuple(args.density_range), n_density=args.n_density)
+    files = write_rate_table(table, micm_mechanism_dir)
+    logging.info('tabulated %d reactions on %d x %d points in %.3f s, '
+        'max relative error %.2e' % (len(table['index']), args.n_temperature,
+            args.n_density, time.perf_counter() - start,
+            table['max_error'].max(initial=0.0)))
+    for name in files:
+        logging.info('wrote %s' % name)
+
+    """
+    Compare table lookup and direct evaluation
+    """
+    if args.n_cells > 0:
+        result = benchmark_rate_table(parameters,
+            read_rate_table(micm_mechanism_dir), n_cells=args.n_cells,
+            block_size=args.block_size, repeat=args.repeat)
+        logging.info('%d cells x %d tabulated reactions: direct %.3f s, '
+            'table %.3f s' % (result['n_cells'], result['n_tabulated'],
+               result['tabulated_direct'], result['tabulated_table']))
+        logging.info('%d cells x %d reactions: direct %.3f s, table %.3f s, '
+            'speedup %.2f, max relative error %.2e'
+            % (result['n_cells'], result['n_reactions'], result['direct'],
+               result['table'], result['speedup'], result['max_error']))
@@ -0,0 +1,214 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    reduction.py
+
+Usage:
+    from reduction import reduce_mechanism
+    report = reduce_mechanism(mechanism, targets=['O3', 'NO2'])
+    python kpp_to_micm.py --reduce --targets O3 NO2
+
+Description:
+    reduction.py removes the parts of a translated mechanism
+    (mechanism.Mechanism) that cannot affect the species of interest,
+    between parsing and serialization:
+
+        unreachable reactions   with target species, the reactions
+                                that change no species the targets
+                                depend on
+        duplicate reactions     ARRHENIUS reactions with the same
+                                reactants, products and parameters
+                                other than A, merged into the first
+                                with the sum of A
+        dead species            variable species in no remaining reaction,
+                                except the targets
+
+    The targets depend on themselves and, recursively, on the reactants
+    of every reaction changing a species they depend on,
+    since those reactants set its rate. A reaction is kept if its net
+    stoichiometry changes a species the targets depend on;
+    its other products are kept with it. Without targets,
+    every reaction is reachable.
+    Constant species are never removed, and the name table
+    (Mechanism.names) is unchanged.
+"""
+
+import logging
+
+from sparsity import jacobian_pattern
+
+logger = logging.getLogger(__name__)
+
+# reaction types whose rate is proportional to the A parameter
+MERGEABLE_TYPES = ('ARRHENIUS',)
+
+
+def _net(reaction):
+    """
+    Species indices with a nonzero net stoichiometry in a reaction
+    """
+    net = dict()
+    for n, qty in zip(reaction.reactants, reaction.reactant_qty):
+        net[n] = net.get(n, 0.0) - qty
+    for n, y in zip(reaction.products, reaction.product_yield):
+        net[n] = net.get(n, 0.0) + y
+    return set(n for n, value in net.items() if value != 0.0)
+
+
+def dependencies(mechanism, targets):
+    """
+    Species the targets depend on
+
+    Parameters
+        (Mechanism) mechanism: compact mechanism
+        (list of str) targets: target species names
+
+    Returns
+        (set of int): name indices, the targets included
+    """
+
+    # reactions changing each species
+    changed_by = dict()
+    for reaction in mechanism.reactions:
+        for n in _net(reaction):
+            changed_by.setdefault(n, list()).append(reaction)
+
+    reached = set(mechanism.index[name] for name in targets)
+    pending = list(reached)
+    while pending:
+        n = pending.pop()
+        for reaction in changed_by.get(n, list()):
+            for m in reaction.reactants:
+                if m not in reached:
+                    reached.add(m)
+                    pending.append(m)
+
+    return reached
+
+
+def _merge_key(reaction):
+    """
+    Reactions with equal keys differ only in their A parameter
+    """
+    if reaction.type not in MERGEABLE_TYPES \
+        or 'A' not in reaction.parameter_names:
+        return None
+    parameters = reaction.parameters()
+    del parameters['A']
+    return (reaction.type, tuple(sorted(parameters.items())),
+        tuple(sorted(zip(reaction.reactants, reaction.reactant_qty))),
+        tuple(sorted(zip(reaction.products, reaction.product_yield))))
+
+
+def merge_reactions(reactions):
+    """
+    Merge ARRHENIUS reactions differing only in A, summing A
+
+    Parameters
+        (list of Reaction) reactions: compact reactions
+
+    Returns
+        (list of Reaction, list of tuple): remaining reactions,
+            (kept label, merged label) of each merged reaction
+    """
+
+    first = dict()
+    remaining = list()
+    merged = list()
+
+    for reaction in reactions:
+        key = _merge_key(reaction)
+        if key is None or key not in first:
+            if key is not None:
+                first[key] = reaction
+            remaining.append(reaction)
+            continue
+        kept = first[key]
+        k = kept.parameter_names.index('A')
+        values = list(kept.parameter_values)
+        values[k] += reaction.parameters()['A']
+        kept.parameter_values = tuple(values)
+        merged.append((kept.label, reaction.label))
+
+    return remaining, merged
+
+
+def _jacobian_nonzeros(mechanism):
+    """
+    Nonzeros of the Jacobian of the variable species
+    """
+    return len(jacobian_pattern(mechanism.species_names(constant=False),
+        mechanism.iter_reactions_json()))
+
+
+def reduce_mechanism(mechanism, targets=None, merge=True):
+    """
+    Remove unreachable reactions, merge duplicate reactions
+    and remove dead species, in place
+
+    Parameters
+        (Mechanism) mechanism: compact mechanism
+        (list of str) targets: target species names, default none
+            (every reaction reachable)
+        (bool) merge: merge duplicate ARRHENIUS reactions
+
+    Returns
+        (dict): 'species_removed' names, 'reactions_removed' and
+            'reactions_merged' labels ((kept, merged) pairs),
+            and 'species', 'reactions', 'jacobian' nonzeros
+            'before' and 'after'
+
+    Raises
+        ValueError: if a target is not a species of the mechanism
+    """
+
+    targets = list(targets) if targets else list()
+    missing = [name for name in targets if name not in mechanism.index]
+    if missing:
+        raise ValueError('unknown target species %s' % ', '.join(missing))
+
+    before = {'species': len(mechanism.species),
+        'reactions': len(mechanism.reactions),
+        'jacobian': _jacobian_nonzeros(mechanism)}
+
+    removed = list()
+    if targets:
+        reached = dependencies(mechanism, targets)
+        kept = list()
+        for reaction in mechanism.reactions:
+            if _net(reaction) & reached:
+                kept.append(reaction)
+            else:
+                removed.append(reaction.label)
+        mechanism.reactions = kept
+
+    merged = list()
+    if merge:
+        mechanism.reactions, merged = merge_reactions(mechanism.reactions)
+
+    used = set(targets)
+    for reaction in mechanism.reactions:
+        used.update(mechanism.names[n] for n in reaction.reactants)
+        used.update(mechanism.names[n] for n in reaction.products)
+    dead = [name for name in mechanism.species_names(constant=False)
+        if name not in used]
+    mechanism.remove_species(dead)
+
+    after = {'species': len(mechanism.species),
+        'reactions': len(mechanism.reactions),
+        'jacobian': _jacobian_nonzeros(mechanism)}
+
+    logger.info('reduced %s: %d of %d species, %d of %d reactions '
+        '(%d unreachable, %d merged), %d of %d Jacobian nonzeros',
+        mechanism.name, after['species'], before['species'],
+        after['reactions'], before['reactions'], len(removed), len(merged),
+        after['jacobian'], before['jacobian'])
+    logger.debug('dead species: %s', dead)
+    logger.debug('unreachable reactions: %s', removed)
+    logger.debug('merged reactions: %s', merged)
+
+    return {'species_removed': dead, 'reactions_removed': removed,
+        'reactions_merged': merged, 'before': before, 'after': after}
@@ -9,14 +9,23 @@ File:
 
 import logging
 
-from parse_kpp_utils import parse_coeffs
+from parse_kpp_utils import scan_rate_expression, parse_args
 
-def parse_kpp_arrhenius(kpp_str, N_reactants=2):
+logger = logging.getLogger(__name__)
+
+# KPP Arrhenius functions and their parameters
+ARRHENIUS_FORMS = {'ARR': 'abc', 'ARR_abc': 'abc',
+                   'ARR2': 'ab', 'ARR_ab': 'ab',
+                   'ARR_ac': 'ac'}
+
+
+def micm_arrhenius(name, coeffs, N_reactants=2):
     """
-    Parse KPP Arrhenius reaction
+    MICM Arrhenius reaction of a KPP Arrhenius function call
 
     Parameters
-        (str) kpp_str: Arrhenius reaction string
+        (str) name: KPP function, a key of ARRHENIUS_FORMS
+        (list of float) coeffs: numerical arguments
         (int) N_reactants: number of reactants
 
     Returns
@@ -33,28 +42,48 @@ def parse_kpp_arrhenius(kpp_str, N_reactants=2):
       (1.0 + parameters_.E_ * pressure);
     """
 
-    coeffs = parse_coeffs(kpp_str)
-    logging.debug('coeffs:' + str(coeffs))
+    logger.debug('coeffs: %s', coeffs)
+
+    form = ARRHENIUS_FORMS.get(name)
 
     arrhenius_dict = dict()
     arrhenius_dict['type'] = 'ARRHENIUS'
     # note the interchange of B and C, and change of sign
     # in the KPP and MICM conventions
-    if ('ARR(' in kpp_str or '_abc(' in kpp_str):
+    if form == 'abc':
         arrhenius_dict['A'] = coeffs[0]
         arrhenius_dict['B'] = coeffs[2]
         arrhenius_dict['C'] = - coeffs[1]
         arrhenius_dict['D'] = 300.0
-    elif ('ARR2(' in kpp_str or '_ab(' in kpp_str):
+    elif form == 'ab':
         arrhenius_dict['A'] = coeffs[0]
         arrhenius_dict['C'] = - coeffs[1]
         arrhenius_dict['D'] = 300.0
-    elif ('_ac(' in kpp_str):
+    elif form == 'ac':
         arrhenius_dict['A'] = coeffs[0]
         arrhenius_dict['B'] = coeffs[1]
         arrhenius_dict['D'] = 300.0
     else:
-        logging.error('unrecognized KPP Arrhenius syntax')
-    logging.debug(arrhenius_dict)
+        logger.error('unrecognized KPP Arrhenius syntax')
+    logger.debug(arrhenius_dict)
     return arrhenius_dict
 
+
+def parse_kpp_arrhenius(kpp_str, N_reactants=2):
+    """
+    Parse KPP Arrhenius reaction
+
+    Parameters
+        (str) kpp_str: Arrhenius reaction string
+        (int) N_reactants: number of reactants
+
+    Returns
+        (dict): MICM Arrhenius reaction coefficients (see micm_arrhenius)
+    """
+
+    for name, args in scan_rate_expression(kpp_str):
+        if name in ARRHENIUS_FORMS and args is not None:
+            return micm_arrhenius(name, parse_args(args),
+                N_reactants=N_reactants)
+
+    return micm_arrhenius(None, list(), N_reactants=N_reactants)
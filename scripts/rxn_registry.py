@@ -0,0 +1,261 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    rxn_registry.py
+
+Usage:
+    from rxn_registry import register_rate_function
+    register_rate_function('usr_CO_OH_a', parser, rate_type='usr_CO_OH_a')
+
+Description:
+    rxn_registry.py maps KPP rate functions to the parsers
+    generating their MICM reactions.
+
+    A rate expression is scanned once (parse_kpp_utils.scan_rate_expression)
+    for its identifiers and function calls, and each identifier is looked up
+    in the registry; there is no per-function scan of the expression.
+    When several registered functions appear in one expression,
+    the first registered wins, so the built-in functions are matched
+    in the order of the former substring tests:
+
+        SUN, Pj_*                       PHOTOLYSIS
+        ARR, ARR_abc, ARR2, ARR_ab,
+        ARR_ac                          ARRHENIUS (rxn_arrhenius.py)
+        TROE, TROEE                     TROE (rxn_troe.py)
+        k45, k57                        two reactions (rxn_special.py)
+
+    A function other than photolysis is used only if the expression is
+    the function alone, or the function times a constant, which is folded
+    into A (ARRHENIUS) or k0_A and kinf_A (TROE,
+    TERNARY_CHEMICAL_ACTIVATION), e.g. .20946D0*ARR2(3.30D-39, -530.0, TEMP);
+    other expressions, e.g. ARR2(...) + ARR2(...), are left to the caller
+    (rate_expression.py). The rate of a photolysis reaction is given
+    at run time, so SUN and Pj_* may appear anywhere in the expression.
+
+    Custom rate functions, e.g. those of docs/custom-rate-constants,
+    are added with register_rate_function. A parser is called as
+    parser(name, coeffs, N_reactants), with the function name,
+    the numerical arguments of the call (parse_kpp_utils.parse_args,
+    empty for an identifier that is not called) and the number of reactants,
+    and returns a new MICM reaction dict, or a tuple of two
+    if the KPP rate is the sum of two MICM reaction types.
+"""
+
+import logging
+import itertools
+import collections
+
+from parse_kpp_utils import scan_rate_expression, parse_args
+from rate_expression import compile_rate_expression
+from rxn_arrhenius import ARRHENIUS_FORMS, micm_arrhenius
+from rxn_troe import TROE_FORMS, micm_troe
+from rxn_special import micm_k45, micm_k57
+
+logger = logging.getLogger(__name__)
+
+RateFunction = collections.namedtuple('RateFunction',
+    ['name', 'parser', 'rate_type', 'prefix', 'order'])
+
+# rate parameters scaled by a constant factor, by reaction type
+SCALED_PARAMETERS = {
+    'ARRHENIUS': ('A',),
+    'TROE': ('k0_A', 'kinf_A'),
+    'TERNARY_CHEMICAL_ACTIVATION': ('k0_A', 'kinf_A')}
+
+# registered functions by name, and those matched by name prefix
+_functions = dict()
+_prefixes = dict()
+_order = itertools.count()
+
+
+def register_rate_function(name, parser, rate_type=None, prefix=False):
+    """
+    Register a KPP rate function, replacing one of the same name
+
+    Parameters
+        (str) name: KPP function or identifier, e.g. 'TROE', 'SUN'
+        (callable) parser: parser(name, coeffs, N_reactants)
+            returning a MICM reaction dict or a tuple of two
+        (str) rate_type: rate type counted in the translation metrics,
+            default name
+        (bool) prefix: match every identifier starting with name
+    """
+
+    registry = _prefixes if prefix else _functions
+    previous = registry.get(name)
+    order = previous.order if previous is not None else next(_order)
+    registry[name] = RateFunction(name, parser,
+        rate_type if rate_type is not None else name, prefix, order)
+
+
+def unregister_rate_function(name, prefix=False):
+    """
+    Remove a registered KPP rate function
+
+    Parameters
+        (str) name: KPP function or identifier
+        (bool) prefix: registered as a prefix
+    """
+
+    (_prefixes if prefix else _functions).pop(name, None)
+
+
+def lookup_rate_function(name):
+    """
+    Registered rate function matching an identifier
+
+    Parameters
+        (str) name: identifier of a rate expression
+
+    Returns
+        (RateFunction): registered function, or None
+    """
+
+    function = _functions.get(name)
+    if function is None:
+        for prefix in _prefixes:
+            if name.startswith(prefix):
+                return _prefixes[prefix]
+    return function
+
+
+def match_rate_function(kpp_str):
+    """
+    Registered rate function of a KPP rate expression
+
+    Parameters
+        (str) kpp_str: rate expression
+
+    Returns
+        (tuple): RateFunction, identifier and list of argument strings
+            (None if not called), or None if no registered function appears
+    """
+
+    match = None
+    for name, args in scan_rate_expression(kpp_str):
+        function = lookup_rate_function(name)
+        if function is not None \
+            and (match is None or function.order < match[0].order):
+            match = (function, name, args)
+    return match
+
+
+def constant_factor(kpp_str, name):
+    """
+    Constant factor of a rate expression that is a product
+    of numbers and a single function call or identifier
+
+    Parameters
+        (str) kpp_str: rate expression, e.g. '.5*ARR2(1.0D-12, 300.0_dp, TEMP)'
+        (str) name: function or identifier, e.g. 'ARR2'
+
+    Returns
+        (float): product of the numbers, 1.0 if none,
+            None if the expression is not such a product
+    """
+
+    try:
+        node = compile_rate_expression(kpp_str)
+    except ValueError:
+        return None
+
+    factor = 1.0
+    found = 0
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if node[0] == '*':
+            pending.extend(node[1:])
+        elif node[0] == 'num':
+            factor *= node[1]
+        elif node[0] in ('call', 'name') and node[1] == name:
+            found += 1
+        else:
+            return None
+
+    return factor if found == 1 else None
+
+
+def scale_reaction(reaction, factor):
+    """
+    Scale the rate constant of a MICM reaction by a constant factor
+
+    Parameters
+        (dict) reaction: MICM reaction, scaled in place
+        (float) factor: positive factor
+
+    Returns
+        (bool): False if the rate of the reaction type cannot be scaled
+    """
+
+    names = SCALED_PARAMETERS.get(reaction['type'])
+    if names is None or not all(name in reaction for name in names):
+        return False
+    for name in names:
+        reaction[name] *= factor
+    return True
+
+
+def parse_rate_expression(kpp_str, N_reactants=2):
+    """
+    MICM reactions of a KPP rate expression calling a registered function
+
+    Parameters
+        (str) kpp_str: rate expression
+        (int) N_reactants: number of reactants
+
+    Returns
+        (tuple): rate type and list of one or two MICM reaction dicts,
+            or None if no registered function appears, or if it is not
+            the whole expression (but for a constant factor)
+    """
+
+    match = match_rate_function(kpp_str)
+    if match is None:
+        return None
+
+    function, name, args = match
+    coeffs = parse_args(args) if args is not None else list()
+    reactions = function.parser(name, coeffs, N_reactants)
+    if isinstance(reactions, dict):
+        reactions = [reactions]
+    reactions = list(reactions)
+
+    if all(reaction['type'] == 'PHOTOLYSIS' for reaction in reactions):
+        return function.rate_type, reactions
+
+    factor = constant_factor(kpp_str, name)
+    if factor is None or factor <= 0.0:
+        logger.warning('%s is not a constant times %s, '
+            'translated as an expression', kpp_str.strip(), name)
+        return None
+    if factor != 1.0 and not all(scale_reaction(reaction, factor)
+        for reaction in reactions):
+        logger.warning('%s: %s reactions cannot be scaled by %g, '
+            'translated as an expression', kpp_str.strip(), name, factor)
+        return None
+
+    return function.rate_type, reactions
+
+
+"""
+Built-in KPP rate functions, in matching order
+"""
+register_rate_function('SUN',
+    lambda name, coeffs, N_reactants: {'type': 'PHOTOLYSIS'},
+    rate_type='PHOTOLYSIS')
+register_rate_function('Pj_',
+    lambda name, coeffs, N_reactants: {'type': 'PHOTOLYSIS'},
+    rate_type='PHOTOLYSIS', prefix=True)
+for _name in ARRHENIUS_FORMS:
+    register_rate_function(_name, micm_arrhenius, rate_type='ARR')
+for _name in TROE_FORMS:
+    register_rate_function(_name, micm_troe)
+del _name
+register_rate_function('k45',
+    lambda name, coeffs, N_reactants: micm_k45())
+register_rate_function('k57',
+    lambda name, coeffs, N_reactants: micm_k57())
@@ -9,14 +9,21 @@ File:
 
 import logging
 
-from parse_kpp_utils import parse_coeffs
+from parse_kpp_utils import scan_rate_expression, parse_args
 
-def parse_kpp_troe(kpp_str, N_reactants=2):
+logger = logging.getLogger(__name__)
+
+# KPP Troe functions
+TROE_FORMS = ('TROE', 'TROEE')
+
+
+def micm_troe(name, coeffs, N_reactants=2):
     """
-    Parse KPP Troe reaction
+    MICM Troe reaction of a KPP Troe function call
 
     Parameters
-        (str) kpp_str: Troe reaction string
+        (str) name: KPP function, 'TROE' or 'TROEE'
+        (list of float) coeffs: numerical arguments
         (int) N_reactants: number of reactants
 
     Returns
@@ -63,12 +70,10 @@ def parse_kpp_troe(kpp_str, N_reactants=2):
     kinf_B = - ninf
     """
 
-    coeffs = parse_coeffs(kpp_str)
-
     troe_dict = dict()
     troe_dict['type'] = 'TROE'
 
-    if ('TROEE' in kpp_str):
+    if name == 'TROEE':
         # TROEE(A, B, k0, n0, kinf, ninf, T, [M])
         troe_dict['k0_A']   = coeffs[0] * coeffs[2]
         troe_dict['k0_B']   = - coeffs[3]
@@ -78,7 +83,7 @@ def parse_kpp_troe(kpp_str, N_reactants=2):
         troe_dict['kinf_C'] = 0.0
         troe_dict['Fc']     = 0.6
         troe_dict['N']      = 1.0
-    elif ('TROE' in kpp_str):
+    elif name == 'TROE':
         # TROE(k0, n0, kinf, ninf, T, [M])
         troe_dict['k0_A']   = coeffs[0]
         troe_dict['k0_B']   = - coeffs[1]
@@ -89,8 +94,26 @@ def parse_kpp_troe(kpp_str, N_reactants=2):
         troe_dict['Fc']     = 0.6
         troe_dict['N']      = 1.0
     else:
-        logging.error('unrecognized KPP Troe syntax')
+        logger.error('unrecognized KPP Troe syntax')
 
-    logging.debug(troe_dict)
+    logger.debug(troe_dict)
     return troe_dict
 
+
+def parse_kpp_troe(kpp_str, N_reactants=2):
+    """
+    Parse KPP Troe reaction
+
+    Parameters
+        (str) kpp_str: Troe reaction string
+        (int) N_reactants: number of reactants
+
+    Returns
+        (dict): MICM Troe reaction coefficients (see micm_troe)
+    """
+
+    for name, args in scan_rate_expression(kpp_str):
+        if name in TROE_FORMS and args is not None:
+            return micm_troe(name, parse_args(args), N_reactants=N_reactants)
+
+    return micm_troe(None, list(), N_reactants=N_reactants)
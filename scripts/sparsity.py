@@ -0,0 +1,181 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    sparsity.py
+
+Description:
+    sparsity.py computes the sparsity structure of the Jacobian
+    of a MICM mechanism, a fill-reducing species ordering
+    and the symbolic LU decomposition in that ordering.
+
+    The Jacobian of the variable species has a nonzero (i, j)
+    wherever species j is a reactant of a reaction that changes species i,
+    plus the full diagonal (the Rosenbrock matrix I / (h gamma) - J).
+    As in KPP, the ordering is chosen by the Markowitz criterion
+    for diagonal pivots: at each elimination step the remaining species
+    with the smallest (r - 1)(c - 1) is eliminated next,
+    r and c being the nonzeros in its row and column of the reduced matrix,
+    ties broken by species index. Without pivoting, the LU pattern
+    is the Jacobian pattern plus the fill-in created by each elimination.
+"""
+
+import heapq
+
+
+def jacobian_pattern(species, reactions):
+    """
+    Nonzeros of the Jacobian of the variable species
+
+    Parameters
+        (list of str) species: variable species names, defines the indices
+        (list of dict) reactions: MICM reaction entries
+
+    Returns
+        (set of tuple): (row, column) species indices, including the diagonal
+    """
+
+    index = dict((name, n) for n, name in enumerate(species))
+    pattern = set((n, n) for n in range(len(species)))
+
+    for reaction in reactions:
+        reactants = reaction.get('reactants', {})
+        products = reaction.get('products', {})
+        net = dict()
+        for name, entry in reactants.items():
+            net[name] = net.get(name, 0.0) - entry.get('qty', 1)
+        for name, entry in products.items():
+            net[name] = net.get(name, 0.0) + entry.get('yield', 1)
+        rows = [index[name] for name, coefficient in net.items()
+            if coefficient != 0.0 and name in index]
+        cols = [index[name] for name in reactants if name in index]
+        pattern.update((i, j) for i in rows for j in cols)
+
+    return pattern
+
+
+def _eliminate(pivot, row_sets, col_sets, fill=None):
+    """
+    Eliminate a pivot from the reduced matrix, adding fill-in
+
+    Parameters
+        (int) pivot: index of the pivot
+        (dict of set) row_sets, col_sets: nonzero columns of each row,
+            nonzero rows of each column, of the remaining species
+        (set) fill: collects (row, column) of the fill-in, optional
+
+    Returns
+        (set): indices whose row or column changed
+    """
+
+    lower = col_sets.pop(pivot) - {pivot}
+    upper = row_sets.pop(pivot) - {pivot}
+
+    for i in lower:
+        row_sets[i].discard(pivot)
+        new = upper - row_sets[i]
+        row_sets[i] |= new
+        for j in new:
+            col_sets[j].add(i)
+            if fill is not None:
+                fill.add((i, j))
+    for j in upper:
+        col_sets[j].discard(pivot)
+
+    return lower | upper
+
+
+def _reduced_matrix(pattern, n):
+    row_sets = dict((i, set()) for i in range(n))
+    col_sets = dict((j, set()) for j in range(n))
+    for i, j in pattern:
+        row_sets[i].add(j)
+        col_sets[j].add(i)
+    return row_sets, col_sets
+
+
+def markowitz_ordering(pattern, n):
+    """
+    Fill-reducing elimination order by the Markowitz criterion
+
+    Parameters
+        (set of tuple) pattern: (row, column) nonzeros
+        (int) n: matrix size
+
+    Returns
+        (list of int): species indices in elimination order
+    """
+
+    row_sets, col_sets = _reduced_matrix(pattern, n)
+
+    def score(i):
+        return (len(row_sets[i]) - 1) * (len(col_sets[i]) - 1)
+
+    # heap of (score, index), stale entries skipped on pop
+    scores = dict((i, score(i)) for i in range(n))
+    heap = [(s, i) for i, s in scores.items()]
+    heapq.heapify(heap)
+
+    order = list()
+    while heap:
+        s, pivot = heapq.heappop(heap)
+        if pivot not in row_sets or scores[pivot] != s:
+            continue
+        order.append(pivot)
+        for i in _eliminate(pivot, row_sets, col_sets):
+            scores[i] = score(i)
+            heapq.heappush(heap, (scores[i], i))
+
+    return order
+
+
+def symbolic_lu(pattern, n, order=None):
+    """
+    Nonzeros of the LU factors without pivoting
+
+    Parameters
+        (set of tuple) pattern: (row, column) nonzeros
+        (int) n: matrix size
+        (list of int) order: elimination order (default 0, 1, ..., n - 1)
+
+    Returns
+        (set of tuple): (row, column) nonzeros of L + U,
+            in the original indices
+    """
+
+    order = range(n) if order is None else order
+    row_sets, col_sets = _reduced_matrix(pattern, n)
+
+    fill = set()
+    for pivot in order:
+        _eliminate(pivot, row_sets, col_sets, fill)
+
+    return set(pattern) | fill
+
+
+def ordering_report(species, reactions):
+    """
+    Markowitz ordering of the variable species and its effect on fill-in
+
+    Parameters
+        (list of str) species: variable species names
+        (list of dict) reactions: MICM reaction entries
+
+    Returns
+        (list of str, dict): species in elimination order,
+            nonzeros of the 'jacobian', and of the LU factors
+            in the given order 'lu_original' and reordered 'lu_reordered'
+    """
+
+    n = len(species)
+    pattern = jacobian_pattern(species, reactions)
+    order = markowitz_ordering(pattern, n)
+
+    report = {'species': n,
+        'jacobian': len(pattern),
+        'lu_original': len(symbolic_lu(pattern, n)),
+        'lu_reordered': len(symbolic_lu(pattern, n, order))}
+
+    return [species[i] for i in order], report
@@ -0,0 +1,272 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    stoichiometry.py
+
+Usage:
+    python stoichiometry.py --micm_dir ../configs/micm --mechanism Chapman
+    python kpp_to_micm.py --stoichiometry
+    python stoichiometry.py --help
+
+Description:
+    stoichiometry.py exports the stoichiometry of a mechanism
+    (mechanism.Mechanism) as sparse matrices with one row per species
+    and one column per reaction:
+
+        reactants.npz   reactant quantity (reaction order)
+        products.npz    product yield
+        net.npz         net stoichiometry, products - reactants
+
+    Rows follow Mechanism.names, declared and undeclared species,
+    and columns follow Mechanism.reactions.
+    Each file holds one CSR matrix in the layout of scipy.sparse.save_npz
+    ('format', 'shape', 'data', 'indices', 'indptr'),
+    so scipy.sparse.load_npz reads it, plus the 'species' names
+    and 'reactions' labels. Files are written uncompressed,
+    so load_stoichiometry can memory-map the arrays in place.
+    With the net matrix N and reaction rates r, the tendencies are N r,
+    one sparse matrix-vector product (csr_matvec).
+
+    Requires NumPy.
+"""
+
+import os
+import sys
+import argparse
+import logging
+import json
+import zipfile
+
+import numpy as np
+
+from mechanism import Mechanism
+
+MATRICES = ['reactants', 'products', 'net']
+
+
+def coo_to_csr(rows, cols, values, shape):
+    """
+    CSR matrix from COO triplets, duplicates summed and zeros dropped
+
+    Parameters
+        (ndarray) rows, cols, values: COO triplets
+        (tuple of int) shape: matrix shape
+
+    Returns
+        (dict): 'format', 'shape', 'data', 'indices', 'indptr' arrays
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    # sum duplicates
+    keys = rows * shape[1] + cols
+    keys, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse.ravel(), weights=values, minlength=len(keys))
+    present = sums != 0.0
+    keys, sums = keys[present], sums[present]
+
+    rows, cols = np.divmod(keys, shape[1])
+    indptr = np.zeros(shape[0] + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+
+    return {'format': np.array(b'csr'), 'shape': np.array(shape),
+        'data': sums, 'indices': cols.astype(np.int32), 'indptr': indptr}
+
+
+def stoichiometric_matrices(mechanism):
+    """
+    Reactant, product and net stoichiometric matrices of a mechanism
+
+    Parameters
+        (Mechanism) mechanism: compact mechanism
+
+    Returns
+        (dict): 'reactants', 'products', 'net' CSR matrices, each a dict
+            of 'format', 'shape', 'data', 'indices', 'indptr' arrays
+    """
+
+    reactant_rows, reactant_cols, reactant_values = list(), list(), list()
+    product_rows, product_cols, product_values = list(), list(), list()
+
+    for r, reaction in enumerate(mechanism.reactions):
+        reactant_rows.extend(reaction.reactants)
+        reactant_cols.extend([r] * len(reaction.reactants))
+        reactant_values.extend(reaction.reactant_qty)
+        product_rows.extend(reaction.products)
+        product_cols.extend([r] * len(reaction.products))
+        product_values.extend(reaction.product_yield)
+
+    shape = (len(mechanism.names), len(mechanism.reactions))
+
+    return {'reactants': coo_to_csr(reactant_rows, reactant_cols,
+            reactant_values, shape),
+        'products': coo_to_csr(product_rows, product_cols, product_values,
+            shape),
+        'net': coo_to_csr(product_rows + reactant_rows, product_cols + reactant_cols,
+            product_values + [- value for value in reactant_values], shape)}
+
+
+def write_stoichiometry(mechanism, micm_mechanism_dir):
+    """
+    Write the stoichiometric matrices of a mechanism as uncompressed .npz
+
+    Parameters
+        (Mechanism) mechanism: compact mechanism
+        (str) micm_mechanism_dir: output directory
+
+    Returns
+        (list of str): files written
+    """
+
+    species = np.array(mechanism.names, dtype=str)
+    reactions = np.array([reaction.label or ''
+        for reaction in mechanism.reactions], dtype=str)
+
+    matrices = stoichiometric_matrices(mechanism)
+
+    files = list()
+    for name in MATRICES:
+        files.append(os.path.join(micm_mechanism_dir, name + '.npz'))
+        np.savez(files[-1], species=species, reactions=reactions,
+            **matrices[name])
+
+    return files
+
+
+def load_stoichiometry(npz_file, mmap=True):
+    """
+    Load a stoichiometric matrix written by write_stoichiometry
+
+    Parameters
+        (str) npz_file: .npz file
+        (bool) mmap: memory-map the arrays (read-only)
+            instead of reading them into memory
+
+    Returns
+        (dict): 'format', 'shape', 'data', 'indices', 'indptr',
+            'species', 'reactions' arrays
+    """
+
+    if not mmap:
+        with np.load(npz_file) as npz:
+            return dict((key, npz[key]) for key in npz.files)
+
+    arrays = dict()
+    with zipfile.ZipFile(npz_file) as archive, open(npz_file, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('%s is compressed, cannot be memory-mapped'
+                    % npz_file)
+            # local file header: 30 bytes, file name, extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+            key = info.filename[:-len('.npy')]
+            if dtype.hasobject:
+                raise ValueError('%s holds Python objects' % key)
+            order = 'F' if fortran_order else 'C'
+            if shape == () or 0 in shape:
+                # np.memmap cannot map empty or 0-d arrays
+                arrays[key] = np.frombuffer(
+                    f.read(dtype.itemsize * int(np.prod(shape))),
+                    dtype=dtype).reshape(shape, order=order)
+            else:
+                arrays[key] = np.memmap(npz_file, dtype=dtype, mode='r',
+                    offset=f.tell(), shape=shape, order=order)
+
+    return arrays
+
+
+def csr_to_coo(matrix):
+    """
+    COO triplets of a CSR matrix
+
+    Parameters
+        (dict) matrix: CSR matrix
+
+    Returns
+        (tuple of ndarray): rows, columns, values
+    """
+
+    rows = np.repeat(np.arange(len(matrix['indptr']) - 1),
+        np.diff(matrix['indptr']))
+
+    return rows, np.asarray(matrix['indices']), np.asarray(matrix['data'])
+
+
+def csr_matvec(matrix, x):
+    """
+    Sparse matrix-vector product, one segment sum per row
+    over the nonzeros of the CSR rows
+
+    Parameters
+        (dict) matrix: CSR matrix
+        (ndarray) x: vector, or array with a trailing cell axis
+
+    Returns
+        (ndarray): matrix x
+    """
+
+    indptr = np.asarray(matrix['indptr'])
+    values = np.asarray(matrix['data'])
+    x = np.asarray(x)
+    y = np.zeros((int(matrix['shape'][0]),) + x.shape[1:])
+
+    terms = values.reshape((-1,) + (1,) * (x.ndim - 1)) \
+        * x[np.asarray(matrix['indices'])]
+    present = np.flatnonzero(np.diff(indptr))
+    if len(present):
+        y[present] = np.add.reduceat(terms, indptr[present], axis=0)
+
+    return y
+
+
+if __name__ == '__main__':
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--micm_dir', type=str,
+        default=os.path.join('..', 'racm_esrl_vcp', 'micm'),
+        help='MICM config directory')
+    parser.add_argument('--mechanism', type=str,
+        default='RACM_SOA_VBS',
+        help='mechanism name')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    micm_mechanism_dir = os.path.join(args.micm_dir, args.mechanism)
+    with open(os.path.join(micm_mechanism_dir, 'species.json')) as f:
+        species_json = json.load(f)
+    with open(os.path.join(micm_mechanism_dir, 'reactions.json')) as f:
+        reactions_json = json.load(f)
+
+    """
+    Write stoichiometric matrices next to the MICM JSON
+    """
+    mechanism = Mechanism.from_json(species_json, reactions_json)
+    for npz_file in write_stoichiometry(mechanism, micm_mechanism_dir):
+        matrix = load_stoichiometry(npz_file)
+        logging.info('%s: %d x %d, %d nonzeros' % (npz_file,
+            matrix['shape'][0], matrix['shape'][1], len(matrix['data'])))
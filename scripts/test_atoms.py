@@ -0,0 +1,110 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_atoms.py
+
+Usage:
+    pytest test_atoms.py --log-cli-level=DEBUG
+"""
+
+import os
+
+import numpy as np
+
+from parse_kpp_utils import parse_formula, parse_composition
+from kpp_translate import translate
+from kpp_to_micm import kpp_config_files
+from atoms import composition_matrix, mass_balance, conservation_laws, \
+    write_conservation
+
+kpp_dir = os.path.join(os.path.dirname(__file__), '..', 'configs', 'kpp')
+
+kpp_str = """
+#ATOMS N; O;
+#CHECK O; N;
+#DEFVAR
+O   = O;
+O3  = O + O + O;
+NO  = N + O;
+NO2 = N + 2O;
+N2O4 = 2N + 4O;
+#DEFFIX
+M   = IGNORE;
+O2  = O + O;
+#EQUATIONS
+<R1> O2 + hv = 2O : (2.643E-10) * SUN;
+<R2> O + O2 + M = O3 + M : (8.018E-17);
+<R3> O3 + NO = NO2 + O2 : ARR_ac(3.0e-12, -1500.0);
+<R4> NO2 + hv = NO + O : (1.0e-2) * SUN;
+<R5> NO2 + NO2 = N2O4 : (1.0e-12);
+<R6> NO + NO = NO2 : (1.0e-12);
+"""
+
+
+def test_parse_formula():
+
+    assert parse_formula('O') == {'O': 1}
+    assert parse_formula('C5H8') == {'C': 5, 'H': 8}
+    assert parse_formula('HC(O)C(CH3)=CHCOOH') \
+        == {'C': 5, 'H': 6, 'O': 3}
+    assert parse_formula('N2O5') == {'N': 2, 'O': 5}
+    assert parse_formula('M') is None
+    assert parse_formula('C(H') is None
+
+
+def test_parse_composition():
+
+    assert parse_composition('O + O + O') == {'O': 3}
+    assert parse_composition('N + 2O') == {'N': 1, 'O': 2}
+    assert parse_composition('2H + 2O') == {'H': 2, 'O': 2}
+    assert parse_composition('IGNORE') is None
+    assert parse_composition('') is None
+
+
+def test_mass_balance():
+
+    mechanism = translate(kpp_str)
+    assert mechanism.checks == ['O', 'N']
+    assert mechanism.composition['M'] is None
+
+    atoms, matrix, known = composition_matrix(mechanism)
+    assert atoms == ['N', 'O']
+    assert matrix[1, mechanism.index['N2O4']] == 4
+    assert not known[mechanism.index['M']]
+
+    balance = mass_balance(mechanism)
+    assert balance['atoms'] == ['O', 'N']
+    assert bool(balance['checked'].all())
+    # R6 loses one N
+    assert balance['unbalanced'] == [(5, 'R6', {'N': -1.0})]
+    # repeated reactants sum, NO + NO is 2 NO
+    assert list(mechanism.reactions[5].reactant_qty) == [2.0]
+
+    laws = conservation_laws(translate(kpp_str.replace(
+        '<R6> NO + NO = NO2', '<R6> NO + NO = N2O4 + O3')))
+    # O2 is constant, only N is conserved among the variable species
+    assert laws['atoms'] == ['N']
+    assert len(laws['redundant']) == 1
+
+
+def test_mass_balance_configs(tmp_path):
+
+    mechanism = translate(kpp_config_files(kpp_dir, 'small_strato'),
+        name='small_strato')
+    balance = mass_balance(mechanism)
+    assert balance['atoms'] == ['O', 'N']
+    assert balance['unbalanced'] == []
+
+    files, _ = write_conservation(mechanism, str(tmp_path))
+    composition = np.load(files[0])
+    assert list(composition['species']) == mechanism.names
+    conservation = np.load(files[1])
+    assert list(conservation['atoms']) == ['N']
+    assert list(conservation['redundant']) == ['NO']
+
+    mechanism = translate(kpp_config_files(kpp_dir, 'test'), name='test')
+    labels = [label for _, label, _ in mass_balance(mechanism)['unbalanced']]
+    assert 'R13_first_term' in labels
@@ -0,0 +1,64 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_batch_kpp_to_micm.py
+
+Usage:
+    pytest test_batch_kpp_to_micm.py --log-cli-level=DEBUG
+"""
+
+import os
+import json
+
+from batch_kpp_to_micm import glob_mechanisms, read_manifest, \
+    batch_kpp_to_micm, summary
+
+kpp_dir = os.path.join(os.path.dirname(__file__), '..', 'configs', 'kpp')
+
+
+def test_batch_kpp_to_micm(tmp_path):
+
+    jobs = glob_mechanisms(os.path.join(kpp_dir, '*.eqn'), str(tmp_path))
+    jobs.append({'kpp_dir': kpp_dir, 'kpp_name': 'missing',
+        'micm_dir': str(tmp_path), 'mechanism': 'missing'})
+
+    results = batch_kpp_to_micm(jobs, max_workers=2)
+
+    assert [result['mechanism'] for result in results] \
+        == [job['mechanism'] for job in jobs]
+
+    chapman = results[[job['kpp_name'] for job in jobs].index('chapman')]
+    assert chapman['status'] == 'ok'
+    assert chapman['reactions'] == 7
+    with open(tmp_path / 'chapman' / 'reactions.json', 'r') as f:
+        reactions = json.load(f)
+    assert len(reactions['camp-data'][0]['reactions']) == 7
+
+    # a mechanism without config files writes nothing
+    assert results[-1]['status'] == 'error'
+    assert 'no KPP config files missing' in results[-1]['error']
+    assert results[-1]['reactions'] == 0
+    assert not os.path.exists(tmp_path / 'missing')
+
+    assert 'chapman' in summary(results, 1.0)
+
+
+def test_read_manifest(tmp_path):
+
+    manifest_file = tmp_path / 'mechanisms.json'
+    with open(manifest_file, 'w') as f:
+        json.dump([{'kpp_dir': 'kpp', 'kpp_name': 'chapman'},
+                   {'kpp_dir': 'kpp', 'kpp_name': 'test',
+                    'micm_dir': 'out', 'mechanism': 'TEST'}], f)
+
+    jobs = read_manifest(str(manifest_file), 'micm')
+
+    assert jobs[0]['kpp_dir'] == str(tmp_path / 'kpp')
+    # the default is not relative to the manifest
+    assert jobs[0]['micm_dir'] == 'micm'
+    assert jobs[0]['mechanism'] == 'chapman'
+    assert jobs[1]['micm_dir'] == str(tmp_path / 'out')
+    assert jobs[1]['mechanism'] == 'TEST'
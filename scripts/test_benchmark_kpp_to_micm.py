@@ -0,0 +1,89 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_benchmark_kpp_to_micm.py
+
+Usage:
+    pytest test_benchmark_kpp_to_micm.py --log-cli-level=DEBUG
+"""
+
+import io
+import json
+
+from benchmark_kpp_to_micm import STAGES, OUTPUT_MODES, synthetic_mechanism, \
+    write_synthetic_mechanism, benchmark_translation, compare_baseline, \
+    write_output, benchmark_output
+from kpp_to_micm import split_by_section, micm_equation_json
+
+
+def test_synthetic_mechanism():
+
+    spc, eqn = synthetic_mechanism(20, 200, mix={'photolysis': 1.0,
+        'arrhenius': 1.0, 'troe': 1.0, 'troee': 1.0, 'k45': 1.0, 'k57': 1.0,
+        'constant': 1.0}, seed=1)
+    assert (spc, eqn) == synthetic_mechanism(20, 200, mix={'photolysis': 1.0,
+        'arrhenius': 1.0, 'troe': 1.0, 'troee': 1.0, 'k45': 1.0, 'k57': 1.0,
+        'constant': 1.0}, seed=1)
+
+    sections = split_by_section(spc.splitlines(True) + eqn.splitlines(True))
+    assert len(sections['#DEFVAR']) == 20
+    assert len(sections['#DEFFIX']) == 2
+
+    equations = micm_equation_json(sections['#EQUATIONS'])
+    types = set(equation['type'] for equation in equations)
+    assert types == {'PHOTOLYSIS', 'ARRHENIUS', 'TROE',
+        'TERNARY_CHEMICAL_ACTIVATION'}
+    # k45 and k57 are each two MICM reactions
+    n_special = eqn.count('k45(') + eqn.count('k57(')
+    assert n_special > 0
+    assert len(equations) == 200 + n_special
+
+    _, eqn = synthetic_mechanism(20, 50, mix={'troe': 1.0})
+    assert eqn.count('TROE(') == 50
+
+
+def test_benchmark_translation(tmp_path):
+
+    write_synthetic_mechanism(str(tmp_path), 'synthetic', 30, 100)
+
+    result = benchmark_translation(str(tmp_path), 'synthetic', repeat=1)
+    assert result['species'] == 32
+    assert result['reactions'] >= 100
+    assert sorted(result['stages']) == sorted(STAGES)
+
+    slower = {'stages': dict((stage, 2.0 * seconds + 1.0)
+        for stage, seconds in result['stages'].items()),
+        'total': 2.0 * result['total'] + 1.0}
+    comparisons = compare_baseline({'synthetic': slower},
+        {'synthetic': result, 'other': result})
+    assert len(comparisons) == len(STAGES) + 1
+    assert all(comparison['regression'] for comparison in comparisons)
+    assert not any(comparison['regression'] for comparison
+        in compare_baseline({'synthetic': result}, {'synthetic': slower}))
+
+
+def test_output_modes(tmp_path):
+
+    write_synthetic_mechanism(str(tmp_path), 'synthetic', 10, 40)
+    species_json = {'camp-data': [{'name': 'A', 'type': 'CHEM_SPEC'}]}
+    equations_json = [{'type': 'ARRHENIUS', 'A': 1.0,
+        'reactants': {'A': {'qty': 1}}, 'products': {}, 'MUSICA name': 'R1'}]
+
+    documents = dict()
+    for mode in OUTPUT_MODES:
+        f_species, f_reactions = io.StringIO(), io.StringIO()
+        write_output(mode, f_species, f_reactions, species_json, 'synthetic',
+            equations_json)
+        documents[mode] = (f_species.getvalue(), f_reactions.getvalue())
+        assert json.loads(documents[mode][0]) == species_json
+        assert json.loads(documents[mode][1])['camp-data'][0]['reactions'] \
+            == equations_json
+    assert documents['pretty_twice'] == documents['streamed']
+    assert '\n' not in documents['compact'][1]
+
+    output = benchmark_output(str(tmp_path), 'synthetic', repeat=1)
+    assert output['compact']['bytes'] < output['streamed']['bytes'] \
+        == output['pretty_twice']['bytes']
@@ -0,0 +1,143 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_box_model.py
+
+Usage:
+    pytest test_box_model.py --log-cli-level=DEBUG
+"""
+
+import numpy as np
+
+from box_model import TABLEAUS, compile_mechanism, full_state, forcing, \
+    jacobian, lu_decompose, lu_solve, rosenbrock, rosenbrock_cells
+
+
+def species_json(variable, constant=()):
+    return {'camp-data':
+        [{'name': name, 'type': 'CHEM_SPEC'} for name in variable]
+        + [{'name': name, 'type': 'CHEM_SPEC', 'tracer type': 'CONSTANT'}
+           for name in constant]}
+
+
+def test_jacobian():
+
+    reactions = [
+        {'type': 'ARRHENIUS', 'A': 2.0,
+         'reactants': {'A': {'qty': 2.0}}, 'products': {'B': {'yield': 1.0}}},
+        {'type': 'ARRHENIUS', 'A': 3.0,
+         'reactants': {'A': {}, 'B': {}, 'M': {}},
+         'products': {'C': {'yield': 0.5}, 'A': {}}},
+        {'type': 'ARRHENIUS', 'A': 0.7,
+         'reactants': {'C': {}}, 'products': {'B': {'yield': 2.0}}},
+        {'type': 'ARRHENIUS', 'A': 1.0e-3,
+         'reactants': {}, 'products': {'C': {}}}]
+
+    mechanism = compile_mechanism(species_json(['A', 'B', 'C'], ['M']),
+        reactions)
+    rate_constants = np.array([2.0, 3.0, 0.7, 1.0e-3])
+    constants = np.array([1.5])
+    y = np.array([0.3, 0.8, 0.1])
+
+    f = forcing(mechanism, rate_constants, full_state(y, constants))
+    assert np.allclose(f, [-2.0 * 2.0 * 0.3**2,
+        2.0 * 0.3**2 - 3.0 * 0.3 * 0.8 * 1.5 - 0.7 * 0.1 * -2.0,
+        0.5 * 3.0 * 0.3 * 0.8 * 1.5 - 0.7 * 0.1 + 1.0e-3])
+
+    values = jacobian(mechanism, rate_constants, full_state(y, constants))
+    J = np.zeros((3, 3))
+    J[mechanism['jac_rows'], mechanism['jac_cols']] = values
+
+    eps = 1.0e-7
+    for j in range(3):
+        dy = np.zeros(3)
+        dy[j] = eps
+        column = (forcing(mechanism, rate_constants, full_state(y + dy, constants))
+            - forcing(mechanism, rate_constants, full_state(y - dy, constants))) \
+            / (2.0 * eps)
+        assert np.allclose(J[:, j], column, rtol=1.0e-6, atol=1.0e-9)
+
+
+def test_rosenbrock():
+
+    # stiff A -> B -> C with analytic solution
+    k1, k2 = 1.0e4, 0.1
+    reactions = [
+        {'type': 'ARRHENIUS', 'A': k1,
+         'reactants': {'A': {}}, 'products': {'B': {}}},
+        {'type': 'ARRHENIUS', 'A': k2,
+         'reactants': {'B': {}}, 'products': {'C': {}}}]
+    mechanism = compile_mechanism(species_json(['A', 'B', 'C']), reactions)
+
+    t = 10.0
+    B = k1 / (k2 - k1) * (np.exp(-k1 * t) - np.exp(-k2 * t))
+    expected = np.array([np.exp(-k1 * t), B, 1.0 - np.exp(-k1 * t) - B])
+
+    for method in TABLEAUS:
+        y, stats = rosenbrock(mechanism, np.array([k1, k2]),
+            np.array([1.0, 0.0, 0.0]), np.array([]), t, method=method,
+            relative_tolerance=1.0e-5, absolute_tolerance=1.0e-10)
+        assert np.allclose(y, expected, rtol=1.0e-3, atol=1.0e-8), method
+        assert stats['accepted'] + stats['rejected'] == stats['decompositions']
+
+
+def test_rosenbrock_cells():
+
+    reactions = [
+        {'type': 'ARRHENIUS', 'A': 1.0e-2,
+         'reactants': {'A': {}, 'M': {}}, 'products': {'B': {}}},
+        {'type': 'ARRHENIUS', 'A': 5.0,
+         'reactants': {'B': {'qty': 2.0}}, 'products': {'A': {}, 'C': {}}}]
+    mechanism = compile_mechanism(species_json(['A', 'B', 'C'], ['M']),
+        reactions)
+
+    n_cells = 5
+    rate_constants = np.outer(np.linspace(1.0, 3.0, n_cells), [1.0e-2, 5.0])
+    y = np.tile([1.0, 0.0, 0.0], (n_cells, 1))
+    constants = np.full((n_cells, 1), 10.0)
+
+    single = np.array([rosenbrock(mechanism, rate_constants[n], y[n],
+        constants[n], 20.0)[0] for n in range(n_cells)])
+
+    y_end, stats = rosenbrock_cells(mechanism, rate_constants, y, constants,
+        20.0, block_size=1)
+    assert np.array_equal(y_end, single)
+    assert stats['blocks'] == n_cells
+
+    y_end, stats = rosenbrock_cells(mechanism, rate_constants, y, constants,
+        20.0, block_size=2)
+    assert np.allclose(y_end, single, rtol=1.0e-3, atol=1.0e-8)
+    assert stats['blocks'] == 3
+
+
+def test_lu_solve():
+
+    rng = np.random.default_rng(1)
+    species = ['H', 'L1', 'L2', 'L3', 'L4']
+    reactions = [{'type': 'ARRHENIUS', 'A': 1.0,
+        'reactants': {'H': {}, name: {}}, 'products': {}}
+        for name in species[1:]]
+
+    for reorder in [True, False]:
+        mechanism = compile_mechanism(species_json(species), reactions,
+            reorder=reorder)
+        n_lu = len(mechanism['lu_pattern'])
+        assert n_lu == (13 if reorder else 25)
+
+        # diagonally dominant matrix on the Jacobian pattern, 3 cells
+        values = np.zeros((n_lu, 3))
+        values[mechanism['jac_lu']] = rng.uniform(-1.0, 1.0,
+            (len(mechanism['jac_lu']), 3))
+        values[mechanism['lu_diagonal']] += 10.0
+        b = rng.uniform(size=(5, 3))
+
+        lu = lu_decompose(mechanism['lu_program'], values)
+        x = lu_solve(mechanism['lu_program'], lu, b)
+        for cell in range(3):
+            A = np.zeros((5, 5))
+            for (i, j), value in zip(mechanism['lu_pattern'], values[:, cell]):
+                A[i, j] = value
+            assert np.allclose(A @ x[:, cell], b[:, cell])
@@ -0,0 +1,60 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_codegen.py
+
+Usage:
+    pytest test_codegen.py --log-cli-level=DEBUG
+"""
+
+import os
+
+import numpy as np
+
+from box_model import compile_mechanism, full_state, forcing, jacobian, \
+    rosenbrock
+from codegen import load_kernels
+
+
+def test_load_kernels(tmp_path):
+
+    species_json = {'camp-data':
+        [{'name': name, 'type': 'CHEM_SPEC'} for name in ['A', 'B', 'C']]
+        + [{'name': 'M', 'type': 'CHEM_SPEC', 'tracer type': 'CONSTANT'}]}
+    reactions = [
+        {'type': 'ARRHENIUS', 'A': 2.0,
+         'reactants': {'A': {'qty': 2.0}}, 'products': {'B': {'yield': 1.0}}},
+        {'type': 'ARRHENIUS', 'A': 3.0,
+         'reactants': {'A': {}, 'B': {}, 'M': {}},
+         'products': {'C': {'yield': 0.5}, 'A': {}}},
+        {'type': 'ARRHENIUS', 'A': 0.7,
+         'reactants': {'C': {}}, 'products': {'B': {'yield': 2.0}}},
+        {'type': 'ARRHENIUS', 'A': 1.0e-3,
+         'reactants': {}, 'products': {'C': {}}}]
+    mechanism = compile_mechanism(species_json, reactions)
+
+    kernels = load_kernels(mechanism, str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+    assert load_kernels(mechanism, str(tmp_path)).__file__ == kernels.__file__
+
+    rng = np.random.default_rng(0)
+    rates = np.array([2.0, 3.0, 0.7, 1.0e-3])
+    for shape in [tuple(), (5,)]:
+        state = full_state(rng.uniform(size=(3,) + shape),
+            rng.uniform(size=(1,) + shape))
+        rate_constants = rates.reshape((4,) + (1,) * len(shape)) \
+            * np.ones((4,) + shape)
+        f = kernels.forcing(rate_constants, state, np.empty((3,) + shape))
+        jac = kernels.jacobian(rate_constants, state,
+            np.empty((kernels.N_JACOBIAN,) + shape))
+        assert np.allclose(f, forcing(mechanism, rate_constants, state))
+        assert np.allclose(jac, jacobian(mechanism, rate_constants, state))
+
+    y, constants = np.array([1.0, 0.0, 0.0]), np.array([2.0])
+    y_generic, _ = rosenbrock(mechanism, rates, y, constants, 10.0)
+    y_kernels, _ = rosenbrock(mechanism, rates, y, constants, 10.0,
+        kernels=kernels)
+    assert np.allclose(y_generic, y_kernels, rtol=1.0e-12)
@@ -0,0 +1,50 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_initial_conditions.py
+
+Usage:
+    pytest test_initial_conditions.py --log-cli-level=DEBUG
+"""
+
+import os
+import json
+
+import numpy as np
+
+from box_model import rosenbrock
+from initial_conditions import read_initial_conditions, initial_conditions
+
+root_dir = os.path.join(os.path.dirname(__file__), '..')
+
+
+def test_initial_conditions():
+
+    conditions = read_initial_conditions(os.path.join(root_dir,
+        'racm_esrl_vcp', 'micm', 'RACM_SOA_VBS', 'initial_conditions.csv'))
+    assert conditions['CONC'] == {'O2': 0.75, 'O3': 8.0e-6}
+    assert conditions['ENV']['temperature'] == 210.0
+    assert conditions['PHOTO']['R3'] == 1.0e-6
+
+    micm_dir = os.path.join(root_dir, 'configs', 'micm', 'Chapman')
+    with open(os.path.join(micm_dir, 'species.json'), 'r') as f:
+        species_json = json.load(f)
+    with open(os.path.join(micm_dir, 'reactions.json'), 'r') as f:
+        reactions_json = json.load(f)
+
+    mechanism, rate_constants, y, constants \
+        = initial_conditions(species_json, reactions_json, conditions)
+    species = mechanism['species']
+    assert constants.tolist() == [3.6, 0.75]
+    assert species[mechanism['n_variable']:] == ['M', 'O2']
+
+    y_end, stats = rosenbrock(mechanism, rate_constants, y, constants,
+        conditions['ENV']['time_step'])
+    assert stats['accepted'] > 0
+    assert np.all(np.isfinite(y_end))
+    # odd oxygen O + O3 + O1D is produced by O2 photolysis only
+    odd_oxygen = [species.index(name) for name in ['O', 'O1D', 'O3']]
+    assert y_end[odd_oxygen].sum() > y[odd_oxygen].sum()
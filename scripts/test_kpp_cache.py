@@ -0,0 +1,90 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_kpp_cache.py
+
+Usage:
+    pytest test_kpp_cache.py --log-cli-level=DEBUG
+"""
+
+import os
+import json
+import shutil
+
+from kpp_cache import TranslationCache, EquationMemo
+from kpp_metrics import TranslationMetrics
+from kpp_to_micm import cached_kpp_to_micm
+
+kpp_dir = os.path.join(os.path.dirname(__file__), '..', 'configs', 'kpp')
+
+
+def test_cached_kpp_to_micm(tmp_path):
+
+    for suffix in ['.spc', '.eqn']:
+        shutil.copy(os.path.join(kpp_dir, 'chapman' + suffix), tmp_path)
+    micm_mechanism_dir = tmp_path / 'Chapman'
+    os.mkdir(micm_mechanism_dir)
+    cache = TranslationCache(str(tmp_path / 'cache'))
+
+    n_species, n_equations, skipped = cached_kpp_to_micm(str(tmp_path),
+        'chapman', str(micm_mechanism_dir), 'Chapman', cache)
+    assert (n_species, n_equations, skipped) == (5, 7, False)
+
+    n_species, n_equations, skipped = cached_kpp_to_micm(str(tmp_path),
+        'chapman', str(micm_mechanism_dir), 'Chapman', cache)
+    assert (n_species, n_equations, skipped) == (5, 7, True)
+
+    # change one equation, the others are reused
+    with open(tmp_path / 'chapman.eqn', 'r') as f:
+        eqn = f.read()
+    with open(tmp_path / 'chapman.eqn', 'w') as f:
+        f.write(eqn.replace('(8.018E-17)', '(9.0E-17)'))
+
+    metrics = TranslationMetrics()
+    n_species, n_equations, skipped = cached_kpp_to_micm(str(tmp_path),
+        'chapman', str(micm_mechanism_dir), 'Chapman', cache, metrics=metrics)
+    assert skipped == False
+    # reused equations count their rate types too
+    assert metrics.counters['equations_reused'] == 6
+    assert metrics.rate_types == {'PHOTOLYSIS': 3, 'default_arrhenius': 4}
+    with open(micm_mechanism_dir / 'reactions.json', 'r') as f:
+        reactions = json.load(f)['camp-data'][0]['reactions']
+    assert reactions[1]['A'] == 9.0e-17
+    assert len(cache.load(str(micm_mechanism_dir))['equations']) == 7
+
+    # removing an output forces translation
+    os.remove(micm_mechanism_dir / 'species.json')
+    _, _, skipped = cached_kpp_to_micm(str(tmp_path),
+        'chapman', str(micm_mechanism_dir), 'Chapman', cache)
+    assert skipped == False
+    assert os.path.exists(micm_mechanism_dir / 'species.json')
+
+
+def test_equation_memo():
+
+    memo = EquationMemo({'a': [{'A': 1.0}], 'b': [{'A': 2.0}]})
+    assert memo.get('a') == [{'A': 1.0}]
+    assert memo.get('c') is None
+    memo['c'] = [{'A': 3.0}]
+    assert memo.get('c') == [{'A': 3.0}]
+    assert (memo.hits, memo.misses) == (2, 1)
+    assert sorted(memo.current) == ['a', 'c']
+
+
+def test_translation_cache_eviction(tmp_path):
+
+    cache = TranslationCache(str(tmp_path), max_bytes=3500)
+    for name in ['a', 'b', 'c']:
+        cache.save(name, {'data': 'x' * 1000})
+        os.utime(cache.entry_file(name), ns=(0, {'a': 1, 'b': 2, 'c': 3}[name]))
+    # a is now the most recently used
+    cache.load('a')
+    cache.save('d', {'data': 'x' * 1000})
+
+    assert cache.load('b') is None
+    assert cache.load('a') is not None
+    assert cache.load('c') is not None
+    assert cache.load('d') is not None
@@ -0,0 +1,145 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_kpp_include.py
+
+Usage:
+    pytest test_kpp_include.py --log-cli-level=DEBUG
+"""
+
+import os
+import shutil
+
+import pytest
+
+from kpp_lexer import SPECIES
+from kpp_include import IncludeCache, shared_include_cache
+from kpp_translate import translate
+from kpp_metrics import TranslationMetrics
+from kpp_cache import TranslationCache
+from kpp_to_micm import kpp_config_files, kpp_dependency_files, \
+    cached_kpp_to_micm
+
+kpp_dir = os.path.join(os.path.dirname(__file__), '..', 'configs', 'kpp')
+
+
+def test_dependencies():
+
+    cache = IncludeCache()
+    root = os.path.join(kpp_dir, 'small_strato.def')
+
+    files = [os.path.basename(f) for f in cache.dependencies([root])]
+    assert files == ['atoms.kpp', 'small_strato.spc', 'small_strato.eqn',
+        'small_strato.def']
+
+    graph = cache.graph([root])
+    assert [os.path.basename(f) for f in graph[os.path.abspath(root)]] \
+        == ['small_strato.spc', 'small_strato.eqn']
+
+    species = [token.value.name for token in cache.iter_tokens([root])
+        if token.kind == SPECIES]
+    assert species[:3] == ['O', 'O1D', 'O3']
+    assert len(species) == len(set(species))
+
+
+def test_shared_parse():
+
+    cache = IncludeCache()
+    chapman = cache.roots(kpp_config_files(kpp_dir, 'chapman'))
+    strato = cache.roots(kpp_config_files(kpp_dir, 'small_strato'))
+    assert [os.path.basename(f) for f in strato] == ['small_strato.def']
+
+    misses = cache.misses
+    cache.dependencies(chapman)
+    cache.dependencies(strato)
+    # atoms.kpp and every other file tokenized once
+    assert cache.misses == misses
+    assert cache.misses == len(cache.files)
+
+
+def test_read_stage(tmp_path):
+
+    for name in ['atoms.kpp', 'small_strato.def', 'small_strato.spc',
+        'small_strato.eqn']:
+        shutil.copy(os.path.join(kpp_dir, name), tmp_path)
+
+    # listing the files reads none, includes are resolved by translate
+    misses = shared_include_cache.misses
+    files = kpp_config_files(str(tmp_path), 'small_strato')
+    assert len(files) == 3
+    assert shared_include_cache.misses == misses
+
+    metrics = TranslationMetrics()
+    mechanism = translate(files, metrics=metrics)
+    assert shared_include_cache.misses == misses + 4
+    assert len(mechanism.species_names()) \
+        == len(set(mechanism.species_names()))
+
+
+def test_large_files(tmp_path):
+
+    root = os.path.join(kpp_dir, 'small_strato.def')
+    tokens = list(IncludeCache().iter_tokens([root]))
+
+    # files too large to cache are read again, with the same tokens
+    cache = IncludeCache(max_cached_size=0)
+    assert list(cache.iter_tokens([root])) == tokens
+    assert list(cache.iter_tokens([root])) == tokens
+    assert all(parsed.tokens is None for parsed in cache.files.values())
+    assert [os.path.basename(f) for f in cache.dependencies([root])] \
+        == ['atoms.kpp', 'small_strato.spc', 'small_strato.eqn',
+        'small_strato.def']
+    assert cache.misses == 4
+
+
+def test_include_changes(tmp_path):
+
+    for name in ['atoms.kpp', 'chapman.spc', 'chapman.eqn']:
+        shutil.copy(os.path.join(kpp_dir, name), tmp_path)
+    cache = IncludeCache()
+
+    files = cache.dependencies([tmp_path / 'chapman.spc'])
+    assert [os.path.basename(f) for f in files] \
+        == ['atoms.kpp', 'chapman.spc']
+    assert cache.misses == 2
+
+    # only the changed file is tokenized again
+    with open(tmp_path / 'atoms.kpp', 'a') as f:
+        f.write('Xx { 0 Test };\n')
+    cache.dependencies([tmp_path / 'chapman.spc'])
+    assert (cache.misses, cache.hits) == (3, 1)
+
+    with open(tmp_path / 'atoms.kpp', 'w') as f:
+        f.write('#INCLUDE chapman.spc\n')
+    with pytest.raises(ValueError):
+        cache.dependencies([tmp_path / 'chapman.spc'])
+
+
+def test_cached_include(tmp_path):
+
+    for name in ['atoms.kpp', 'chapman.spc', 'chapman.eqn']:
+        shutil.copy(os.path.join(kpp_dir, name), tmp_path)
+    micm_mechanism_dir = tmp_path / 'Chapman'
+    os.mkdir(micm_mechanism_dir)
+    cache = TranslationCache(str(tmp_path / 'cache'))
+
+    assert [os.path.basename(f) for f in
+        kpp_dependency_files(str(tmp_path), 'chapman')] \
+        == ['atoms.kpp', 'chapman.spc', 'chapman.eqn']
+
+    _, _, skipped = cached_kpp_to_micm(str(tmp_path), 'chapman',
+        str(micm_mechanism_dir), 'Chapman', cache)
+    assert skipped == False
+    _, _, skipped = cached_kpp_to_micm(str(tmp_path), 'chapman',
+        str(micm_mechanism_dir), 'Chapman', cache)
+    assert skipped == True
+
+    # a changed included file rebuilds the mechanism
+    with open(tmp_path / 'atoms.kpp', 'a') as f:
+        f.write('Xx { 0 Test };\n')
+    _, _, skipped = cached_kpp_to_micm(str(tmp_path), 'chapman',
+        str(micm_mechanism_dir), 'Chapman', cache)
+    assert skipped == False
@@ -0,0 +1,75 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_kpp_lexer.py
+
+Usage:
+    pytest test_kpp_lexer.py --log-cli-level=DEBUG
+"""
+
+from kpp_lexer import tokenize, \
+    SECTION, SPECIES, EQUATION, LABEL, COMMENT, INLINE, STATEMENT
+
+
+def test_tokenize_species():
+    lines = ['#INCLUDE atoms.kpp\n',
+             '#DEFVAR\n',
+             'O3  = O + O + O;     { Ozone }\n',
+             'NO  = N + O;\n',
+             '#DEFFIX\n',
+             '{ N2 = N + N ; }\n',
+             'M   = IGNORE ;\n']
+    tokens = list(tokenize(lines))
+    kinds = [token.kind for token in tokens]
+    assert kinds == [SECTION, SECTION, SPECIES, COMMENT, SPECIES,
+                     SECTION, COMMENT, SPECIES]
+    assert tokens[0].value.name == '#INCLUDE'
+    assert tokens[0].value.argument == 'atoms.kpp'
+    assert tokens[2].value.name == 'O3'
+    assert tokens[2].value.composition == 'O + O + O'
+    assert tokens[2].section == '#DEFVAR'
+    assert tokens[2].line == 3
+    assert tokens[7].value.name == 'M'
+    assert tokens[7].section == '#DEFFIX'
+
+
+def test_tokenize_equations():
+    lines = ['#EQUATIONS { Test # Mechanism }\n',
+             '<R1>  O2   + hv = 2O          : (2.643E-10) * SUN*SUN*SUN;\n',
+             ' {026:001} O3P+M{O2}=O3  : (C_M *6.00D-34) ;\n',
+             '<R3> O + O3 =\n',
+             '     2O2 : (1.576E-15);\n']
+    tokens = [token for token in tokenize(lines) if token.kind != COMMENT]
+    kinds = [token.kind for token in tokens]
+    assert kinds == [SECTION, LABEL, EQUATION, LABEL, EQUATION,
+                     LABEL, EQUATION]
+    assert tokens[1].value == 'R1'
+    assert tokens[2].value.reactants == ['O2', 'hv']
+    assert tokens[2].value.products == ['2O']
+    assert tokens[2].value.rate == '(2.643E-10) * SUN*SUN*SUN'
+    assert tokens[3].value == '026:001'
+    assert tokens[4].value.reactants == ['O3P', 'M']
+    assert tokens[4].value.products == ['O3']
+    assert tokens[6].value.products == ['2O2']
+    assert tokens[6].line == 4
+
+
+def test_tokenize_inline_and_statements():
+    lines = ['// header comment ;\n',
+             '#CHECK O; N;\n',
+             '#INLINE F90_INIT\n',
+             '  TSTART = (12*3600) ! #DEFVAR\n',
+             '#ENDINLINE\n',
+             '#ATOMS\n',
+             'H  {   1 Hydrogen      };\n']
+    tokens = list(tokenize(lines))
+    kinds = [token.kind for token in tokens]
+    assert kinds == [COMMENT, SECTION, STATEMENT, STATEMENT,
+                     INLINE, SECTION, COMMENT, STATEMENT]
+    assert tokens[4].value.type == 'F90_INIT'
+    assert '#DEFVAR' in tokens[4].value.code
+    assert tokens[7].value == 'H'
+    assert tokens[7].section == '#ATOMS'
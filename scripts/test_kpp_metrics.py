@@ -0,0 +1,65 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_kpp_metrics.py
+
+Usage:
+    pytest test_kpp_metrics.py --log-cli-level=DEBUG
+"""
+
+import os
+import json
+
+from kpp_metrics import TranslationMetrics, timed
+from kpp_to_micm import iter_kpp_config, split_by_section, \
+    micm_equation_json, stream_kpp_to_micm
+
+kpp_dir = os.path.join(os.path.dirname(__file__), '..', 'configs', 'kpp')
+
+
+def test_rate_types():
+
+    lines = ['#EQUATIONS\n',
+        '<R1> O3 + hv = O + O2 : j(Pj_o33p) ;\n',
+        '<R2> O + O2 = O3 : ARR2( 5.6D-34 , -2.6_dp, TEMP ) ;\n',
+        '<R3> O + NO2 = NO3 : TROE( 2.5D-31 , 1.8_dp , 2.2D-11 , 0.7_dp , TEMP, C_M) ;\n',
+        '<R4> HO + HNO3 = NO3 : k45(TEMP,C_M) ;\n',
+        '<R5> O1D + O3 = O2 : 1.2D-10 ;\n',
+        '<R6> O1D + M = O : 2.0D-11 * EXP(100.0 / TEMP) ;\n',
+        '<R7> NO + NO3 = 2NO2 : KMT04 ;\n']
+
+    metrics = TranslationMetrics()
+    with timed(metrics, 'equations'):
+        equations = micm_equation_json(
+            split_by_section(lines)['#EQUATIONS'], metrics=metrics)
+
+    report = metrics.report()
+    assert report['rate_types'] == {'PHOTOLYSIS': 1, 'ARR': 1, 'TROE': 1,
+        'k45': 1, 'default_arrhenius': 1, 'expression': 1,
+        'default_arrhenius_unparsed': 1}
+    assert report['counters'] == {'equations': 7, 'reactions': 8}
+    assert len(equations) == 8
+    assert report['total'] == report['stages']['equations'] > 0.0
+
+    with timed(None, 'equations'):
+        assert micm_equation_json(split_by_section(lines)['#EQUATIONS']) \
+            == equations
+
+
+def test_stream_metrics(tmp_path):
+
+    metrics = TranslationMetrics()
+    stream_kpp_to_micm(iter_kpp_config(kpp_dir, 'chapman'),
+        str(tmp_path), 'chapman', metrics=metrics)
+    metrics.write(str(tmp_path / 'metrics.json'))
+
+    with open(tmp_path / 'metrics.json', 'r') as f:
+        report = json.load(f)
+    assert sorted(report['stages']) == ['species', 'stream']
+    assert report['counters']['equations'] == 7
+    assert report['counters']['bytes_written'] \
+        == os.path.getsize(tmp_path / 'species.json') \
+        + os.path.getsize(tmp_path / 'reactions.json')
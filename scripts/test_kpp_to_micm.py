@@ -10,9 +10,14 @@ Usage:
     pytest test_kpp_to_micm.py --log-cli-level=DEBUG
 """
 
+import io
+import json
+
 from rxn_arrhenius import parse_kpp_arrhenius
 from rxn_troe import parse_kpp_troe
 from rxn_special import parse_kpp_k45, parse_kpp_k57
+from kpp_to_micm import split_by_section, micm_equation_json, \
+    write_micm_reactions_json
 
 def test_parse_kpp_arrhenius():
     """
@@ -135,3 +140,44 @@ def test_parse_kpp_57():
     assert ternary_dict['Fc']     == 0.6
     assert ternary_dict['N']      == 1.0
 
+
+def test_micm_equation_json():
+
+    lines = ['#EQUATIONS\n',
+             '<R1> O2 + hv = 2O : (2.643E-10) * SUN*SUN*SUN;\n',
+             '<R2> O + O2 = O3 : (8.018E-17);\n',
+             '<R3> OH + HNO3 = NO3 + H2O : k45(TEMP, C_M);\n']
+
+    sections = split_by_section(lines)
+    equations = micm_equation_json(sections['#EQUATIONS'])
+
+    assert len(equations) == 4
+    assert equations[0]['type'] == 'PHOTOLYSIS'
+    assert equations[0]['reactants'] == {'O2': {'qty': 1.0}}
+    assert equations[0]['products'] == {'O': {'yield': 2.0}}
+    assert equations[0]['MUSICA name'] == 'R1'
+    assert equations[1]['type'] == 'ARRHENIUS'
+    assert equations[1]['A'] == 8.018e-17
+    assert equations[2]['type'] == 'ARRHENIUS'
+    assert equations[2]['MUSICA name'] == 'R3_first_term'
+    assert equations[3]['type'] == 'TROE'
+    assert equations[3]['MUSICA name'] == 'R3_second_term'
+
+
+def test_write_micm_reactions_json():
+
+    equations = [{'type': 'ARRHENIUS', 'A': 8.018e-17,
+                  'reactants': {'O': {'qty': 1.0}, 'O2': {'qty': 1.0}},
+                  'products': {'O3': {'yield': 1.0}}, 'MUSICA name': 'R2'},
+                 {'type': 'PHOTOLYSIS', 'reactants': {'O3': {'qty': 1.0}},
+                  'products': {}, 'MUSICA name': 'R3'}]
+
+    for indent in [4, None]:
+        for reactions in [equations, []]:
+            f = io.StringIO()
+            n = write_micm_reactions_json(f, 'test', iter(reactions),
+                indent=indent)
+            assert n == len(reactions)
+            assert f.getvalue() == json.dumps({'camp-data':
+                [{'name': 'test', 'type': 'MECHANISM',
+                  'reactions': reactions}]}, indent=indent)
@@ -0,0 +1,79 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_kpp_translate.py
+
+Usage:
+    pytest test_kpp_translate.py --log-cli-level=DEBUG
+"""
+
+import os
+import io
+import json
+import logging
+
+from kpp_to_micm import kpp_config_files, iter_kpp_config, stream_kpp_to_micm
+from kpp_translate import translate, write_mechanism, dump_mechanism, \
+    species_document, reactions_document
+
+kpp_dir = os.path.join(os.path.dirname(__file__), '..', 'configs', 'kpp')
+
+
+def test_translate_sources():
+
+    files = kpp_config_files(kpp_dir, 'chapman')
+    mechanism = translate(files, name='Chapman')
+
+    assert mechanism.name == 'Chapman'
+    assert len(mechanism.reactions) == 7
+    assert mechanism.species_names(constant=True) == ['M', 'O2']
+
+    texts = list()
+    for filename in files:
+        with open(filename, 'r') as f:
+            texts.append(f.read())
+    for other in [translate(texts, name='Chapman'),
+        translate(io.StringIO(''.join(texts)), name='Chapman')]:
+        assert species_document(other) == species_document(mechanism)
+        assert reactions_document(other) == reactions_document(mechanism)
+
+    mechanism = translate('#DEFVAR\nA = IGNORE ;\n'
+        '#EQUATIONS\n<R1> A = B : 1.0D-3 ;\n')
+    assert mechanism.reactions[0].parameters() == {'A': 1.0e-3}
+
+
+def test_translate_logging():
+
+    # logging.debug and friends call logging.basicConfig without handlers
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    for handler in handlers:
+        root.removeHandler(handler)
+    try:
+        translate(kpp_config_files(kpp_dir, 'arrhenius'), reorder=True)
+        assert root.handlers == []
+    finally:
+        for handler in handlers:
+            root.addHandler(handler)
+
+
+def test_write_mechanism(tmp_path):
+
+    mechanism = translate(kpp_config_files(kpp_dir, 'small_strato'),
+        name='small_strato')
+    outputs = write_mechanism(mechanism, str(tmp_path / 'memory'))
+
+    stream_kpp_to_micm(iter_kpp_config(kpp_dir, 'small_strato'),
+        str(tmp_path), 'small_strato')
+    for output in outputs:
+        with open(output, 'r') as f, \
+            open(tmp_path / os.path.basename(output), 'r') as g:
+            assert f.read() == g.read()
+
+    f_species, f_reactions = io.StringIO(), io.StringIO()
+    dump_mechanism(mechanism, f_species, f_reactions, indent=None)
+    assert json.loads(f_species.getvalue()) == species_document(mechanism)
+    assert json.loads(f_reactions.getvalue()) == reactions_document(mechanism)
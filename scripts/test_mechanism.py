@@ -0,0 +1,71 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_mechanism.py
+
+Usage:
+    pytest test_mechanism.py --log-cli-level=DEBUG
+"""
+
+import os
+import json
+
+from mechanism import Mechanism
+
+micm_dir = os.path.join(os.path.dirname(__file__), '..', 'configs', 'micm')
+
+
+def test_mechanism():
+
+    mechanism = Mechanism('test')
+    mechanism.add_species('M', constant=True)
+    mechanism.add_species('O3')
+    mechanism.add_species('O', absolute_tolerance=1.0e-6)
+    first = mechanism.add_reaction_json({'type': 'ARRHENIUS', 'A': 6.0e-34,
+        'B': 2.4, 'reactants': {'O': {'qty': 1.0}, 'M': {'qty': 1.0}},
+        'products': {'O3': {'yield': 1.0}, 'M': {'yield': 1.0}},
+        'MUSICA name': 'R1'})
+    second = mechanism.add_reaction_json({'type': 'ARRHENIUS', 'A': 8.0e-12,
+        'B': 0.0, 'reactants': {'O3': {'qty': 1.0}},
+        'products': {'O2': {'yield': 2.0}}, 'MUSICA name': 'R2'})
+
+    # undeclared O2 is interned, not declared
+    assert mechanism.names == ['M', 'O3', 'O', 'O2']
+    assert mechanism.species_names() == ['M', 'O3', 'O']
+    assert list(first.reactants) == [2, 0]
+    assert list(second.product_yield) == [2.0]
+    assert first.parameter_names is second.parameter_names
+
+    assert mechanism.species_json() == [
+        {'name': 'M', 'type': 'CHEM_SPEC', 'tracer type': 'CONSTANT'},
+        {'name': 'O3', 'type': 'CHEM_SPEC', 'absolute tolerance': 1.0e-12},
+        {'name': 'O', 'type': 'CHEM_SPEC', 'absolute tolerance': 1.0e-6}]
+    assert list(mechanism.reaction_json(second)) \
+        == ['type', 'A', 'B', 'reactants', 'products', 'MUSICA name']
+
+    mechanism.reorder_species(['O', 'M', 'O3'])
+    assert mechanism.species_names(constant=False) == ['O', 'O3']
+    assert mechanism.species_json()[0]['absolute tolerance'] == 1.0e-6
+    assert list(first.reactants) == [2, 0]
+
+
+def test_from_json():
+
+    with open(os.path.join(micm_dir, 'Chapman', 'species.json'), 'r') as f:
+        species_json = json.load(f)
+    with open(os.path.join(micm_dir, 'Chapman', 'reactions.json'), 'r') as f:
+        reactions_json = json.load(f)
+
+    mechanism = Mechanism.from_json(species_json, reactions_json)
+    assert mechanism.species_json() == species_json['camp-data']
+
+    reactions = reactions_json['camp-data'][0]['reactions']
+    assert len(mechanism.reactions) == len(reactions)
+    for reaction, entry in zip(mechanism.iter_reactions_json(), reactions):
+        assert reaction['MUSICA name'] == entry['MUSICA name']
+        # a missing qty or yield is 1
+        assert reaction['reactants'] == dict((name, {'qty': value.get('qty', 1)})
+            for name, value in entry['reactants'].items())
@@ -69,3 +69,20 @@ def test_parse_term():
     assert x == 0.12
     assert M == 'H2O'
 
+
+def test_scan_rate_expression():
+    from parse_kpp_utils import scan_rate_expression
+    found = scan_rate_expression('(.20946D0*ARR2( 3.30D-39 , -530.0_dp, TEMP ))')
+    assert found[0] == ('ARR2', [' 3.30D-39 ', ' -530.0_dp', ' TEMP '])
+    assert found[1] == ('TEMP', None)
+    found = scan_rate_expression('j(Pj_no2)')
+    assert found == [('j', ['Pj_no2']), ('Pj_no2', None)]
+    found = scan_rate_expression('TROE(1.0, f(2.0, 3.0), C_M)')
+    assert found[0] == ('TROE', ['1.0', ' f(2.0, 3.0)', ' C_M'])
+    assert found[1] == ('f', ['2.0', ' 3.0'])
+    assert scan_rate_expression('1.0E-12_dp') == []
+
+
+def test_parse_args():
+    from parse_kpp_utils import parse_args
+    assert parse_args(['1.0D-12', ' - 300.0_dp', 'TEMP']) == [1.0e-12, -300.0]
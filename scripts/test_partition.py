@@ -0,0 +1,68 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_partition.py
+
+Usage:
+    pytest test_partition.py --log-cli-level=DEBUG
+"""
+
+import os
+import json
+
+from kpp_translate import translate
+from kpp_to_micm import kpp_config_files
+from sparsity import jacobian_pattern
+from partition import strongly_connected_components, partition, \
+    write_partition
+
+kpp_dir = os.path.join(os.path.dirname(__file__), '..', 'racm_esrl_vcp', 'kpp')
+
+
+def test_strongly_connected_components():
+
+    # 0 <-> 1 -> 2 -> 3 <-> 4, 5 isolated
+    successors = [[1], [0, 2], [3], [4], [3], []]
+    components = strongly_connected_components(successors)
+    assert sorted(components) == [[0, 1], [2], [3, 4], [5]]
+    position = dict((tuple(c), k) for k, c in enumerate(components))
+    assert position[(0, 1)] < position[(2,)] < position[(3, 4)]
+
+    # deep chain, no recursion limit
+    n = 5000
+    components = strongly_connected_components(
+        [[i + 1] for i in range(n - 1)] + [[]])
+    assert components == [[i] for i in range(n)]
+
+
+def test_partition_racm(tmp_path):
+
+    mechanism = translate(kpp_config_files(kpp_dir, 'racm_soa_vbs'),
+        name='RACM_SOA_VBS')
+    species = mechanism.species_names(constant=False)
+    reactions = list(mechanism.iter_reactions_json())
+
+    result = partition(species, reactions)
+    assert sorted(result['order']) == sorted(species)
+    assert result['largest'] == max(len(block['species'])
+        for block in result['blocks'])
+    # SOA/VBS aging chains are solved sequentially
+    assert 'CVASOA1' in result['sequential']
+
+    # block lower triangular Jacobian
+    block_of = dict()
+    for b, block in enumerate(result['blocks']):
+        for name in block['species']:
+            block_of[name] = b
+        assert all(d < b for d in block['depends_on'])
+    for i, j in jacobian_pattern(species, reactions):
+        assert block_of[species[j]] <= block_of[species[i]]
+
+    partition_file = write_partition(mechanism, str(tmp_path))
+    with open(partition_file, 'r') as f:
+        written = json.load(f)
+    assert written['order'] == result['order']
+    assert len(written['blocks']) == len(result['blocks'])
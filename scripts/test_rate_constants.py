@@ -0,0 +1,117 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_rate_constants.py
+
+Usage:
+    pytest test_rate_constants.py --log-cli-level=DEBUG
+"""
+
+import math
+
+import numpy as np
+
+from rate_constants import compile_rate_parameters, evaluate_rate_constants, \
+    RateConstantCache
+
+
+def troe(k0_A, k0_B, k0_C, kinf_A, kinf_B, kinf_C, Fc, N, T, M,
+    chemical_activation=False):
+    k0 = k0_A * math.exp(k0_C / T) * (T / 300.0)**k0_B
+    kinf = kinf_A * math.exp(kinf_C / T) * (T / 300.0)**kinf_B
+    ratio = k0 * M / kinf
+    numerator = k0 if chemical_activation else k0 * M
+    return numerator / (1.0 + ratio) \
+        * Fc**(N / (N + math.log10(ratio)**2))
+
+
+def test_evaluate_rate_constants():
+
+    reactions = [
+        {'type': 'ARRHENIUS', 'A': 1.0e-12, 'B': -2.0, 'C': -2000.0},
+        {'type': 'PHOTOLYSIS', 'MUSICA name': 'R2'},
+        {'type': 'TROE', 'k0_A': 9.0e-32, 'k0_B': -1.5,
+         'kinf_A': 3.0e-11, 'kinf_B': 0.0},
+        {'type': 'ARRHENIUS', 'A': 2.0e-13, 'D': 1.0, 'B': 1.0, 'E': 1.0e-5},
+        {'type': 'TERNARY_CHEMICAL_ACTIVATION', 'k0_A': 1.5e-13, 'k0_B': 0.6,
+         'kinf_A': 2.9e9, 'kinf_B': 6.1},
+        {'type': 'TROE', 'k0_A': 6.5e-34, 'k0_C': 1335.0,
+         'kinf_A': 2.7e-17, 'kinf_C': 2199.0, 'Fc': 1.0, 'N': 0.0},
+        {'type': 'ARRHENIUS', 'A': 0.0}]
+
+    temperature = np.array([200.0, 250.0, 300.0])
+    pressure = np.array([1.0e4, 5.0e4, 1.0e5])
+    air_density = np.array([1.0e18, 1.0e19, 2.5e19])
+
+    parameters = compile_rate_parameters(
+        {'camp-data': [{'type': 'MECHANISM', 'reactions': reactions}]})
+    rates = evaluate_rate_constants(parameters, temperature, pressure,
+        air_density, photolysis={'R2': np.array([1.0e-5, 2.0e-5, 3.0e-5])})
+
+    assert rates.shape == (3, 7)
+
+    out = np.full((8, 3), np.nan)
+    reused = evaluate_rate_constants(compile_rate_parameters(reactions
+        + [{'type': 'USER_DEFINED'}]), temperature, pressure, air_density,
+        photolysis={'R2': np.array([1.0e-5, 2.0e-5, 3.0e-5])}, out=out)
+    assert np.shares_memory(reused, out)
+    assert np.array_equal(reused[:, :7], rates) and (reused[:, 7] == 0.0).all()
+
+    for cell, (T, P, M) in enumerate(zip(temperature, pressure, air_density)):
+        expected = [
+            1.0e-12 * math.exp(-2000.0 / T) * (T / 300.0)**-2.0,
+            1.0e-5 * (cell + 1),
+            troe(9.0e-32, -1.5, 0.0, 3.0e-11, 0.0, 0.0, 0.6, 1.0, T, M),
+            2.0e-13 * T * (1.0 + 1.0e-5 * P),
+            troe(1.5e-13, 0.6, 0.0, 2.9e9, 6.1, 0.0, 0.6, 1.0, T, M,
+                 chemical_activation=True),
+            6.5e-34 * math.exp(1335.0 / T) * M
+                / (1.0 + 6.5e-34 * math.exp(1335.0 / T) * M
+                   / (2.7e-17 * math.exp(2199.0 / T))),
+            0.0]
+        assert np.allclose(rates[cell], expected, rtol=1.0e-12, atol=0.0)
+
+
+def test_rate_constant_cache():
+
+    reactions = [
+        {'type': 'ARRHENIUS', 'A': 1.0e-12, 'B': -2.0, 'C': -2000.0},
+        {'type': 'PHOTOLYSIS', 'MUSICA name': 'R2'},
+        {'type': 'TROE', 'k0_A': 9.0e-32, 'k0_B': -1.5,
+         'kinf_A': 3.0e-11, 'kinf_B': 0.0}]
+    parameters = compile_rate_parameters(reactions)
+    cache = RateConstantCache(parameters, max_size=2)
+
+    rates = cache.rate_constants(250.0, 5.0e4, 1.0e19, photolysis={'R2': 1.0})
+    exact = evaluate_rate_constants(parameters, 250.0, 5.0e4, 1.0e19,
+        photolysis={'R2': 1.0})[0]
+    assert np.allclose(rates, exact, rtol=1.0e-4, atol=0.0)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # same quantized state, photolysis applied on every lookup
+    rates[0] = 0.0
+    again = cache.rate_constants(250.001, 5.0e4 * (1.0 + 1.0e-7), 1.0e19,
+        photolysis={'R2': 2.0})
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert again[0] == exact[0] and again[1] == 2.0 and again[2] == rates[2]
+
+    cache.rate_constants(260.0, 5.0e4, 1.0e19)
+    cache.rate_constants(250.0, 5.0e4, 1.0e19)
+    # 260 K is the least recently used state
+    cache.rate_constants(270.0, 5.0e4, 1.0e19)
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.key(260.0, 5.0e4, 1.0e19) not in cache.entries
+    assert cache.key(250.0, 5.0e4, 1.0e19) in cache.entries
+    assert cache.rate_constants(250.0, 5.0e4, 1.0e19)[1] == 0.0
+
+    # zero pressure and air density do not share the entry of 1 Pa, 1 cm-3
+    cache = RateConstantCache(parameters)
+    zero = cache.rate_constants(250.0, 0.0, 0.0)
+    one = cache.rate_constants(250.0, 1.0, 1.0)
+    assert cache.misses == 2 and len(cache) == 2
+    assert zero[2] == 0.0 and one[2] > 0.0
+    assert np.allclose(one, evaluate_rate_constants(parameters, 250.0, 1.0,
+        1.0)[0], rtol=1.0e-4, atol=0.0)
@@ -0,0 +1,105 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_rate_expression.py
+
+Usage:
+    pytest test_rate_expression.py --log-cli-level=DEBUG
+"""
+
+import numpy as np
+
+from rate_expression import compile_rate_expression, \
+    evaluate_rate_expression, expand_rate_expression, kpp_rate_namespace, \
+    micm_rate_expression
+from rate_constants import compile_rate_parameters, evaluate_rate_constants
+from verify_translation import rate_grid
+
+
+def test_compile_rate_expression():
+
+    assert compile_rate_expression('1.0D-3_dp') == ('num', 1.0e-3)
+    assert compile_rate_expression('-2.0**2') \
+        == ('neg', ('**', ('num', 2.0), ('num', 2.0)))
+    assert compile_rate_expression('2.0*EXP(-300./TEMP)') \
+        == ('*', ('num', 2.0), ('call', 'EXP',
+            [('/', ('neg', ('num', 300.0)), ('name', 'TEMP'))]))
+    assert compile_rate_expression('1.0*[M]') \
+        == ('*', ('num', 1.0), ('name', 'M'))
+
+    for kpp_str in ['1.0 +* 2', '(1.0', 'EXP(1.0', '1.0 ; 2.0']:
+        try:
+            compile_rate_expression(kpp_str)
+            assert False, kpp_str
+        except ValueError:
+            pass
+
+
+def test_expand_rate_expression():
+
+    terms = expand_rate_expression(compile_rate_expression(
+        '.5*(4.13D-12*EXP(425./TEMP) + 1.86D-11*EXP(175./TEMP))'))
+    assert [(float(A), B, C, m) for A, B, C, m in terms] \
+        == [(2.065e-12, 0, 425.0, 0), (9.3e-12, 0, 175.0, 0)]
+
+    terms = expand_rate_expression(compile_rate_expression(
+        '(C_M *6.00D-34*(TEMP/300.0)**(-2.4))'))
+    assert [(float(A), float(B), C, m) for A, B, C, m in terms] \
+        == [(6.0e-34, -2.4, 0, 1)]
+
+    # a sum in a denominator has no expansion
+    assert expand_rate_expression(compile_rate_expression(
+        '4.3D-13*EXP(1040./TEMP)/(1.+0.027*EXP(660./TEMP))')) is None
+
+
+def test_micm_rate_expression():
+
+    temperature, pressure, air_density = rate_grid(8, 4)
+    namespace = kpp_rate_namespace(temperature, air_density)
+
+    for kpp_str, rate_type, types in [
+        ('8.0E-12*EXP(-2060./TEMP)', 'expression', ['ARRHENIUS']),
+        ('(THERMAL_T2( 4.88D-18 , 2282.0_dp,TEMP ))', 'expression',
+            ['ARRHENIUS']),
+        ('2.03E-16*(TEMP/300.)**(4.57)*EXP(693./TEMP)', 'expression',
+            ['ARRHENIUS']),
+        ('(1.33D-13+3.82D-11*EXP(-2000./TEMP))', 'expression',
+            ['ARRHENIUS', 'ARRHENIUS']),
+        ('(3.5D-13*EXP(430./TEMP) + 1.7D-33* C_M *EXP(1000./TEMP))',
+            'expression', ['ARRHENIUS', 'TROE']),
+        ('3.3E-39*EXP(530./TEMP)*O2', 'expression', ['TROE']),
+        ('4.3D-13*EXP(1040./TEMP)/(1.+37.*EXP(-660./TEMP))',
+            'expression_fit', ['ARRHENIUS'])]:
+
+        matched, reactions, error = micm_rate_expression(kpp_str)
+        assert matched == rate_type, kpp_str
+        assert [reaction['type'] for reaction in reactions] == types
+
+        reference = evaluate_rate_expression(
+            compile_rate_expression(kpp_str), namespace)
+        translated = evaluate_rate_constants(
+            compile_rate_parameters(reactions),
+            temperature, pressure, air_density).sum(axis=1)
+        max_rel_error = np.max(np.abs(translated - reference) / reference)
+        if rate_type == 'expression':
+            assert error == 0.0
+            assert max_rel_error < 1.0e-12, kpp_str
+        else:
+            assert 0.0 < error < 0.02
+            assert max_rel_error < 0.02
+
+
+def test_untranslated_rate_expression():
+
+    assert micm_rate_expression('KMT01')[0] is None
+    assert micm_rate_expression('J(J_NO2)')[0] is None
+    # [M] squared has no MICM form, and [M] dependence is not fitted
+    rate_type, reactions, message = micm_rate_expression(
+        '5.6E-34*N2*(TEMP/300.)**(-2.6)*O2')
+    assert rate_type is None
+    assert 'N2' in message
+    rate_type, reactions, message = micm_rate_expression('1.0 +* 2')
+    assert rate_type is None
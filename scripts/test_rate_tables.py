@@ -0,0 +1,107 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_rate_tables.py
+
+Usage:
+    pytest test_rate_tables.py --log-cli-level=DEBUG
+"""
+
+import numpy as np
+import pytest
+
+from rate_constants import compile_rate_parameters, evaluate_rate_constants, \
+    air_number_density
+from rate_tables import THERMAL_TYPES, tabulate_rate_constants, \
+    lookup_rate_constants, write_rate_table, read_rate_table, \
+    benchmark_rate_table
+
+reactions = [
+    {'type': 'ARRHENIUS', 'A': 1.0e-12, 'C': -2000.0},
+    {'type': 'PHOTOLYSIS', 'MUSICA name': 'R2'},
+    {'type': 'TROE', 'k0_A': 9.0e-32, 'k0_B': -1.5,
+     'kinf_A': 3.0e-11, 'kinf_B': 0.0},
+    {'type': 'ARRHENIUS', 'A': 2.0e-13, 'D': 1.0, 'B': 1.0, 'E': 1.0e-5},
+    {'type': 'TERNARY_CHEMICAL_ACTIVATION', 'k0_A': 1.5e-13, 'k0_B': 0.6,
+     'kinf_A': 2.9e9, 'kinf_B': 6.1},
+    {'type': 'TROE', 'k0_A': 6.5e-34, 'k0_C': 1335.0,
+     'kinf_A': 2.7e-17, 'kinf_C': 2199.0, 'Fc': 1.0, 'N': 0.0},
+    {'type': 'ARRHENIUS', 'A': 0.0}]
+
+
+def atmosphere(n_cells):
+    rng = np.random.default_rng(1)
+    temperature = rng.uniform(180.0, 320.0, n_cells)
+    pressure = rng.uniform(1.0e3, 1.0e5, n_cells)
+    return temperature, pressure, air_number_density(temperature, pressure)
+
+
+def test_lookup_rate_constants():
+
+    parameters = compile_rate_parameters(reactions)
+    temperature, pressure, air_density = atmosphere(1000)
+    photolysis = {'R2': 1.0e-5}
+    exact = evaluate_rate_constants(parameters, temperature, pressure,
+        air_density, photolysis=photolysis)
+
+    # fall-off reactions only by default
+    table = tabulate_rate_constants(parameters)
+    assert table['index'].tolist() == [2, 4, 5]
+    assert table['max_error'].max() < 1.0e-2
+    rates = lookup_rate_constants(table, parameters, temperature, pressure,
+        air_density, photolysis=photolysis)
+    assert rates.shape == (1000, 7)
+    other = [0, 1, 3, 6]
+    assert np.array_equal(rates[:, other], exact[:, other])
+    assert np.allclose(rates, exact, rtol=1.0e-2, atol=0.0)
+
+    table = tabulate_rate_constants(parameters, types=THERMAL_TYPES,
+        n_temperature=512, n_density=256)
+    assert table['index'].tolist() == [0, 2, 3, 4, 5, 6]
+    assert table['log'].tolist() == [True, True, True, True, True, False]
+    # log k of A exp(C / T) is linear in 1/T
+    assert table['max_error'][0] < 1.0e-12
+    rates = lookup_rate_constants(table, parameters, temperature, pressure,
+        air_density, photolysis=photolysis)
+    tabulated = table['index'][:5]
+    error = np.abs(rates[:, tabulated] / exact[:, tabulated] - 1.0)
+    assert (error < 2.0 * table['max_error'][:5]).all()
+    assert (rates[:, 6] == 0.0).all()
+
+    # a reused output array, whatever it held before
+    out = np.full((7, 1000), np.nan)
+    reused = lookup_rate_constants(table, parameters, temperature, pressure,
+        air_density, photolysis=photolysis, out=out)
+    assert np.shares_memory(reused, out)
+    assert np.array_equal(reused, rates)
+
+    with pytest.raises(ValueError):
+        tabulate_rate_constants(parameters, types=('PHOTOLYSIS',))
+
+
+def test_rate_table_file(tmp_path):
+
+    parameters = compile_rate_parameters(reactions)
+    table = tabulate_rate_constants(parameters, n_temperature=64,
+        n_density=32)
+    write_rate_table(table, str(tmp_path))
+
+    mapped = read_rate_table(str(tmp_path))
+    assert isinstance(mapped['values'], np.memmap)
+    assert mapped['types'] == table['types']
+    assert np.array_equal(mapped['max_error'], table['max_error'])
+
+    temperature, pressure, air_density = atmosphere(100)
+    assert np.array_equal(
+        lookup_rate_constants(mapped, parameters, temperature, pressure,
+            air_density),
+        lookup_rate_constants(table, parameters, temperature, pressure,
+            air_density))
+
+    result = benchmark_rate_table(parameters, mapped, n_cells=2000,
+        block_size=500, repeat=1)
+    assert result['n_tabulated'] == 3
+    assert result['max_error'] < 2.0 * mapped['max_error'].max()
@@ -0,0 +1,78 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_reduction.py
+
+Usage:
+    pytest test_reduction.py --log-cli-level=DEBUG
+"""
+
+import pytest
+
+from kpp_translate import translate
+from reduction import reduce_mechanism, dependencies
+
+kpp_str = """
+#DEFVAR
+O   = O;
+O3  = O + O + O;
+NO  = N + O;
+NO2 = N + O + O;
+HNO3 = IGNORE;
+CH4 = IGNORE;
+CH3O2 = IGNORE;
+UNUSED = IGNORE;
+#DEFFIX
+M   = IGNORE;
+O2  = O + O;
+#EQUATIONS
+<R1> O2 + hv = 2O : (2.643E-10) * SUN;
+<R2> O + O2 = O3 : (8.018E-17);
+<R3> O3 + NO = NO2 + O2 : ARR_ac(3.0e-12, -1500.0);
+<R4> NO2 + hv = NO + O : (1.0e-2) * SUN;
+<R5> NO2 = HNO3 : (1.0e-5);
+<R6> CH4 = CH3O2 : (1.0e-6);
+<R7> O + O2 = O3 : (2.0E-17);
+"""
+
+
+def test_dependencies():
+
+    mechanism = translate(kpp_str)
+    reached = dependencies(mechanism, ['O3'])
+    names = set(mechanism.names[n] for n in reached)
+    assert names == set(['O3', 'O', 'O2', 'NO', 'NO2'])
+
+
+def test_reduce_mechanism():
+
+    mechanism = translate(kpp_str)
+    report = reduce_mechanism(mechanism, targets=['O3'])
+
+    assert report['reactions_removed'] == ['R6']
+    assert report['reactions_merged'] == [('R2', 'R7')]
+    assert sorted(report['species_removed']) == ['CH3O2', 'CH4', 'UNUSED']
+    assert report['before']['reactions'] == 7
+    assert report['after']['reactions'] == 5
+    assert report['after']['jacobian'] < report['before']['jacobian']
+
+    labels = [reaction.label for reaction in mechanism.reactions]
+    assert labels == ['R1', 'R2', 'R3', 'R4', 'R5']
+    assert mechanism.reactions[1].parameters()['A'] == pytest.approx(1.0018e-16)
+    # HNO3 is a product of the kept R5, constants are never removed
+    assert mechanism.species_names() == ['M', 'O2',
+        'O', 'O3', 'NO', 'NO2', 'HNO3']
+
+    with pytest.raises(ValueError):
+        reduce_mechanism(translate(kpp_str), targets=['OH'])
+
+
+def test_reduce_without_targets():
+
+    mechanism = translate(kpp_str, reduce=True)
+    assert len(mechanism.reactions) == 6
+    assert 'UNUSED' not in mechanism.species_names()
+    assert 'CH4' in mechanism.species_names()
@@ -0,0 +1,102 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_rxn_registry.py
+
+Usage:
+    pytest test_rxn_registry.py --log-cli-level=DEBUG
+"""
+
+from rxn_registry import register_rate_function, unregister_rate_function, \
+    match_rate_function, parse_rate_expression
+from kpp_to_micm import split_by_section, micm_equation_json
+from kpp_metrics import TranslationMetrics
+
+
+def test_builtin_rate_functions():
+
+    rate_type, reactions = parse_rate_expression('j(Pj_no2)')
+    assert rate_type == 'PHOTOLYSIS'
+    assert reactions == [{'type': 'PHOTOLYSIS'}]
+
+    rate_type, reactions = parse_rate_expression('(2.643E-10) * SUN*SUN')
+    assert rate_type == 'PHOTOLYSIS'
+
+    rate_type, reactions = parse_rate_expression(
+        'ARR2( 3.30D-39 , -530.0_dp, TEMP )')
+    assert rate_type == 'ARR'
+    assert reactions == [{'type': 'ARRHENIUS', 'A': 3.3e-39, 'C': 530.0,
+        'D': 300.0}]
+
+    rate_type, reactions = parse_rate_expression(
+        'TROEE(1.0, 2000.0, 3.0e-11, 4.0, 5.0e-12, 6.0, TEMP, C_M)')
+    assert rate_type == 'TROEE'
+    assert reactions[0]['k0_A'] == 3.0e-11
+    assert reactions[0]['k0_C'] == - 2000.0
+
+    rate_type, reactions = parse_rate_expression('k57(TEMP, C_M)')
+    assert rate_type == 'k57'
+    assert [reaction['type'] for reaction in reactions] \
+        == ['TROE', 'TERNARY_CHEMICAL_ACTIVATION']
+
+    # constant factors are folded into the rate
+    rate_type, reactions = parse_rate_expression(
+        '(.20946D0*ARR2( 3.30D-39 , -530.0_dp, TEMP ))')
+    assert reactions[0]['A'] == 0.20946 * 3.3e-39
+    rate_type, reactions = parse_rate_expression(
+        '2.0*ARR_ac(1.0D-12, 2.0_dp)*0.5')
+    assert reactions[0]['A'] == 1.0e-12
+    rate_type, reactions = parse_rate_expression('0.5*k57(TEMP, C_M)')
+    assert [reaction['k0_A'] for reaction in reactions] == [5.9e-33 * 0.5,
+        1.5e-13 * 0.5]
+
+    # other expressions are not translated by the function alone
+    assert parse_rate_expression(
+        'ARR2(1.0D-12, 100.0_dp, TEMP) + 1.0D-13') is None
+    assert parse_rate_expression('ARR2(1.0D-12, 100.0_dp, TEMP)/C_M') is None
+    assert parse_rate_expression('TEMP*ARR2(1.0D-12, 100.0_dp, TEMP)') is None
+
+    # functions are matched by name, not by substring
+    assert parse_rate_expression('1.2E-12*EXP(-300.0/TEMP)') is None
+    assert parse_rate_expression('SUNSET(1.0)') is None
+    assert parse_rate_expression('2.0E-12') is None
+
+
+def test_matching_order():
+
+    # photolysis is registered before ARR
+    function, name, args = match_rate_function('ARR2(1.0, 2.0)*SUN')
+    assert function.rate_type == 'PHOTOLYSIS'
+    assert name == 'SUN'
+
+
+def test_custom_rate_function():
+
+    def usr_CO_OH_a(name, coeffs, N_reactants):
+        return {'type': 'ARRHENIUS', 'A': 1.5e-13 * coeffs[0]}
+
+    kpp_str = """
+#EQUATIONS
+<R1> CO + OH = HO2 + CO2 : usr_CO_OH_a(2.0, TEMP, C_M) ;
+"""
+    tokens = split_by_section(kpp_str.splitlines())['#EQUATIONS']
+
+    register_rate_function('usr_CO_OH_a', usr_CO_OH_a)
+    try:
+        metrics = TranslationMetrics()
+        reactions = micm_equation_json(tokens, metrics=metrics)
+    finally:
+        unregister_rate_function('usr_CO_OH_a')
+
+    assert reactions[0]['type'] == 'ARRHENIUS'
+    assert reactions[0]['A'] == 3.0e-13
+    assert reactions[0]['MUSICA name'] == 'R1'
+    assert metrics.rate_types == {'usr_CO_OH_a': 1}
+
+    # unregistered, the rate falls back to the default Arrhenius branch
+    metrics = TranslationMetrics()
+    reactions = micm_equation_json(tokens, metrics=metrics)
+    assert metrics.rate_types == {'default_arrhenius_unparsed': 1}
@@ -0,0 +1,43 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_sparsity.py
+
+Usage:
+    pytest test_sparsity.py --log-cli-level=DEBUG
+"""
+
+from sparsity import jacobian_pattern, markowitz_ordering, symbolic_lu, \
+    ordering_report
+from kpp_to_micm import reorder_species_json
+
+
+def test_ordering_report():
+
+    # arrowhead Jacobian, the hub H first fills the LU factors completely
+    species = ['H', 'L1', 'L2', 'L3', 'L4']
+    reactions = [{'type': 'ARRHENIUS',
+        'reactants': {'H': {'qty': 1.0}, name: {'qty': 1.0}},
+        'products': {'P': {'yield': 1.0}}} for name in species[1:]]
+
+    pattern = jacobian_pattern(species, reactions)
+    assert len(pattern) == 5 + 2 * 4
+    assert (0, 3) in pattern and (3, 0) in pattern and (1, 2) not in pattern
+
+    assert len(symbolic_lu(pattern, 5)) == 25
+    # leaves first, H once it has a single neighbor left (ties by index)
+    order = markowitz_ordering(pattern, 5)
+    assert order == [1, 2, 3, 0, 4]
+    assert symbolic_lu(pattern, 5, order) == pattern
+
+    names, report = ordering_report(species, reactions)
+    assert names == ['L1', 'L2', 'L3', 'H', 'L4']
+    assert report == {'species': 5, 'jacobian': 13,
+        'lu_original': 25, 'lu_reordered': 13}
+
+    species_json = [{'name': name, 'type': 'CHEM_SPEC'} for name in species]
+    reordered, report = reorder_species_json(species_json, reactions)
+    assert [entry['name'] for entry in reordered] == names
@@ -0,0 +1,87 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_stoichiometry.py
+
+Usage:
+    pytest test_stoichiometry.py --log-cli-level=DEBUG
+"""
+
+import os
+import json
+
+import numpy as np
+
+from mechanism import Mechanism
+from stoichiometry import stoichiometric_matrices, write_stoichiometry, \
+    load_stoichiometry, csr_to_coo, csr_matvec
+from box_model import compile_mechanism, full_state, forcing
+
+micm_dir = os.path.join(os.path.dirname(__file__), '..', 'configs', 'micm')
+
+
+def test_stoichiometry(tmp_path):
+
+    with open(os.path.join(micm_dir, 'Chapman', 'species.json'), 'r') as f:
+        species_json = json.load(f)
+    with open(os.path.join(micm_dir, 'Chapman', 'reactions.json'), 'r') as f:
+        reactions_json = json.load(f)
+    mechanism = Mechanism.from_json(species_json, reactions_json)
+
+    matrices = stoichiometric_matrices(mechanism)
+    n_species, n_reactions = len(mechanism.names), len(mechanism.reactions)
+    for matrix in matrices.values():
+        assert tuple(matrix['shape']) == (n_species, n_reactions)
+
+    # O + O3 = 2 O2: O2 reactant of no column, net +2
+    index = mechanism.index
+    rows, cols, values = csr_to_coo(matrices['net'])
+    net = np.zeros((n_species, n_reactions))
+    net[rows, cols] = values
+    r = [reaction.label for reaction in mechanism.reactions].index('R4')
+    assert net[index['O2'], r] == 2.0
+    assert net[index['O3'], r] == net[index['O'], r] == -1.0
+
+    # tendencies N r match the box model forcing
+    compiled = compile_mechanism(species_json, reactions_json)
+    rng = np.random.default_rng(0)
+    k = rng.uniform(size=n_reactions)
+    concentrations = dict((name, value) for name, value
+        in zip(compiled['species'], rng.uniform(size=len(compiled['species']))))
+
+    c = np.array([concentrations[name] for name in mechanism.names])
+    rows, cols, values = csr_to_coo(matrices['reactants'])
+    rates = k.copy()
+    np.multiply.at(rates, cols, c[rows]**values)
+    tendencies = csr_matvec(matrices['net'], rates)
+
+    n_variable = compiled['n_variable']
+    state = full_state(
+        np.array([concentrations[n] for n in compiled['species'][:n_variable]]),
+        np.array([concentrations[n] for n in compiled['species'][n_variable:]]))
+    expected = forcing(compiled, k, state)
+    assert np.allclose([tendencies[index[name]]
+        for name in compiled['species'][:n_variable]], expected)
+
+    # trailing cell axis, rows without nonzeros are zero
+    cell_rates = rng.uniform(size=(n_reactions, 3))
+    assert np.allclose(csr_matvec(matrices['net'], cell_rates),
+        net @ cell_rates)
+    assert not net.any(axis=1).all()
+
+    # memory-mapped and read arrays agree, scipy.sparse.save_npz layout
+    files = write_stoichiometry(mechanism, str(tmp_path))
+    assert [os.path.basename(f) for f in files] \
+        == ['reactants.npz', 'products.npz', 'net.npz']
+    for name, npz_file in zip(['reactants', 'products', 'net'], files):
+        mapped = load_stoichiometry(npz_file)
+        loaded = load_stoichiometry(npz_file, mmap=False)
+        assert isinstance(mapped['data'], np.memmap)
+        assert mapped['format'].item() == b'csr'
+        assert list(mapped['species']) == mechanism.names
+        for key in ['shape', 'data', 'indices', 'indptr']:
+            assert np.array_equal(mapped[key], loaded[key])
+            assert np.array_equal(mapped[key], matrices[name][key])
@@ -0,0 +1,50 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+
+File:
+    test_verify_translation.py
+
+Usage:
+    pytest test_verify_translation.py --log-cli-level=DEBUG
+"""
+
+from kpp_lexer import tokenize
+from verify_translation import fortran_to_python, rate_grid, verify_equations
+
+
+def test_fortran_to_python():
+
+    assert fortran_to_python('(.20946D0*ARR2( 3.30D-39 , -530.0_dp, TEMP ))') \
+        == '(.20946e0*ARR2( 3.30e-39 , -530.0, TEMP ))'
+    assert fortran_to_python('ARR2(1.0D+2, ID1, TEMP)') \
+        == 'ARR2(1.0e+2, ID1, TEMP)'
+
+
+def test_verify_equations():
+
+    lines = [
+        '#EQUATIONS\n',
+        '{001:J01} O3 + hv = O + O2 : (6.120E-04) * SUN;\n',
+        '<R2> O + O2 = O3 : ARR2(6.0D-34, -300.0_dp, TEMP);\n',
+        '<R3> HO + NO2 = HNO3 : TROE( 1.80D-30 , 3.0_dp , 2.80D-11 , 0.0_dp , TEMP, C_M);\n',
+        '<R4> HO + HNO3 = NO3 : k45(TEMP, C_M);\n',
+        '<R5> CO + HO = HO2 : k57(TEMP, C_M);\n',
+        '<R6> O + O3 = 2O2 : (.20946D0*ARR2( 3.30D-39 , -530.0_dp, TEMP ));\n',
+        '<R7> NO + NO3 = 2NO2 : KMT04;\n',
+        '<R8> NO + O3 = NO2 : 1.0D-12*EXP(-TEMP/100.0_dp);\n']
+
+    temperature, pressure, air_density = rate_grid(8, 4)
+    results = verify_equations(tokenize(lines),
+        temperature, pressure, air_density)
+
+    status = dict((result['label'], result['status']) for result in results)
+    assert status == {'001:J01': 'photolysis', 'R2': 'ok', 'R3': 'ok',
+        'R4': 'ok', 'R5': 'ok', 'R6': 'ok', 'R7': 'unsupported',
+        'R8': 'mismatch'}
+
+    # the constant factor of R6 is folded into A
+    assert results[5]['max_rel_error'] < 1.0e-12
+    # R8 is fitted by an Arrhenius rate
+    assert 1.0e-3 < results[7]['max_rel_error'] < 1.0e-1
@@ -0,0 +1,243 @@
+"""
+Copyright (C) 2024
+National Center for Atmospheric Research,
+SPDX-License-Identifier: Apache-2.0
+(Software Package Data Exchange)
+
+File:
+    verify_translation.py
+
+Usage:
+    python verify_translation.py
+    python verify_translation.py --help
+
+Description:
+    verify_translation.py checks that translated MICM rate parameters
+    reproduce the original KPP rate expressions.
+
+    Each KPP rate expression is evaluated with reference implementations
+    of the WRF-KPP rate functions (ARR, ARR2, ARR_ab, ARR_ac, ARR_abc,
+    THERMAL_T2, TROE, TROEE, k45, k57) on a dense temperature x pressure grid.
+    The translated MICM reactions of all equations are evaluated
+    on the same grid in a single call to rate_constants.evaluate_rate_constants,
+    summing the two MICM reactions that k45 and k57 are split into.
+    The maximum relative error over the grid is reported per equation.
+    Photolysis reactions are skipped, and rate expressions calling
+    functions without a reference implementation are reported as unsupported.
+
+    Rate expressions are evaluated with Python eval in a namespace
+    holding only the reference functions (rate_expression.py),
+    TEMP, C_M, M, O2 and N2, so KPP config files are trusted input.
+
+    Requires NumPy.
+"""
+
+import os
+import re
+import sys
+import argparse
+import logging
+import json
+import time
+
+import numpy as np
+
+from kpp_lexer import EQUATION, LABEL
+from kpp_to_micm import split_by_section, read_kpp_config, micm_equation
+from rate_constants import compile_rate_parameters, evaluate_rate_constants, \
+    air_number_density
+from rate_expression import kpp_rate_namespace
+
+_FORTRAN_REAL_RE = re.compile(r'(?<![\w.])(\d+\.?\d*|\.\d+)[dD]([+-]?\d+)')
+
+_KIND_RE = re.compile(r'(?<=[\d.])_dp\b')
+
+# SUN, j(Pj_no2), J(J_NO2)
+_PHOTOLYSIS_RE = re.compile(r'\bSUN\b|\b[jJ]\s*\(')
+
+
+def fortran_to_python(rate):
+    """
+    Rewrite a KPP (Fortran) rate expression as a Python expression
+
+    Parameters
+        (str) rate: e.g. '(.20946D0*ARR2( 3.30D-39 , -530.0_dp, TEMP ))'
+
+    Returns
+        (str): e.g. '(.20946e0*ARR2( 3.30e-39 , -530.0, TEMP ))'
+    """
+
+    return _KIND_RE.sub('', _FORTRAN_REAL_RE.sub(r'\1e\2', rate))
+
+
+def rate_grid(n_temperature=64, n_pressure=32,
+    temperature_range=(180.0, 330.0), pressure_range=(1.0e2, 1.1e5)):
+    """
+    Dense temperature x pressure grid, flattened
+
+    Parameters
+        (int) n_temperature, n_pressure: grid points
+        (tuple of float) temperature_range: [K]
+        (tuple of float) pressure_range: [Pa], log spaced
+
+    Returns
+        (tuple of ndarray): temperature [K], pressure [Pa],
+            air number density [molecules cm-3]
+    """
+
+    T, P = np.meshgrid(np.linspace(*temperature_range, n_temperature),
+        np.geomspace(*pressure_range, n_pressure), indexing='ij')
+    T, P = T.ravel(), P.ravel()
+
+    return T, P, air_number_density(T, P)
+
+
+def verify_equations(tokens, temperature, pressure, air_density,
+    tolerance=1.0e-6):
+    """
+    Compare KPP rate expressions with their translated MICM rate constants
+
+    Parameters
+        (iterable of KppToken) tokens: tokens of equation section
+        (ndarray) temperature: temperature [K], one per grid point
+        (ndarray) pressure: pressure [Pa], one per grid point
+        (ndarray) air_density: air number density [molecules cm-3]
+        (float) tolerance: maximum relative error accepted
+
+    Returns
+        (list of dict): per equation 'label', 'rate', 'types',
+            'status' ('ok', 'mismatch', 'photolysis' or 'unsupported'),
+            'max_rel_error' and 'message'
+    """
+
+    results = list()
+    micm_reactions = list()
+    owners = list()
+
+    label = ''
+    for token in tokens:
+        if token.kind == LABEL:
+            label = token.value
+        elif token.kind == EQUATION:
+            equation_dicts = micm_equation(label, token.value)
+            results.append({'label': label, 'rate': token.value.rate,
+                'types': [d['type'] for d in equation_dicts],
+                'status': 'ok', 'max_rel_error': 0.0, 'message': ''})
+            for equation_dict in equation_dicts:
+                micm_reactions.append(equation_dict)
+                owners.append(len(results) - 1)
+            label = ''
+
+    if not results:
+        return results
+
+    micm_rates = evaluate_rate_constants(
+        compile_rate_parameters(micm_reactions),
+        temperature, pressure, air_density)
+    translated = np.zeros((len(results), len(temperature)))
+    np.add.at(translated, np.array(owners), micm_rates.T)
+
+    namespace = kpp_rate_namespace(temperature, air_density)
+    reference_cache = dict()
+
+    for n, result in enumerate(results):
+        if 'PHOTOLYSIS' in result['types'] \
+            or _PHOTOLYSIS_RE.search(result['rate']):
+            result['status'] = 'photolysis'
+            continue
+
+        expression = fortran_to_python(result['rate'])
+        if expression not in reference_cache:
+            try:
+                with np.errstate(all='ignore'):
+                    reference_cache[expression] = np.broadcast_to(
+                        eval(expression, namespace), temperature.shape)
+            except Exception as error:
+                reference_cache[expression] = error
+        reference = reference_cache[expression]
+
+        if isinstance(reference, Exception):
+            result['status'] = 'unsupported'
+            result['message'] = '%s: %s' % (type(reference).__name__, reference)
+            continue
+
+        with np.errstate(all='ignore'):
+            error = np.abs(translated[n] - reference) \
+                / np.maximum(np.abs(reference), np.finfo(float).tiny)
+        error[(translated[n] == reference)] = 0.0
+        result['max_rel_error'] = float(np.nanmax(error)) \
+            if not np.all(np.isnan(error)) else float('nan')
+        if not result['max_rel_error'] <= tolerance:
+            result['status'] = 'mismatch'
+
+    return results
+
+
+if __name__ == '__main__':
+
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logfile', type=str,
+        default=sys.stdout,
+        help='log file (default stdout)')
+    parser.add_argument('--kpp_dir', type=str,
+        default=os.path.join('..', 'racm_esrl_vcp', 'kpp'),
+        help='KPP input config directory')
+    parser.add_argument('--kpp_name', type=str,
+        default='racm_soa_vbs',
+        help='KPP config name')
+    parser.add_argument('--n_temperature', type=int,
+        default=64,
+        help='number of temperatures in the grid')
+    parser.add_argument('--n_pressure', type=int,
+        default=32,
+        help='number of pressures in the grid')
+    parser.add_argument('--tolerance', type=float,
+        default=1.0e-6,
+        help='maximum relative error accepted')
+    parser.add_argument('--report', type=str,
+        default=None,
+        help='JSON report file with per equation results')
+    parser.add_argument('--debug', action='store_true',
+        help='set logging level to debug')
+    args = parser.parse_args()
+
+    """
+    Setup logging
+    """
+    logging_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(stream=args.logfile, level=logging_level)
+
+    sections = split_by_section(read_kpp_config(args.kpp_dir, args.kpp_name))
+
+    """
+    Verify translated rate constants
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    start = time.perf_counter()
+    temperature, pressure, air_density = rate_grid(
+        args.n_temperature, args.n_pressure)
+    results = verify_equations(sections['#EQUATIONS'],
+        temperature, pressure, air_density, tolerance=args.tolerance)
+    seconds = time.perf_counter() - start
+    logging.getLogger().setLevel(logging_level)
+
+    for result in results:
+        if result['status'] in ('mismatch', 'unsupported'):
+            logging.info('%-12s %-12s %10.3e  %s %s'
+                % (result['status'], result['label'], result['max_rel_error'],
+                   result['rate'], result['message']))
+
+    counts = dict()
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    logging.info('verified %d equations on %d grid points in %.3f s: %s'
+        % (len(results), len(temperature), seconds,
+           ', '.join('%d %s' % (counts[status], status)
+               for status in sorted(counts))))
+
+    if args.report is not None:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=4)